@@ -0,0 +1,198 @@
+# benchmark_dashboard.py
+
+"""
+Load test of the production dashboard server (serve_dashboard.py).
+
+Builds a synthetic stats database (SQLite), then for each worker count
+starts the server and has --clients concurrent clients send --requests
+Dash callback requests (time-series and heatmap figures with random
+sources, entities and date ranges). Reported per worker count:
+- p50 / p99 callback latency and requests per second
+- total PSS of the worker processes (Linux; shared mapped pages are
+  split between the workers that map them)
+
+Usage:
+    python benchmark_dashboard.py --workers 1 2 4 --clients 16 --requests 2000 --json dashboard.json
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SECTORS = ['Information Technology', 'Health Care', 'Financials', 'Consumer Discretionary',
+           'Communication Services', 'Industrials', 'Consumer Staples', 'Energy',
+           'Utilities', 'Real Estate', 'Materials']
+
+
+def build_database(path, tickers, days, seed=0):
+    """Four *_sentiment_stats tables with every ticker / sector on every day"""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2015-01-01', periods=days, freq='D')
+    names = {'ticker': [f'T{i:04d}' for i in range(tickers)], 'sector': SECTORS}
+    with sqlite3.connect(path) as conn:
+        for source in ('reddit', 'merged'):
+            for kind, entities in names.items():
+                n = len(entities) * days
+                pd.DataFrame({
+                    'date': np.tile(dates, len(entities)),
+                    kind: np.repeat(entities, days),
+                    'avg_sentiment_score': rng.uniform(-100, 100, n),
+                    'rolling_90d_sentiment': rng.uniform(-50, 50, n),
+                }).to_sql(f'{source}_{kind}_sentiment_stats', conn, index=False, if_exists='replace')
+    return names, dates
+
+
+def callback_body(output, inputs):
+    return json.dumps({
+        'output': f'{output}.figure',
+        'outputs': {'id': output, 'property': 'figure'},
+        'inputs': [{'id': i, 'property': p, 'value': v} for i, p, v in inputs],
+        'changedPropIds': [f'{inputs[2][0]}.{inputs[2][1]}'],
+        'state': [],
+    }).encode()
+
+
+def random_request(rng, names, dates):
+    source = rng.choice(['Reddit Only', 'Merged (News + Reddit)'])
+    start = rng.randrange(len(dates) - 1)
+    end = rng.randrange(start, min(len(dates), start + 730))
+    start, end = dates[start].strftime('%Y-%m-%d'), dates[end].strftime('%Y-%m-%d')
+    if rng.random() < 0.5:
+        granularity = rng.choice(['By Ticker', 'By Sector'])
+        entities = rng.sample(names['ticker' if granularity == 'By Ticker' else 'sector'], 3)
+        return callback_body('time-series-chart', [
+            ('data-source-selector', 'value', source), ('granularity-selector', 'value', granularity),
+            ('date-range-selector', 'start_date', start), ('date-range-selector', 'end_date', end),
+            ('entity-selector', 'value', entities), ('score-type-selector', 'value', ['Daily Average', '90-Day Rolling'])])
+    return callback_body('sector-heatmap', [
+        ('data-source-selector', 'value', source),
+        ('date-range-selector', 'start_date', start), ('date-range-selector', 'end_date', end),
+        ('heatmap-score-selector', 'value', rng.choice(['avg_sentiment_score', 'rolling_90d_sentiment'])),
+        ('heatmap-sector-filter', 'value', rng.sample(SECTORS, rng.randint(0, 5)))])
+
+
+def wait_healthy(url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url + '/health', timeout=2) as response:
+                if json.load(response)['status'] == 'ok':
+                    return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError('dashboard server did not become healthy')
+
+
+def worker_pss(server_pid):
+    """Total PSS (bytes) of the server's child processes, or None off Linux"""
+    try:
+        children = []
+        for task in os.listdir(f'/proc/{server_pid}/task'):
+            with open(f'/proc/{server_pid}/task/{task}/children') as f:
+                children += f.read().split()
+        total = 0
+        for pid in children:
+            with open(f'/proc/{pid}/smaps_rollup') as f:
+                total += next(int(line.split()[1]) * 1024 for line in f if line.startswith('Pss:'))
+        return total
+    except OSError:
+        return None
+
+
+def load_test(url, bodies, clients):
+    latencies = []
+    lock = threading.Lock()
+    queue = iter(bodies)
+
+    def client():
+        while True:
+            with lock:
+                body = next(queue, None)
+            if body is None:
+                return
+            request = urllib.request.Request(url + '/_dash-update-component', data=body,
+                                             headers={'Content-Type': 'application/json'})
+            started = time.perf_counter()
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the dashboard server at several worker counts')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent clients')
+    parser.add_argument('--requests', type=int, default=2000, help='callback requests per worker count')
+    parser.add_argument('--tickers', type=int, default=500, help='synthetic tickers')
+    parser.add_argument('--days', type=int, default=1825, help='synthetic days of history')
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='dashboard_bench_')
+    db = os.path.join(tmp, 'stats.db')
+    names, dates = build_database(db, args.tickers, args.days)
+    rows = 2 * (args.tickers + len(SECTORS)) * args.days
+    print(f"Synthetic stats: {rows:,} rows ({args.tickers} tickers, {len(SECTORS)} sectors, {args.days} days)")
+
+    rng = random.Random(0)
+    url = f'http://127.0.0.1:{args.port}'
+    env = dict(os.environ, DASHBOARD_DB_URL=f'sqlite:///{db}')
+    results = {}
+    print(f"{'workers':>8}{'p50':>10}{'p99':>10}{'req/s':>10}{'worker PSS':>13}")
+    for workers in args.workers:
+        server = subprocess.Popen(
+            [sys.executable, os.path.join(HERE, 'serve_dashboard.py'), '--workers', str(workers),
+             '--bind', f'127.0.0.1:{args.port}', '--snapshot-dir', os.path.join(tmp, 'snapshots'), '--refresh', '0'],
+            cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_healthy(url)
+            # Warm every worker's imports before measuring
+            load_test(url, [random_request(rng, names, dates) for _ in range(workers * 20)], workers)
+            bodies = [random_request(rng, names, dates) for _ in range(args.requests)]
+            latencies, elapsed = load_test(url, bodies, args.clients)
+            pss = worker_pss(server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+        r = results[workers] = {
+            'p50_ms': statistics.median(latencies) * 1000,
+            'p99_ms': float(np.percentile(latencies, 99)) * 1000,
+            'requests_per_sec': len(latencies) / elapsed,
+            'worker_pss_mb': pss / 1e6 if pss is not None else None,
+        }
+        pss_text = f"{r['worker_pss_mb']:>10.0f} MB" if pss is not None else f"{'n/a':>13}"
+        print(f"{workers:>8}{r['p50_ms']:>8.1f}ms{r['p99_ms']:>8.1f}ms{r['requests_per_sec']:>10.0f}{pss_text}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'rows': rows, 'clients': args.clients, 'results': results}, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+# benchmark_inference.py
+
+"""
+Benchmark of the sentiment scoring backends in sentiment_inference.py.
+
+Reported per backend:
+- startup:    fresh Python process importing sentiment_inference, loading
+              the model and scoring one title (median of --runs)
+- throughput: titles per second for predict_proba over --rows synthetic
+              titles (tokenizing excluded; it is the same for every backend)
+- latency:    median and p99 time to score a batch of one title
+- accuracy:   label agreement and largest probability difference against
+              the float32 torch backend
+
+Backends: torch, torch-int8 (the .pt model) and numpy, numpy-int8 (the
+.npz exports, written to a temporary directory by sentiment_model.py).
+
+Usage:
+    python benchmark_inference.py --rows 200000 --runs 5 --json inference.json
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import joblib
+import numpy as np
+
+from sentiment_inference import LABEL_ENCODER_PATH, MODEL_PATH, VOCAB_PATH, SentimentScorer
+from sentiment_model import export_numpy
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEADLINE = "Stocks and banks rallied as investors cheered the earnings reports"
+
+STARTUP_SNIPPET = """
+import json, sys, time
+t0 = time.perf_counter()
+from sentiment_inference import SentimentScorer
+scorer = SentimentScorer.load(sys.argv[1], sys.argv[2], sys.argv[3], backend=sys.argv[4])
+scorer.score([{headline!r}])
+print(json.dumps({{'startup': time.perf_counter() - t0}}))
+"""
+
+
+def synthetic_titles(vocab, rows, seed=0):
+    """Titles of 3-20 vocab words, with some unknown words and punctuation"""
+    rng = random.Random(seed)
+    words = [w for w in vocab if w not in ("<PAD>", "<UNK>")][:20000]
+    extras = ["$TSLA", "moon!!", "Q3", "unknownword", "SEC's"]
+    return [" ".join(rng.choice(words) if rng.random() < 0.9 else rng.choice(extras)
+                     for _ in range(rng.randint(3, 20))) for _ in range(rows)]
+
+
+def startup(model_path, vocab_path, label_encoder_path, backend, runs):
+    snippet = STARTUP_SNIPPET.format(headline=HEADLINE)
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', snippet, model_path, vocab_path, label_encoder_path, backend],
+                             cwd=HERE, capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(out.strip().splitlines()[-1])['startup'])
+    return statistics.median(samples)
+
+
+def latency(scorer, ids, samples=500):
+    times = []
+    for i in range(samples):
+        row = ids[i % len(ids):i % len(ids) + 1]
+        t0 = time.perf_counter()
+        scorer.predict_proba(row)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times), float(np.percentile(times, 99))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the sentiment scoring backends')
+    parser.add_argument('--model', default=MODEL_PATH, help='.pt model to benchmark')
+    parser.add_argument('--vocab', default=VOCAB_PATH)
+    parser.add_argument('--label-encoder', default=LABEL_ENCODER_PATH)
+    parser.add_argument('--rows', type=int, default=200000, help='synthetic titles to score')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per startup measurement')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(p) for p in (args.model, args.vocab, args.label_encoder)]
+    tmp = tempfile.mkdtemp(prefix='sentiment_npz_')
+    npz = os.path.join(tmp, 'model.npz')
+    npz_int8 = os.path.join(tmp, 'model.int8.npz')
+    export_numpy(npz, *paths)
+    export_numpy(npz_int8, *paths, int8=True)
+
+    backends = [('torch', 'torch', paths[0]), ('torch-int8', 'torch-int8', paths[0]),
+                ('numpy', 'numpy', npz), ('numpy-int8', 'numpy', npz_int8)]
+    titles = synthetic_titles(joblib.load(args.vocab), args.rows)
+
+    results = {}
+    reference = None
+    print(f"{'backend':<12}{'startup':>10}{'titles/s':>12}{'p50':>10}{'p99':>10}{'agree':>9}{'max diff':>11}")
+    for name, backend, model_path in backends:
+        scorer = SentimentScorer.load(model_path, paths[1], paths[2], backend=backend)
+        ids = scorer.tokenize(titles)
+        t0 = time.perf_counter()
+        probs = scorer.predict_proba(ids)
+        elapsed = time.perf_counter() - t0
+        if reference is None:
+            reference = probs
+        p50, p99 = latency(scorer, ids)
+        r = results[name] = {
+            'startup': startup(model_path, paths[1], paths[2], backend, args.runs),
+            'titles_per_sec': len(ids) / elapsed,
+            'latency_p50': p50,
+            'latency_p99': p99,
+            'label_agreement': float(np.mean(probs.argmax(axis=1) == reference.argmax(axis=1))),
+            'max_prob_diff': float(np.abs(probs - reference).max()),
+            'model_bytes': os.path.getsize(model_path),
+        }
+        print(f"{name:<12}{r['startup'] * 1000:>8.0f}ms{r['titles_per_sec']:>12,.0f}"
+              f"{r['latency_p50'] * 1e6:>8.0f}us{r['latency_p99'] * 1e6:>8.0f}us"
+              f"{r['label_agreement']:>9.2%}{r['max_prob_diff']:>11.1e}")
+
+    for path in (npz, npz_int8):
+        os.remove(path)
+    os.rmdir(tmp)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# benchmark_startup.py
+
+"""
+Startup-time benchmark for the preprocessing used by the cron collectors.
+
+Each measurement runs in a fresh Python process so nothing is already
+imported or cached. Reported per scenario (median of --runs):
+- import:      time to import text_preprocessing
+- first clean: time for the first clean_reddit_headline() call, which is
+               where NLTK / WordNet or the lemma table gets loaded
+- total:       import + first clean
+
+Scenarios:
+- nltk eager:   what the module used to pay at import (nltk.stem + WordNet)
+- wordnet:      lazy module, no lemma table (WordNet loaded on first clean)
+- lemma table:  lazy module with a precomputed lemma table (pass --lemma-table)
+
+Usage:
+    python benchmark_startup.py --runs 5 --lemma-table lemma_table.tsv.gz
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEADLINE = "Stocks and banks rallied as investors cheered the earnings reports"
+
+EAGER_SNIPPET = f"""
+import json, time
+t0 = time.perf_counter()
+from nltk.stem import WordNetLemmatizer
+t1 = time.perf_counter()
+lemmatizer = WordNetLemmatizer()
+[lemmatizer.lemmatize(w) for w in {HEADLINE.lower()!r}.split()]
+t2 = time.perf_counter()
+print(json.dumps({{'import': t1 - t0, 'first_clean': t2 - t1}}))
+"""
+
+LAZY_SNIPPET = f"""
+import json, time
+t0 = time.perf_counter()
+import text_preprocessing
+t1 = time.perf_counter()
+text_preprocessing.clean_reddit_headline({HEADLINE!r})
+t2 = time.perf_counter()
+print(json.dumps({{'import': t1 - t0, 'first_clean': t2 - t1}}))
+"""
+
+
+def run_once(snippet, lemma_table):
+    env = dict(os.environ)
+    # Point at a missing file to force the WordNet path
+    env['LEMMA_TABLE'] = lemma_table or os.path.join(HERE, 'no_such_lemma_table.tsv.gz')
+    out = subprocess.run([sys.executable, '-c', snippet], cwd=HERE, env=env,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def measure(snippet, lemma_table, runs):
+    samples = [run_once(snippet, lemma_table) for _ in range(runs)]
+    result = {key: statistics.median(s[key] for s in samples) for key in ('import', 'first_clean')}
+    result['total'] = result['import'] + result['first_clean']
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure cold-start cost of text_preprocessing')
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per scenario')
+    parser.add_argument('--lemma-table', help='precomputed lemma table to benchmark')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    scenarios = [('nltk eager', EAGER_SNIPPET, None), ('wordnet', LAZY_SNIPPET, None)]
+    if args.lemma_table:
+        scenarios.append(('lemma table', LAZY_SNIPPET, os.path.abspath(args.lemma_table)))
+
+    results = {}
+    print(f"{'scenario':<14}{'import':>10}{'first clean':>14}{'total':>10}")
+    for name, snippet, table in scenarios:
+        r = results[name] = measure(snippet, table, args.runs)
+        print(f"{name:<14}{r['import'] * 1000:>8.1f}ms{r['first_clean'] * 1000:>12.1f}ms{r['total'] * 1000:>8.1f}ms")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Saved results to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
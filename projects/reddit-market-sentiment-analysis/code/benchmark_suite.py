@@ -0,0 +1,351 @@
+# benchmark_suite.py
+
+"""
+Throughput and peak-memory benchmarks of the pipeline's hot stages on
+synthetic corpora, with a baseline file to catch regressions.
+
+Cases:
+- extract_ticker          SmartTickerExtractor.extract_ticker per news article
+- tag_titles              ticker_tagging.tag_titles over the headline column
+- clean_reddit_headline   text_preprocessing.clean_reddit_headline per headline
+- clean_reddit_headlines  the batch version, over the whole column
+- predict_sentiment       sentiment_model.predict_sentiment per headline
+                          (the notebooks' loop; needs torch and the .pt model)
+- score                   SentimentScorer.score over the column (--backend)
+- rolling_aggregation     daily ticker / sector sums and their rolling
+                          90-day windows (sentiment_aggregates.py)
+
+Corpora are generated from a seed, so every run sees the same rows:
+- news: a title and 20-120 words of text, with up to three ticker mentions
+  in every form the extractor handles ($TSLA, NYSE: IBM, (NASDAQ: MSFT),
+  Apple Inc. (AAPL), ticker symbol GOOG, $LLOY.L, (BP.L), 7203.T, ...)
+  and decoys such as CEO: and Q3:
+- headlines: 4-20 words of Reddit-style finance text with tickers, emoji,
+  URLs, numbers and punctuation
+- scored: one row per headline with a date over three years, ticker and
+  sector lists and a sentiment score
+
+Every (case, size) runs in a fresh process. Reported: rows per second and
+peak memory, the MB the case added to the process's resident set at its
+peak (Linux; n/a elsewhere). Cases whose dependencies or model files are
+missing are reported as skipped (and fail --check if the baseline has them).
+
+Usage:
+    python benchmark_suite.py --sizes 10000 100000 1000000 --json suite.json
+    python benchmark_suite.py --sizes 10000 100000 --save-baseline    # writes benchmark_baseline.json
+    python benchmark_suite.py --sizes 10000 100000 --check            # exit 1 on a regression
+
+--check fails when a case is more than --tolerance slower, or uses more
+than --tolerance more memory, than in the baseline. Record the baseline on
+the machine that runs the check.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(HERE, 'benchmark_baseline.json')
+SIZES = (10000, 100000, 1000000)
+# Peak memory below this many MB is not compared (allocator noise)
+MEMORY_SLACK_MB = 5
+
+FILLER = ('the company said shares rose fell sharply on monday after analysts raised their outlook '
+          'for revenue and margins in the quarter while investors weighed rates inflation and demand '
+          'earnings guidance beat missed expectations board approved buyback dividend growth').split()
+REDDIT_WORDS = ('buy sell hold calls puts moon rocket tendies yolo bagholder diamond hands paper stock '
+                'shares market crash rally dip bought selling investing earnings report bullish bearish '
+                'squeeze short long options expiry gains losses portfolio thoughts dd is not going to the '
+                'this that my your why what when how today tomorrow week again still just').split()
+REDDIT_EXTRAS = ['🚀', '💎🙌', '!!', '???', "I'm", "can't", 'https://example.com/x', '1,500', 'Q4', '2025']
+
+
+def _universe(rng, size=500):
+    """(company name, ticker) pairs for the synthetic mentions"""
+    syllables = ['al', 'bex', 'cor', 'dyn', 'en', 'fax', 'gen', 'hal', 'ion', 'jet',
+                 'kor', 'lum', 'mar', 'nov', 'or', 'pax', 'quin', 'ros', 'syn', 'tor']
+    pairs = {}
+    while len(pairs) < size:
+        name = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 3))).title()
+        pairs[name] = ''.join(rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rng.randint(2, 4)))
+    return list(pairs.items())
+
+
+def _mention(rng, company, ticker):
+    """One ticker mention, in any of the forms the extractor scores"""
+    form = rng.randrange(16)
+    return [f'${ticker}', f'NYSE: {ticker}', f'(NASDAQ: {ticker})', f'{company} Inc. ({ticker})',
+            f'{company} Corp ({ticker})', f'{company} Holdings ({ticker})', f'ticker symbol {ticker}',
+            f'trades as {ticker}', f'symbol {ticker}', f'{ticker}:', f'${ticker}.L', f'({ticker}.L)',
+            f'{ticker}.DE', f'({rng.randint(1000, 9999)}.T)', f'{rng.randint(1000, 9999)}.HK',
+            rng.choice(['CEO:', 'Q3:', 'U.S. markets', 'Update: strong', '(SEC)'])][form]
+
+
+def news_corpus(rows, seed=0):
+    """DataFrame of title, text and ticker (all missing) news articles"""
+    import pandas as pd
+
+    rng = random.Random(seed)
+    universe = _universe(rng)
+    titles, texts = [], []
+    for _ in range(rows):
+        company, ticker = rng.choice(universe)
+        title = rng.choices(FILLER, k=rng.randint(5, 12))
+        if rng.random() < 0.5:
+            title.insert(rng.randrange(len(title) + 1), company)
+        words = rng.choices(FILLER, k=rng.randint(20, 120))
+        for _ in range(rng.randint(0, 3)):
+            words.insert(rng.randrange(len(words) + 1), _mention(rng, *rng.choice(universe)))
+        title = ' '.join(title)
+        titles.append(title[0].upper() + title[1:])
+        texts.append(' '.join(words))
+    return pd.DataFrame({'title': titles, 'text': texts, 'ticker': None})
+
+
+def headline_corpus(rows, seed=0):
+    """Reddit-style headlines mentioning the dashboard's tickers"""
+    from ticker_tagging import VALID_TICKERS
+
+    rng = random.Random(seed)
+    tickers = sorted(VALID_TICKERS)
+    headlines = []
+    for _ in range(rows):
+        words = rng.choices(REDDIT_WORDS, k=rng.randint(4, 20))
+        for _ in range(rng.randint(0, 2)):
+            ticker = rng.choice(tickers)
+            words.insert(rng.randrange(len(words) + 1), f'${ticker}' if rng.random() < 0.5 else ticker)
+        if rng.random() < 0.3:
+            words.append(rng.choice(REDDIT_EXTRAS))
+        if rng.random() < 0.05:
+            # Rare made-up words keep the lemma cache growing like real data
+            words.append(''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(4, 9))))
+        headline = ' '.join(words)
+        headlines.append(headline[0].upper() + headline[1:])
+    return headlines
+
+
+def scored_corpus(rows, seed=0):
+    """Scored rows: date, ticker and sector lists, sentiment_score"""
+    import numpy as np
+    import pandas as pd
+    from ticker_tagging import SECTOR_MAP
+
+    rng = np.random.default_rng(seed)
+    tickers = sorted(SECTOR_MAP)
+    counts = rng.integers(0, 4, rows)
+    picks = rng.integers(0, len(tickers), counts.sum())
+    offsets = np.concatenate(([0], np.cumsum(counts)))
+    ticker_lists = [[tickers[i] for i in picks[offsets[r]:offsets[r + 1]]] for r in range(rows)]
+    return pd.DataFrame({
+        'date': pd.Timestamp('2022-01-01') + pd.to_timedelta(rng.integers(0, 3 * 365, rows), unit='D'),
+        'tickers': ticker_lists,
+        'sectors': [sorted({SECTOR_MAP[t] for t in row}) for row in ticker_lists],
+        'sentiment_score': rng.uniform(-100, 100, rows),
+    })
+
+
+# Each case builds its inputs (not measured) and returns the function to time
+
+def case_extract_ticker(rows, args):
+    from smart_ticker_extraction import SmartTickerExtractor
+    records = news_corpus(rows, args.seed).to_dict('records')
+    extractor = SmartTickerExtractor()
+    return lambda: [extractor.extract_ticker(row) for row in records]
+
+
+def case_tag_titles(rows, args):
+    from ticker_tagging import TickerTagger, tag_titles
+    headlines = headline_corpus(rows, args.seed)
+    tagger = TickerTagger()
+    return lambda: tag_titles(headlines, tagger)
+
+
+def case_clean_reddit_headline(rows, args):
+    from text_preprocessing import clean_reddit_headline, get_lemmatizer
+    headlines = headline_corpus(rows, args.seed)
+    # Load WordNet now rather than in the timed run (no corpus word is lemmatized)
+    get_lemmatizer().lemmatize('warmup')
+    return lambda: [clean_reddit_headline(h) for h in headlines]
+
+
+def case_clean_reddit_headlines(rows, args):
+    from text_preprocessing import clean_reddit_headlines, get_lemmatizer
+    headlines = headline_corpus(rows, args.seed)
+    # Load WordNet now rather than in the timed run (no corpus word is lemmatized)
+    get_lemmatizer().lemmatize('warmup')
+    return lambda: clean_reddit_headlines(headlines)
+
+
+def case_predict_sentiment(rows, args):
+    import joblib
+    from sentiment_model import load_model, predict_sentiment
+    headlines = headline_corpus(rows, args.seed)
+    vocab = joblib.load(args.vocab)
+    le = joblib.load(args.label_encoder)
+    model = load_model(args.model, len(vocab), len(le.classes_))
+    return lambda: [predict_sentiment(h, model, vocab, le) for h in headlines]
+
+
+def case_score(rows, args):
+    from sentiment_inference import SentimentScorer
+    headlines = headline_corpus(rows, args.seed)
+    scorer = SentimentScorer.load(args.model, args.vocab, args.label_encoder, backend=args.backend)
+    return lambda: scorer.score(headlines)
+
+
+def case_rolling_aggregation(rows, args):
+    from sentiment_aggregates import daily_sums, rolling_sums
+    df = scored_corpus(rows, args.seed)
+    return lambda: [rolling_sums(daily_sums(df, kind)) for kind in ('ticker', 'sector')]
+
+
+CASES = {name[5:]: case for name, case in globals().items() if name.startswith('case_')}
+
+
+def _status_kb(field):
+    with open('/proc/self/status') as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ':'))
+
+
+def _reset_peak():
+    """Reset the peak resident set size (Linux); returns the current one in KB, or None"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return _status_kb('VmRSS')
+    except OSError:
+        return None
+
+
+def run_case(name, rows, args):
+    """Run one case in this process: {'rows', 'seconds', 'rows_per_sec', 'peak_mb'}"""
+    run = CASES[name](rows, args)
+    gc.collect()
+    start_kb = _reset_peak()
+    started = time.perf_counter()
+    run()
+    seconds = time.perf_counter() - started
+    peak_mb = (_status_kb('VmHWM') - start_kb) / 1024 if start_kb is not None else None
+    return {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds, 'peak_mb': peak_mb}
+
+
+def measure(name, rows, args):
+    """Best of --repeat fresh processes, or {'skipped': reason}"""
+    command = [sys.executable, os.path.abspath(__file__), '--child', name, '--sizes', str(rows),
+               '--seed', str(args.seed), '--model', args.model, '--vocab', args.vocab,
+               '--label-encoder', args.label_encoder, '--backend', args.backend]
+    runs = []
+    for _ in range(args.repeat):
+        out = subprocess.run(command, cwd=HERE, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f'{name} failed on {rows:,} rows:\n{out.stderr}')
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        if 'skipped' in r:
+            return r
+        runs.append(r)
+    best = max(runs, key=lambda r: r['rows_per_sec'])
+    if best['peak_mb'] is not None:
+        best['peak_mb'] = min(r['peak_mb'] for r in runs)
+    return best
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of results against baseline, as printable lines"""
+    problems = []
+    for name, sizes in results.items():
+        for size, r in sizes.items():
+            old = baseline.get(name, {}).get(size)
+            if old is None or 'skipped' in old:
+                continue
+            if 'skipped' in r:
+                # A missing dependency must not let a baselined case pass unmeasured
+                problems.append(f"{name} {int(size):,} rows: skipped ({r['skipped']}), "
+                                f"baseline {old['rows_per_sec']:,.0f} rows/s")
+                continue
+            if r['rows_per_sec'] < old['rows_per_sec'] * (1 - tolerance):
+                problems.append(f"{name} {int(size):,} rows: {r['rows_per_sec']:,.0f} rows/s, "
+                                f"baseline {old['rows_per_sec']:,.0f}")
+            if (r['peak_mb'] is not None and old['peak_mb'] is not None
+                    and r['peak_mb'] > max(old['peak_mb'], MEMORY_SLACK_MB) * (1 + tolerance)):
+                problems.append(f"{name} {int(size):,} rows: peak {r['peak_mb']:,.1f} MB, "
+                                f"baseline {old['peak_mb']:,.1f} MB")
+    return problems
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(), 'cpus': os.cpu_count()}
+
+
+def main():
+    from sentiment_inference import BACKENDS, LABEL_ENCODER_PATH, MODEL_PATH, VOCAB_PATH
+
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic corpora')
+    parser.add_argument('--cases', nargs='+', choices=sorted(CASES), default=list(CASES))
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='corpus rows')
+    parser.add_argument('--repeat', type=int, default=1, help='fresh processes per case and size (best is kept)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--model', default=MODEL_PATH, help='model for predict_sentiment and score')
+    parser.add_argument('--vocab', default=VOCAB_PATH)
+    parser.add_argument('--label-encoder', default=LABEL_ENCODER_PATH)
+    parser.add_argument('--backend', choices=BACKENDS, default='torch', help='SentimentScorer backend for score')
+    parser.add_argument('--json', help='also write the results to this file')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='baseline file for --save-baseline / --check')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline')
+    parser.add_argument('--check', action='store_true', help='exit 1 if a case regressed against --baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown / memory growth for --check (0.25 = 25%%)')
+    parser.add_argument('--child', choices=sorted(CASES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        try:
+            print(json.dumps(run_case(args.child, args.sizes[0], args)))
+        except (ImportError, LookupError, OSError) as e:
+            # Missing package, NLTK corpus (a plain LookupError) or model file
+            if isinstance(e, LookupError) and type(e) is not LookupError:
+                raise
+            reason = next((line.strip() for line in str(e).splitlines() if any(c.isalpha() for c in line)), '')
+            print(json.dumps({'skipped': f'{type(e).__name__}: {reason}'}))
+        return
+
+    results = {}
+    print(f"{'case':<26}{'rows':>10}{'rows/s':>12}{'seconds':>10}{'peak MB':>10}")
+    for name in args.cases:
+        results[name] = {}
+        for rows in args.sizes:
+            r = results[name][str(rows)] = measure(name, rows, args)
+            if 'skipped' in r:
+                print(f"{name:<26}{rows:>10,}  skipped: {r['skipped']}")
+                continue
+            peak = f"{r['peak_mb']:>10.1f}" if r['peak_mb'] is not None else f"{'n/a':>10}"
+            print(f"{name:<26}{rows:>10,}{r['rows_per_sec']:>12,.0f}{r['seconds']:>10.2f}{peak}")
+
+    report = {'machine': machine(), 'seed': args.seed, 'backend': args.backend, 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved results to {args.json}")
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    if args.check:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        problems = compare(results, baseline['results'], args.tolerance)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            raise SystemExit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == '__main__':
+    main()
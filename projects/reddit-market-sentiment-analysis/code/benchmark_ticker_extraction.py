@@ -0,0 +1,135 @@
+# benchmark_ticker_extraction.py
+
+"""
+Benchmark for the precompiled SmartTickerExtractor scanner.
+
+Compares SmartTickerExtractor.extract_pattern_tickers against the original
+scorer (every pattern run through re.finditer on every call) and checks
+that both return exactly the same per-ticker confidence scores.
+
+Also compares the step 2 cached-company lookup (Aho-Corasick index) with
+the original loop over company_ticker_cache at a few cache sizes.
+
+Usage:
+    python benchmark_ticker_extraction.py                      # synthetic corpus
+    python benchmark_ticker_extraction.py --pickle financial_news_df.pkl
+"""
+
+import argparse
+import random
+import re
+import time
+from collections import defaultdict
+
+from smart_ticker_extraction import SmartTickerExtractor
+
+
+def legacy_extract_pattern_tickers(extractor, text):
+    """The scorer as it was before the scanner was precompiled"""
+    ticker_scores = defaultdict(float)
+    for pattern, group_idx, score in extractor.patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            ticker = match.group(group_idx if group_idx > 0 else 0).upper()
+            if extractor._check_ticker(ticker):
+                ticker_scores[ticker] += score
+    return ticker_scores
+
+
+def legacy_find_cached_company(cache, full_text):
+    """Step 2 of extract_ticker as it was: one substring test per cache entry"""
+    for company_name in cache:
+        if company_name in full_text.lower():
+            return company_name
+    return None
+
+
+def make_company_cache(n_names, seed=42):
+    """Learned-cache stand-in: lowercase company names -> tickers"""
+    rng = random.Random(seed)
+    syllables = ['al', 'bex', 'cor', 'dyn', 'en', 'fax', 'gen', 'hal', 'ion', 'jet',
+                 'kor', 'lum', 'mar', 'nov', 'or', 'pax', 'quin', 'ros', 'syn', 'tor']
+    suffixes = ['inc', 'corp', 'holdings', 'group', 'plc', 'ltd']
+    cache = {'apple inc': 'AAPL', 'tesla motors': 'TSLA'}
+    while len(cache) < n_names:
+        name = ''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4)))
+        cache[f'{name} {rng.choice(suffixes)}'] = name[:4].upper()
+    return cache
+
+
+def make_synthetic_articles(n_rows, seed=42):
+    """Build news-like articles that exercise every ticker pattern"""
+    rng = random.Random(seed)
+    filler = ('the company said shares rose fell sharply on monday after '
+              'analysts raised their outlook for revenue and margins in the '
+              'quarter while investors weighed rates inflation and demand').split()
+    mentions = [
+        'Apple Inc. (AAPL)', '$TSLA', 'NYSE: IBM', '(NASDAQ: MSFT)', 'ticker symbol GOOG',
+        'trades as NVDA', 'symbol AMD', 'Update: strong', 'ticker: META', '$LLOY.L',
+        '(BP.L)', 'VOD.L', '(7203.T)', '5401.T', 'CEO:', 'U.S. markets', 'Q3:',
+    ]
+    articles = []
+    for _ in range(n_rows):
+        words = [rng.choice(filler) for _ in range(rng.randint(40, 300))]
+        for _ in range(rng.randint(0, 4)):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(mentions))
+        articles.append(' '.join(words))
+    return articles
+
+
+def time_scorer(fn, texts, repeat=3):
+    """Best-of-N wall time for scoring every text once"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ticker pattern scanner')
+    parser.add_argument('--rows', type=int, default=5000, help='synthetic articles to generate')
+    parser.add_argument('--pickle', help='score title + text from this news dataframe instead')
+    args = parser.parse_args()
+
+    if args.pickle:
+        import pandas as pd
+        df = pd.read_pickle(args.pickle).head(args.rows)
+        texts = (df['title'].astype(str) + ' ' + df['text'].fillna('').astype(str).str[:2000]).tolist()
+    else:
+        texts = make_synthetic_articles(args.rows)
+
+    # Context windows like the ones find_ticker_near_name scores
+    windows = [text[:300] for text in texts]
+
+    extractor = SmartTickerExtractor()
+
+    print('Checking output against the original scorer')
+    for text in texts + windows:
+        if extractor.extract_pattern_tickers(text) != legacy_extract_pattern_tickers(extractor, text):
+            raise AssertionError(f'Scores differ for: {text[:100]}...')
+    print(f'  Identical scores on {len(texts) + len(windows):,} texts\n')
+
+    for label, corpus in (('Full articles', texts), ('Context windows', windows)):
+        old = time_scorer(lambda t: legacy_extract_pattern_tickers(extractor, t), corpus)
+        new = time_scorer(extractor.extract_pattern_tickers, corpus)
+        print(f'{label} ({len(corpus):,} texts)')
+        print(f'  Original scorer:   {old:8.3f}s ({len(corpus) / old:10,.0f} texts/s)')
+        print(f'  Compiled scanner:  {new:8.3f}s ({len(corpus) / new:10,.0f} texts/s)')
+        print(f'  Speedup:           {old / new:8.2f}x\n')
+
+    print('Step 2 cached-company lookup')
+    for cache_size in (100, 1000, 10000):
+        extractor.company_ticker_cache = make_company_cache(cache_size)
+        cache = extractor.company_ticker_cache
+        for text in texts:
+            if extractor.find_cached_company(text) != legacy_find_cached_company(cache, text):
+                raise AssertionError(f'Lookup differs for: {text[:100]}...')
+        old = time_scorer(lambda t: legacy_find_cached_company(cache, t), texts, repeat=1)
+        new = time_scorer(extractor.find_cached_company, texts, repeat=1)
+        print(f'  {cache_size:6,} names: original {old:7.3f}s, index {new:7.3f}s ({old / new:6.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# collector_state.py
+
+"""
+Checkpoints and seen-post index for incremental Reddit collection.
+
+reddit_collector.py --incremental uses this SQLite file to fetch only what
+is new since the last run:
+- checkpoints: the newest created_utc collected for each (ticker, subreddit)
+  pair. A search stops paging once it reaches posts older than the oldest
+  checkpoint of the pairs it covers.
+- seen_posts: every submission id already written to the output, so posts
+  seen in an earlier run (or returned again by an overlapping search) are
+  not appended twice. Ids are added as each batch of posts is flushed, so
+  an interrupted run can be resumed without writing them again.
+
+Every run is logged in the runs table. The schema version is kept in
+PRAGMA user_version.
+
+Usage:
+    state = CollectorState('data/collector_state.db')
+    checkpoints = state.checkpoints()
+    ...
+    new_ids = state.unseen(ids)
+    state.add_posts(written)          # after every flushed batch
+    state.commit_run(newest, new_posts, mode='incremental')
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA_VERSION = 1
+
+
+class CollectorState:
+    """SQLite-backed per-pair high-water marks and submission id index"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'{self.path} uses collector schema v{version}; '
+                               f'this code only understands up to v{SCHEMA_VERSION}')
+
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    ticker      TEXT NOT NULL,
+                    subreddit   TEXT NOT NULL,
+                    newest_utc  REAL NOT NULL,
+                    updated_at  TEXT NOT NULL,
+                    PRIMARY KEY (ticker, subreddit)
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS seen_posts (
+                    id           TEXT PRIMARY KEY,
+                    created_utc  REAL NOT NULL,
+                    collected_at TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                    finished_at TEXT NOT NULL,
+                    mode        TEXT NOT NULL,
+                    new_posts   INTEGER NOT NULL,
+                    pairs       INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM seen_posts').fetchone()[0]
+
+    def checkpoints(self):
+        """(ticker, subreddit) -> newest created_utc collected"""
+        rows = self.conn.execute('SELECT ticker, subreddit, newest_utc FROM checkpoints')
+        return {(ticker, sub): newest for ticker, sub, newest in rows}
+
+    def unseen(self, ids):
+        """The ids that are not in the index yet, in their original order"""
+        ids = list(ids)
+        seen = set()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            seen.update(row[0] for row in self.conn.execute(
+                f'SELECT id FROM seen_posts WHERE id IN ({placeholders})', chunk))
+        return [i for i in ids if i not in seen]
+
+    def reset(self):
+        """Forget every checkpoint and seen id (a full run starts over)"""
+        with self.conn:
+            self.conn.execute('DELETE FROM seen_posts')
+            self.conn.execute('DELETE FROM checkpoints')
+
+    def add_posts(self, posts):
+        """Index (id, created_utc) of posts that are now on disk"""
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO seen_posts VALUES (?, ?, ?)',
+                [(post_id, created, now) for post_id, created in posts])
+
+    def commit_run(self, newest, new_posts, mode='incremental'):
+        """
+        Record a finished run in one transaction.
+
+        newest     (ticker, subreddit) -> newest created_utc its searches saw;
+                   checkpoints only ever move forward
+        new_posts  number of posts the run wrote
+        mode       label for the runs log ('full', 'resume', 'incremental')
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO checkpoints VALUES (?, ?, ?, ?) '
+                'ON CONFLICT (ticker, subreddit) DO UPDATE SET '
+                'newest_utc = MAX(newest_utc, excluded.newest_utc), updated_at = excluded.updated_at',
+                [(ticker, sub, utc, now) for (ticker, sub), utc in newest.items()])
+            self.conn.execute(
+                'INSERT INTO runs (finished_at, mode, new_posts, pairs) VALUES (?, ?, ?, ?)',
+                (now, mode, new_posts, len(newest)))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,128 @@
+# company_ticker_store.py
+
+"""
+Persistent company -> ticker cache for SmartTickerExtractor.
+
+The extractor learns pairs like 'Apple Inc. (AAPL)' as it reads articles.
+This module keeps those pairs in a small SQLite file so the next run starts
+with everything learned before instead of relearning it from nothing.
+
+For each company the store records:
+- the current ticker (the last one seen, as in the in-memory cache)
+- rank: the order the company was first learned in, so "first cached name
+  found in the text wins" gives the same answer after a reload
+- source: where the mapping was first learned (input file or label)
+- seen_count, first_seen and last_seen
+
+Every merge is logged in the runs table. The schema version is kept in
+PRAGMA user_version.
+
+Usage:
+    store = CompanyTickerStore('company_ticker_cache.db')
+    extractor = SmartTickerExtractor(company_ticker_cache=store.load())
+    ...
+    store.merge(extractor.company_ticker_cache, extractor.company_counts, source='news.parquet')
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+
+SCHEMA_VERSION = 1
+
+
+class CompanyTickerStore:
+    """SQLite-backed company -> ticker mappings with provenance and counts"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'{self.path} uses cache schema v{version}; '
+                               f'this code only understands up to v{SCHEMA_VERSION}')
+
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS company_tickers (
+                    company    TEXT PRIMARY KEY,
+                    ticker     TEXT NOT NULL,
+                    rank       INTEGER NOT NULL,
+                    source     TEXT,
+                    seen_count INTEGER NOT NULL DEFAULT 0,
+                    first_seen TEXT NOT NULL,
+                    last_seen  TEXT NOT NULL
+                )
+            """)
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_id      INTEGER PRIMARY KEY AUTOINCREMENT,
+                    finished_at TEXT NOT NULL,
+                    source      TEXT,
+                    new_pairs   INTEGER NOT NULL,
+                    updated     INTEGER NOT NULL
+                )
+            """)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM company_tickers').fetchone()[0]
+
+    def load(self):
+        """All mappings as a dict, in the order they were first learned"""
+        rows = self.conn.execute('SELECT company, ticker FROM company_tickers ORDER BY rank')
+        return dict(rows)
+
+    def merge(self, cache, counts=None, source=None):
+        """
+        Fold a run's cache into the store.
+
+        cache   company -> ticker, in learning order (extractor.company_ticker_cache)
+        counts  company -> times seen this run (extractor.company_counts)
+        source  label recorded for companies learned for the first time
+
+        New companies are appended after the existing ones; known companies
+        take the run's ticker and add to their seen_count. Entries that were
+        loaded from the store and not seen again are left alone.
+        Returns (new_pairs, updated).
+        """
+        counts = counts or {}
+        now = datetime.now(timezone.utc).isoformat()
+        stored = dict(self.conn.execute('SELECT company, ticker FROM company_tickers'))
+        next_rank = self.conn.execute('SELECT COALESCE(MAX(rank) + 1, 0) FROM company_tickers').fetchone()[0]
+
+        inserts, updates = [], []
+        for company, ticker in cache.items():
+            seen = counts.get(company, 0)
+            if company not in stored:
+                inserts.append((company, ticker, next_rank, source, seen, now, now))
+                next_rank += 1
+            elif seen or stored[company] != ticker:
+                updates.append((ticker, seen, now, company))
+
+        with self.conn:
+            self.conn.executemany(
+                'INSERT INTO company_tickers VALUES (?, ?, ?, ?, ?, ?, ?)', inserts)
+            self.conn.executemany(
+                'UPDATE company_tickers SET ticker = ?, seen_count = seen_count + ?, last_seen = ? '
+                'WHERE company = ?', updates)
+            self.conn.execute(
+                'INSERT INTO runs (finished_at, source, new_pairs, updated) VALUES (?, ?, ?, ?)',
+                (now, source, len(inserts), len(updates)))
+
+        return len(inserts), len(updates)
+
+    def provenance(self, company):
+        """Stored record for one company (lowercase name), or None"""
+        row = self.conn.execute(
+            'SELECT company, ticker, source, seen_count, first_seen, last_seen '
+            'FROM company_tickers WHERE company = ?', (company,)).fetchone()
+        if row is None:
+            return None
+        keys = ('company', 'ticker', 'source', 'seen_count', 'first_seen', 'last_seen')
+        return dict(zip(keys, row))
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,62 @@
+# downsampling.py
+
+"""
+Largest-Triangle-Three-Buckets (LTTB) downsampling for dashboard traces.
+
+A time series with more points than the browser needs is cut down to a
+point budget while keeping its visual shape: the first and last points are
+kept, the rest is split into equal buckets, and from each bucket the point
+forming the largest triangle with the previously kept point and the next
+bucket's average is kept. Peaks and dips survive, unlike with striding.
+
+Usage:
+    keep = lttb_indices(x, y, 1000)
+    x, y = x[keep], y[keep]
+"""
+
+import numpy as np
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Sorted indices of at most threshold points of (x, y) chosen by LTTB.
+    x must be increasing (datetimes are fine). With threshold < 3 or no more
+    points than threshold, every index is returned.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype('datetime64[ns]').astype(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    # Bucket edges over the points between the fixed first and last ones
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[nlo:nhi].mean()
+        avg_y = y[nlo:nhi].mean()
+        # Twice the triangle areas; the constant factor doesn't change the argmax
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def downsample(x, y, threshold):
+    """(x, y) cut to at most threshold points with LTTB; NaN points are dropped first"""
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    valid = ~np.isnan(y)
+    if not valid.all():
+        x, y = x[valid], y[valid]
+    keep = lttb_indices(x, y, threshold)
+    return x[keep], y[keep]
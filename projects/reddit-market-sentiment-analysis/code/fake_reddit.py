@@ -0,0 +1,120 @@
+# fake_reddit.py
+
+"""
+Local stand-in for the parts of the PRAW API that reddit_collector.py uses.
+
+Lets the collector run offline (python reddit_collector.py --fake) for
+demos, benchmarks and checks: no network and no credentials needed.
+Results are deterministic for a given seed. It can simulate request latency
+and transient server errors, and it counts the requests it receives.
+
+Supported surface:
+    reddit.subreddit("stocks").search(query, sort="new", time_filter="year", limit=250)
+    reddit.subreddit("stocks+investing")   # multireddit syntax
+"""
+
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+
+PAGE_SIZE = 100
+
+WORDS = [
+    "earnings", "beat", "miss", "guidance", "calls", "puts", "bullish", "bearish",
+    "dividend", "buyback", "layoffs", "upgrade", "downgrade", "rally", "selloff",
+    "short", "squeeze", "valuation", "outlook", "holding", "buying", "selling",
+]
+
+
+class FakeServerError(Exception):
+    """Transient failure, like a 5xx from Reddit"""
+
+
+class FakeSubmission:
+    def __init__(self, id, title, created_utc, subreddit):
+        self.id = id
+        self.title = title
+        self.created_utc = created_utc
+        self.subreddit = subreddit
+
+
+class FakeSubreddit:
+    def __init__(self, reddit, display_name):
+        self._reddit = reddit
+        self.display_name = display_name
+
+    def search(self, query, sort="new", time_filter="year", limit=250):
+        # Every page is one request, like Reddit's listing API
+        posts = self._reddit._posts_for(self.display_name, query)
+        posts = posts[:limit] if limit is not None else posts
+        for start in range(0, len(posts), PAGE_SIZE):
+            self._reddit._request()
+            yield from posts[start:start + PAGE_SIZE]
+
+
+class FakeReddit:
+    """
+    Fake reddit client.
+
+    posts_per_sub   posts in each subreddit's synthetic history
+    latency         seconds slept per request
+    failure_rate    chance that a request raises FakeServerError
+    """
+
+    def __init__(self, tickers, posts_per_sub=400, days=365, latency=0.0,
+                 failure_rate=0.0, seed=0, now=None):
+        self.tickers = list(tickers)
+        self.posts_per_sub = posts_per_sub
+        self.days = days
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.seed = seed
+        self.now = now or datetime.now(timezone.utc).timestamp()
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._history = {}
+
+    def subreddit(self, name):
+        return FakeSubreddit(self, name)
+
+    def _request(self):
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.failure_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise FakeServerError("503 Service Unavailable")
+
+    def _subreddit_history(self, sub):
+        """Newest-first synthetic posts for one subreddit (built once)"""
+        with self._lock:
+            if sub not in self._history:
+                rng = random.Random(zlib.crc32(f"{self.seed}:{sub}".encode()))
+                posts = []
+                for i in range(self.posts_per_sub):
+                    mentioned = rng.sample(self.tickers, k=rng.randint(1, 2))
+                    words = rng.sample(WORDS, k=4)
+                    title = f"{mentioned[0]} {words[0]} {words[1]} " + " ".join(
+                        f"${t}" for t in mentioned[1:]) + f" {words[2]} {words[3]}"
+                    created = self.now - rng.uniform(0, self.days * 86400)
+                    post_id = f"{zlib.crc32(sub.encode()):08x}{i:05x}"
+                    posts.append(FakeSubmission(post_id, title.strip(), created, sub))
+                posts.sort(key=lambda p: p.created_utc, reverse=True)
+                self._history[sub] = posts
+            return self._history[sub]
+
+    def _posts_for(self, subreddit_spec, query):
+        """Posts matching a query: bare words and 'A OR B' lists, any case"""
+        terms = {t.strip().strip('"').upper() for t in query.split(" OR ") if t.strip()}
+        posts = []
+        for sub in subreddit_spec.split("+"):
+            for post in self._subreddit_history(sub):
+                words = {w.strip("$").upper() for w in post.title.split()}
+                if not terms or terms & words:
+                    posts.append(post)
+        posts.sort(key=lambda p: p.created_utc, reverse=True)
+        return posts
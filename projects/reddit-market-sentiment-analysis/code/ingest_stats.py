@@ -0,0 +1,234 @@
+# ingest_stats.py
+
+"""
+Load the sentiment statistics into the dashboard database.
+
+The notebooks write *_sentiment_stats_90d.csv files that used to be loaded
+into the reddit_* / merged_*_sentiment_stats tables by hand. This job
+loads them itself, from the CSV / Parquet files or straight from a
+SentimentAggregates store (sentiment_aggregates.py):
+- rows are bulk-loaded into a temporary staging table: COPY on Postgres,
+  batched executemany elsewhere (SQLite as a local stand-in)
+- one INSERT ... ON CONFLICT (<kind>, date) DO UPDATE moves them into the
+  stats table, touching only new rows and rows whose scores changed
+- the weekly and monthly rollup tables (<table>_weekly, <table>_monthly,
+  one row per entity and period with the mean of its daily scores and
+  its number of days) are recomputed from the first changed period on,
+  so re-loading unchanged stats costs no rollup work
+
+Everything for one table happens in one transaction: the dashboard sees
+the old rows or the new ones. DashboardData serves wide date ranges from
+the rollups (see dashboard_data.py).
+
+Usage:
+    python ingest_stats.py --source reddit --aggregates data/reddit_aggregates.db
+    python ingest_stats.py --source merged --ticker merged_ticker_sentiment_stats_90d.csv \\
+        --sector merged_sector_sentiment_stats_90d.csv
+The database comes from DASHBOARD_DB_URL or the SSH_* / DB_* variables,
+as for the dashboard.
+"""
+
+import argparse
+import io
+import time
+
+import pandas as pd
+from sqlalchemy import Column, Date, Float, Integer, MetaData, String, Table, text
+
+from dashboard_data import PERIODS, SCORE_COLUMNS, TABLES, DashboardData, period_start, rollup_table
+from metrics import METRICS, instrumented
+
+# Rows per executemany batch when COPY is not available
+BATCH_ROWS = 10000
+# DB-API placeholder per driver paramstyle, for those executemany batches
+PLACEHOLDERS = {'qmark': '?', 'format': '%s', 'pyformat': '%s'}
+
+
+def stats_table(metadata, name, kind, rollup=False, **kwargs):
+    """A stats table (or rollup) keyed by (<kind>, date)"""
+    columns = [Column(kind, String, primary_key=True), Column('date', Date, primary_key=True),
+               *(Column(column, Float) for column in SCORE_COLUMNS)]
+    if rollup:
+        columns.append(Column('days', Integer, nullable=False))
+    return Table(name, metadata, *columns, **kwargs)
+
+
+def read_stats(path, kind):
+    """date, <kind> and the score columns of a stats CSV or Parquet file"""
+    columns = ['date', kind, *SCORE_COLUMNS]
+    if path.endswith('.parquet'):
+        df = pd.read_parquet(path, columns=columns)
+    else:
+        df = pd.read_csv(path, usecols=columns)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def rollup(daily, kind, grain):
+    """Mean scores and day count per (<kind>, first day of the week / month)"""
+    periods = daily['date'].dt.to_period(PERIODS[grain]).dt.start_time
+    grouped = daily.groupby([daily[kind], periods.rename('date')], sort=True)
+    out = grouped[list(SCORE_COLUMNS)].mean()
+    out['days'] = grouped.size()
+    return out.reset_index()
+
+
+class StatsIngester:
+    """Upserts stats into the dashboard tables and keeps their rollups current"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.metadata = MetaData()
+        self.tables = {}
+        for (source, kind), name in TABLES.items():
+            self.tables[source, kind, 'daily'] = stats_table(self.metadata, name, kind)
+            for grain in PERIODS:
+                self.tables[source, kind, grain] = stats_table(
+                    self.metadata, rollup_table(name, grain), kind, rollup=True)
+
+    def ensure_tables(self):
+        """
+        Create missing stats and rollup tables. Tables that were loaded by
+        hand get the unique (<kind>, date) index ON CONFLICT needs; this
+        fails if they hold duplicate days.
+        """
+        self.metadata.create_all(self.engine, checkfirst=True)
+        with self.engine.begin() as connection:
+            for (source, kind), name in TABLES.items():
+                connection.execute(text(
+                    f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{name}_{kind}_date" ON "{name}" ("{kind}", "date")'))
+
+    def _bulk_insert(self, connection, table, df):
+        columns = [column.name for column in table.columns]
+        names = ', '.join(f'"{c}"' for c in columns)
+        df = df[columns]
+        cursor = connection.connection.cursor()
+        try:
+            if connection.dialect.name == 'postgresql':
+                buffer = io.StringIO()
+                df.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d')
+                buffer.seek(0)
+                cursor.copy_expert(f'COPY "{table.name}" ({names}) FROM STDIN WITH (FORMAT csv)', buffer)
+                return
+            # Plain tuples through the driver's executemany: SQLAlchemy's per-row
+            # parameter processing costs more than the insert itself
+            df = df.assign(date=df['date'].dt.strftime('%Y-%m-%d')).astype(object)
+            rows = list(df.where(df.notna(), None).itertuples(index=False, name=None))
+            placeholders = ', '.join([PLACEHOLDERS[connection.dialect.paramstyle]] * len(columns))
+            sql = f'INSERT INTO "{table.name}" ({names}) VALUES ({placeholders})'
+            for i in range(0, len(rows), BATCH_ROWS):
+                cursor.executemany(sql, rows[i:i + BATCH_ROWS])
+        finally:
+            cursor.close()
+
+    def ingest(self, source, kind, df):
+        """
+        Upsert one stats table from a DataFrame with date, <kind> and the
+        score columns, then refresh its rollups from the first changed
+        period. Returns counts of the rows read, changed and rolled up.
+        """
+        target = self.tables[source, kind, 'daily']
+        df = df.dropna(subset=['date', kind]).drop_duplicates(['date', kind], keep='last')
+        df = df.assign(date=pd.to_datetime(df['date']).dt.normalize())
+        staging = stats_table(MetaData(), f'staging_{target.name}', kind, prefixes=['TEMPORARY'])
+        distinct = 'IS DISTINCT FROM' if self.engine.dialect.name == 'postgresql' else 'IS NOT'
+        def changed_from(new):
+            return ' OR '.join(f't.{c} {distinct} {new}.{c}' for c in SCORE_COLUMNS)
+        names = ', '.join(['"date"', f'"{kind}"', *SCORE_COLUMNS])
+
+        with METRICS.timer('ingest_table_seconds', table=target.name), self.engine.begin() as connection:
+            staging.create(connection)
+            with METRICS.timer('ingest_bulk_load_seconds', table=target.name):
+                self._bulk_insert(connection, staging, df)
+            first = connection.execute(text(
+                f'SELECT MIN(s."date") FROM "{staging.name}" AS s LEFT JOIN "{target.name}" AS t '
+                f'ON t."{kind}" = s."{kind}" AND t."date" = s."date" '
+                f'WHERE t."date" IS NULL OR {changed_from("s")}')).scalar()
+            changed = 0
+            if first is not None:
+                # WHERE true: SQLite needs it to parse ON CONFLICT after INSERT ... SELECT
+                changed = connection.execute(text(
+                    f'INSERT INTO "{target.name}" AS t ({names}) SELECT {names} FROM "{staging.name}" WHERE true '
+                    f'ON CONFLICT ("{kind}", "date") DO UPDATE SET '
+                    + ', '.join(f'{c} = excluded.{c}' for c in SCORE_COLUMNS)
+                    + f' WHERE {changed_from("excluded")}')).rowcount
+            staging.drop(connection)
+            rolled = self._refresh_rollups(connection, source, kind, first) if first is not None else 0
+        METRICS.inc('ingest_rows_total', len(df), table=target.name)
+        METRICS.inc('ingest_changed_rows_total', changed, table=target.name)
+        METRICS.inc('ingest_rollup_rows_total', rolled, table=target.name)
+        return {'rows': len(df), 'changed': changed, 'rollup_rows': rolled}
+
+    def _refresh_rollups(self, connection, source, kind, since=None):
+        """Recompute every rollup period from the one containing since (all periods if None)"""
+        daily = self.tables[source, kind, 'daily']
+        since = None if since is None else pd.Timestamp(since)
+        start = None if since is None else min(period_start(since, grain) for grain in PERIODS)
+        sql = f'SELECT "date", "{kind}", {", ".join(SCORE_COLUMNS)} FROM "{daily.name}"'
+        params = {}
+        if start is not None:
+            sql += ' WHERE "date" >= :start'
+            params['start'] = start.date()
+        rows = pd.read_sql(text(sql), connection, params=params)
+        rows['date'] = pd.to_datetime(rows['date'])
+
+        written = 0
+        for grain in PERIODS:
+            table = self.tables[source, kind, grain]
+            first = None if since is None else period_start(since, grain)
+            delete = table.delete()
+            if first is not None:
+                delete = delete.where(table.c.date >= first.date())
+                periods = rollup(rows[rows['date'] >= first], kind, grain)
+            else:
+                periods = rollup(rows, kind, grain)
+            connection.execute(delete)
+            self._bulk_insert(connection, table, periods)
+            written += len(periods)
+        return written
+
+    def rebuild_rollups(self, source, kind):
+        """Recompute one table's rollups from all of its daily rows"""
+        with self.engine.begin() as connection:
+            return self._refresh_rollups(connection, source, kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Upsert sentiment stats into the dashboard database')
+    parser.add_argument('--source', required=True, choices=sorted({source for source, _ in TABLES}))
+    parser.add_argument('--aggregates', help='SentimentAggregates store to read the stats from')
+    parser.add_argument('--days', type=int, help='with --aggregates, only the last DAYS days (default: all)')
+    parser.add_argument('--ticker', help='ticker stats CSV or Parquet file')
+    parser.add_argument('--sector', help='sector stats CSV or Parquet file')
+    parser.add_argument('--rebuild-rollups', action='store_true', help='recompute all rollup periods')
+    args = parser.parse_args()
+    if not (args.aggregates or args.ticker or args.sector):
+        parser.error('give --aggregates or --ticker / --sector')
+
+    if args.aggregates:
+        from sentiment_aggregates import SentimentAggregates
+        aggregates = SentimentAggregates(args.aggregates)
+        frames = {kind: aggregates.stats(kind, days=args.days) for kind in ('ticker', 'sector')}
+        aggregates.close()
+    else:
+        frames = {kind: read_stats(path, kind) for kind, path in (('ticker', args.ticker), ('sector', args.sector))
+                  if path}
+
+    data = DashboardData.from_env()
+    try:
+        ingester = StatsIngester(data.engine)
+        ingester.ensure_tables()
+        for kind, df in frames.items():
+            started = time.perf_counter()
+            counts = ingester.ingest(args.source, kind, df)
+            if args.rebuild_rollups:
+                counts['rollup_rows'] = ingester.rebuild_rollups(args.source, kind)
+            print(f"{TABLES[args.source, kind]}: {counts['rows']:,} rows, {counts['changed']:,} new or changed, "
+                  f"{counts['rollup_rows']:,} rollup rows written in {time.perf_counter() - started:.1f}s")
+    finally:
+        data.close()
+
+
+if __name__ == '__main__':
+    with instrumented('ingest_stats'):
+        main()
@@ -0,0 +1,235 @@
+# metrics.py
+
+"""
+Timers, counters and profiling hooks for the pipeline and the dashboard.
+
+The pipeline's scripts used to report only progress prints and tqdm bars.
+Code on the hot paths now records into one process-wide registry,
+METRICS:
+- METRICS.timer(name, **labels) / METRICS.timed(...) time a block or a
+  function into a histogram (count, sum, max and bucket counts)
+- METRICS.inc(name, value, **labels) adds to a counter
+- METRICS.set(name, value, **labels) sets a gauge
+
+The registry can be exported as Prometheus text (to_prometheus(); app.py
+serves it at /metrics), as a JSON-able snapshot, or printed as a summary
+of where the time went. Snapshots from worker processes are merged into
+the parent's registry with merge().
+
+Command-line runs are wrapped in instrumented(name), which does nothing
+extra unless one of these is set:
+- PIPELINE_METRICS_DIR  append the run's metrics as one JSON line to
+                        <dir>/metrics.jsonl and print the summary
+- PIPELINE_PROFILE      cProfile the run and write <dir>/<name>-<pid>.prof
+                        (open with python -m pstats or snakeviz)
+py-spy can sample a running process without any hook.
+
+Usage:
+    with METRICS.timer('sentiment_model_batch_seconds', backend='numpy'):
+        ...
+    METRICS.inc('reddit_posts_total', len(posts))
+    print(METRICS.to_prometheus())
+"""
+
+import bisect
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds (Prometheus "le" labels)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels_text(labels, extra=()):
+    items = list(labels) + list(extra)
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in items) + '}'
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and timing histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        # (name, labels) -> [count, sum, max, per-bucket counts (last one is +Inf)]
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def observe(self, name, seconds, **labels):
+        key = self._key(name, labels)
+        bucket = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            entry = self._timers.get(key)
+            if entry is None:
+                entry = self._timers[key] = [0, 0.0, 0.0, [0] * (len(self.buckets) + 1)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3][bucket] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()"""
+        def decorate(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, **labels):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def snapshot(self, reset=False):
+        """Every metric as plain lists and dicts (JSON-able, picklable)"""
+        with self._lock:
+            snapshot = {
+                'buckets': list(self.buckets),
+                'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self._counters.items()],
+                'gauges': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in self._gauges.items()],
+                'timers': [{'name': n, 'labels': dict(l), 'count': e[0], 'sum': e[1], 'max': e[2],
+                            'buckets': list(e[3])} for (n, l), e in self._timers.items()],
+            }
+            if reset:
+                self._clear()
+        return snapshot
+
+    def merge(self, snapshot):
+        """Add a snapshot (e.g. from a worker process) into this registry"""
+        if list(snapshot['buckets']) != list(self.buckets):
+            raise ValueError('Cannot merge metrics recorded with different histogram buckets')
+        for counter in snapshot['counters']:
+            self.inc(counter['name'], counter['value'], **counter['labels'])
+        for gauge in snapshot['gauges']:
+            self.set(gauge['name'], gauge['value'], **gauge['labels'])
+        with self._lock:
+            for timer in snapshot['timers']:
+                key = self._key(timer['name'], timer['labels'])
+                entry = self._timers.get(key)
+                if entry is None:
+                    entry = self._timers[key] = [0, 0.0, 0.0, [0] * (len(self.buckets) + 1)]
+                entry[0] += timer['count']
+                entry[1] += timer['sum']
+                entry[2] = max(entry[2], timer['max'])
+                entry[3] = [a + b for a, b in zip(entry[3], timer['buckets'])]
+
+    def _clear(self):
+        self._counters.clear()
+        self._gauges.clear()
+        self._timers.clear()
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def to_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        snapshot = self.snapshot()
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for kind in ('counters', 'gauges'):
+            for metric in sorted(snapshot[kind], key=lambda m: m['name']):
+                declare(metric['name'], 'counter' if kind == 'counters' else 'gauge')
+                lines.append(f"{metric['name']}{_labels_text(metric['labels'].items())} {metric['value']}")
+        bounds = [str(b) for b in self.buckets] + ['+Inf']
+        for timer in sorted(snapshot['timers'], key=lambda m: m['name']):
+            name, labels = timer['name'], list(timer['labels'].items())
+            declare(name, 'histogram')
+            cumulative = 0
+            for bound, count in zip(bounds, timer['buckets']):
+                cumulative += count
+                lines.append(f'{name}_bucket{_labels_text(labels, [("le", bound)])} {cumulative}')
+            lines.append(f"{name}_sum{_labels_text(labels)} {timer['sum']}")
+            lines.append(f"{name}_count{_labels_text(labels)} {timer['count']}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, top=20):
+        """The timers with the most total time, and every counter, as a text table"""
+        snapshot = self.snapshot()
+        timers = sorted(snapshot['timers'], key=lambda t: t['sum'], reverse=True)[:top]
+        counters = sorted(snapshot['counters'], key=lambda c: c['name'])
+        names = {id(m): m['name'] + _labels_text(m['labels'].items()) for m in timers + counters}
+        width = max([len(name) for name in names.values()] + [40]) + 2
+        lines = [f"{'timer':<{width}}{'calls':>10}{'total s':>10}{'mean ms':>10}{'max ms':>10}"]
+        for t in timers:
+            lines.append(f"{names[id(t)]:<{width}}{t['count']:>10,}{t['sum']:>10.2f}"
+                         f"{t['sum'] / t['count'] * 1000:>10.2f}{t['max'] * 1000:>10.2f}")
+        for c in counters:
+            value = f"{c['value']:,.2f}" if isinstance(c['value'], float) else f"{c['value']:,}"
+            lines.append(f"{names[id(c)]:<{width}}{value:>20}")
+        return '\n'.join(lines)
+
+
+METRICS = Metrics()
+
+
+@contextmanager
+def profiling(name):
+    """cProfile the block into $PIPELINE_PROFILE/<name>-<pid>.prof when that variable is set"""
+    directory = os.environ.get('PIPELINE_PROFILE')
+    if not directory:
+        yield
+        return
+    os.makedirs(directory, exist_ok=True)
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        path = os.path.join(directory, f'{name}-{os.getpid()}.prof')
+        profiler.dump_stats(path)
+        print(f"Profile written to {path}")
+
+
+def log_metrics(name, directory=None, metrics=METRICS):
+    """Append name's metrics as one JSON line to <directory>/metrics.jsonl"""
+    directory = directory or os.environ.get('PIPELINE_METRICS_DIR')
+    os.makedirs(directory, exist_ok=True)
+    record = {'run': name, 'pid': os.getpid(), 'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              **metrics.snapshot()}
+    with open(os.path.join(directory, 'metrics.jsonl'), 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+@contextmanager
+def instrumented(name):
+    """Wrap a command-line run: profile it and log its metrics when asked to by the environment"""
+    with profiling(name):
+        try:
+            yield METRICS
+        finally:
+            if os.environ.get('PIPELINE_METRICS_DIR'):
+                log_metrics(name)
+                print(METRICS.summary())
@@ -0,0 +1,369 @@
+# pipeline.py
+
+"""
+End-to-end runner for the sentiment pipeline.
+
+The pipeline used to be run by hand: reddit_collector.py, then the result
+notebooks (ticker extraction, scoring, aggregation), then a manual database
+load, each step re-reading and re-writing whole CSVs. This script runs it
+as a small DAG of stages, one branch per dataset:
+
+    collect (optional) -> clean_reddit -> extract_reddit -> score_reddit -> aggregate_reddit -+
+                          clean_merged -> extract_merged -> score_merged -> aggregate_merged -+-> publish (optional)
+
+- clean      drops blank titles from the input CSV and stores it as Parquet
+             (headlines are cleaned by reddit_collector.py as they are
+             collected). Repeated (published, title) rows are kept, as the
+             notebooks kept them; --dedupe-posts drops them
+- extract    tags tickers and sectors (ticker_tagging.py)
+- score      scores titles with the sentiment model, through the shared
+             sentiment cache, and writes the typed scored dataset
+- aggregate  daily and rolling 90-day ticker / sector stats
+- publish    upserts the stats into the dashboard database (ingest_stats.py)
+
+Every stage's output goes to <workdir>/stages/<stage>/<key>/, where key is
+a hash of the stage's code (its function and the modules it uses), its
+parameters, the content of its input files and the keys of the stages it
+reads from. A stage whose key already has an output is skipped, so after a
+change only the stages downstream of it run again. Stages whose inputs are
+ready run in parallel worker processes (the two branches side by side).
+
+Each run's stage timings, row counts and keys are printed and saved to
+<workdir>/runs/<time>.json, with the metrics each stage recorded (see
+metrics.py). With PIPELINE_PROFILE set, every stage that runs is profiled
+into <PIPELINE_PROFILE>/<stage>-<pid>.prof.
+
+Usage:
+    python pipeline.py --reddit-input data/reddit_sentiment_input.csv --merged-input data/merged_sentiment_news.csv
+    python pipeline.py --collect --collect-args="--incremental" --publish
+    python pipeline.py --force score_reddit score_merged     # re-run some stages anyway
+"""
+
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import shlex
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import pandas as pd
+
+from metrics import METRICS, instrumented, profiling
+from sentiment_cache import file_hash
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BRANCHES = ('reddit', 'merged')
+# Output directories kept per stage (the newest ones, so switching back is a cache hit)
+KEEP_OUTPUTS = 3
+
+
+def _input(inputs, name):
+    """Path of a file written by the (first) upstream stage"""
+    return os.path.join(inputs[0], name)
+
+
+def collect_stage(inputs, output, csv, args=()):
+    from reddit_collector import main as collect
+    collect(['--output', csv, *args])
+    return len(pd.read_csv(csv, usecols=['title']))
+
+
+def clean_stage(inputs, output, input_path, dedupe=False):
+    df = pd.read_csv(input_path, usecols=['published', 'title'], dtype={'published': str, 'title': str})
+    df = df[df['title'].notna() & (df['title'].str.strip() != '')]
+    if dedupe:
+        df = df.drop_duplicates(['published', 'title'])
+    df.to_parquet(os.path.join(output, 'posts.parquet'), index=False)
+    return len(df)
+
+
+def extract_stage(inputs, output):
+    from ticker_tagging import tag_titles
+    df = pd.read_parquet(_input(inputs, 'posts.parquet'))
+    df['tickers'], df['sectors'] = tag_titles(df['title'])
+    df.to_parquet(os.path.join(output, 'tagged.parquet'), index=False)
+    return len(df)
+
+
+def score_stage(inputs, output, model, vocab, label_encoder, backend, cache_path=None):
+    from scored_dataset import COLUMNS, write_scored
+    from sentiment_cache import SentimentCache
+    from sentiment_inference import SentimentScorer
+
+    df = pd.read_parquet(_input(inputs, 'tagged.parquet'))
+    scorer = SentimentScorer.load(model, vocab, label_encoder, backend=backend)
+    cache = SentimentCache(cache_path, scorer.model_hash) if cache_path else None
+    df = df.join(scorer.score(df['title'], cache=cache))
+    if cache is not None:
+        cache.close()
+    write_scored(df[COLUMNS], os.path.join(output, 'scored.parquet'))
+    return len(df)
+
+
+def aggregate_stage(inputs, output):
+    from sentiment_aggregates import KINDS, SentimentAggregates
+
+    # A fresh in-memory store: the stage's input may have changed anywhere, not just at the end
+    aggregates = SentimentAggregates(':memory:')
+    aggregates.fold_parquet(_input(inputs, 'scored.parquet'))
+    rows = 0
+    for kind in KINDS:
+        stats = aggregates.stats(kind, days=None)
+        stats.to_parquet(os.path.join(output, f'{kind}_stats.parquet'), index=False)
+        rows += len(stats)
+    aggregates.close()
+    return rows
+
+
+def publish_stage(inputs, output, sources, target=None):
+    from dashboard_data import DashboardData
+    from ingest_stats import StatsIngester, read_stats
+
+    data = DashboardData.from_env()
+    try:
+        ingester = StatsIngester(data.engine)
+        ingester.ensure_tables()
+        changed = 0
+        for source, directory in zip(sources, inputs):
+            for kind in ('ticker', 'sector'):
+                df = read_stats(os.path.join(directory, f'{kind}_stats.parquet'), kind)
+                changed += ingester.ingest(source, kind, df)['changed']
+        return changed
+    finally:
+        data.close()
+
+
+class Stage:
+    """
+    One node of the DAG. run(inputs, output, **params, **options) gets the
+    output directories of the stages in after (in order) and the directory
+    to write to, and returns the number of rows it wrote. params, the
+    content of the params named in files and the modules in code are part
+    of the cache key; options are not. A stage with cache=False always runs.
+    """
+
+    def __init__(self, name, run, after=(), params=None, files=(), code=(), options=None, cache=True):
+        self.name = name
+        self.run = run
+        self.after = tuple(after)
+        self.params = params or {}
+        self.files = tuple(files)
+        self.code = tuple(code)
+        self.options = options or {}
+        self.cache = cache
+
+
+def _execute(name, run, inputs, output, kwargs):
+    """Worker-process side of a stage: (rows, seconds, metrics snapshot)"""
+    # Worker processes are reused, so start each stage from an empty registry
+    METRICS.reset()
+    started = time.perf_counter()
+    with profiling(name):
+        rows = run(inputs, output, **kwargs)
+    return rows, time.perf_counter() - started, METRICS.snapshot(reset=True)
+
+
+class PipelineRunner:
+    """Runs Stages in dependency order, in parallel where possible, skipping cached ones"""
+
+    def __init__(self, workdir, jobs=2, force=()):
+        self.workdir = workdir
+        self.jobs = jobs
+        self.force = set(force)
+        self._hashes = {}
+
+    def _file_hash(self, path):
+        stat = os.stat(path)
+        token = (path, stat.st_size, stat.st_mtime_ns)
+        if token not in self._hashes:
+            self._hashes[token] = file_hash(path)
+        return self._hashes[token]
+
+    def key(self, stage, upstream):
+        """Hash of everything the stage's output depends on"""
+        spec = {
+            'stage': stage.name,
+            'function': inspect.getsource(stage.run),
+            'code': {module: self._file_hash(os.path.join(HERE, module + '.py')) for module in stage.code},
+            'params': stage.params,
+            'files': {name: self._file_hash(stage.params[name]) for name in stage.files},
+            'after': upstream,
+        }
+        return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()
+
+    def _prune(self, stage_dir):
+        outputs = sorted((entry for entry in os.scandir(stage_dir) if entry.is_dir() and '.' not in entry.name),
+                         key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in outputs[KEEP_OUTPUTS:]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def run(self, stages):
+        """Run the stages; returns one record per stage (status ran / cached / failed / skipped)"""
+        pending = {stage.name: stage for stage in stages}
+        records = {}
+        running = {}
+
+        with ProcessPoolExecutor(max_workers=self.jobs) as pool:
+            while pending or running:
+                progressed = True
+                while progressed:
+                    progressed = False
+                    for name, stage in list(pending.items()):
+                        upstream = [records.get(dep) for dep in stage.after]
+                        if any(r is not None and r['status'] in ('failed', 'skipped') for r in upstream):
+                            del pending[name]
+                            records[name] = {'stage': name, 'status': 'skipped', 'seconds': 0, 'rows': None}
+                            progressed = True
+                            continue
+                        if any(r is None or r['status'] not in ('ran', 'cached') for r in upstream):
+                            continue
+                        del pending[name]
+                        progressed = True
+
+                        try:
+                            key = self.key(stage, [r['key'] for r in upstream])
+                        except OSError as e:
+                            print(f"Stage {name} failed: {e!r}")
+                            records[name] = {'stage': name, 'status': 'failed', 'seconds': 0,
+                                             'rows': None, 'error': repr(e)}
+                            continue
+                        stage_dir = os.path.join(self.workdir, 'stages', name)
+                        output = os.path.join(stage_dir, key[:16] if stage.cache else 'latest')
+                        meta_path = os.path.join(output, 'meta.json')
+                        if stage.cache and name not in self.force and os.path.exists(meta_path):
+                            with open(meta_path) as f:
+                                meta = json.load(f)
+                            os.utime(output)
+                            records[name] = {'stage': name, 'status': 'cached', 'seconds': 0,
+                                             'rows': meta['rows'], 'key': key, 'output': output}
+                            continue
+
+                        tmp = output + '.tmp'
+                        shutil.rmtree(tmp, ignore_errors=True)
+                        os.makedirs(tmp)
+                        inputs = [r['output'] for r in upstream]
+                        future = pool.submit(_execute, stage.name, stage.run, inputs, tmp, {**stage.params, **stage.options})
+                        running[future] = (stage, key, output, tmp)
+
+                if not running:
+                    if pending:
+                        raise ValueError(f"Stages wait on stages that don't exist: {sorted(pending)}")
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, key, output, tmp = running.pop(future)
+                    try:
+                        rows, seconds, metrics = future.result()
+                    except Exception as e:
+                        print(f"Stage {stage.name} failed: {e!r}")
+                        shutil.rmtree(tmp, ignore_errors=True)
+                        records[stage.name] = {'stage': stage.name, 'status': 'failed', 'seconds': 0,
+                                               'rows': None, 'key': key, 'error': repr(e)}
+                        continue
+                    METRICS.merge(metrics)
+                    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+                        json.dump({'stage': stage.name, 'key': key, 'rows': rows, 'seconds': seconds,
+                                   'finished_at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'metrics': metrics},
+                                  f, indent=2)
+                    shutil.rmtree(output, ignore_errors=True)
+                    os.rename(tmp, output)
+                    self._prune(os.path.dirname(output))
+                    records[stage.name] = {'stage': stage.name, 'status': 'ran', 'seconds': round(seconds, 3),
+                                           'rows': rows, 'key': key, 'output': output, 'metrics': metrics}
+                    print(f"{stage.name}: {rows:,} rows in {seconds:.1f}s")
+
+        return [records[stage.name] for stage in stages]
+
+    def save_report(self, records, seconds):
+        runs = os.path.join(self.workdir, 'runs')
+        os.makedirs(runs, exist_ok=True)
+        path = os.path.join(runs, time.strftime('%Y%m%dT%H%M%S') + '.json')
+        with open(path, 'w') as f:
+            json.dump({'seconds': round(seconds, 3), 'stages': records}, f, indent=2)
+        return path
+
+
+def build_stages(args):
+    """The DAG for the command line arguments"""
+    from sentiment_inference import LABEL_ENCODER_PATH, MODEL_PATH, NUMPY_MODEL_PATH, VOCAB_PATH
+
+    inputs = {'reddit': args.reddit_input, 'merged': args.merged_input}
+    model = args.model or (NUMPY_MODEL_PATH if args.backend == 'numpy' else MODEL_PATH)
+    stages = []
+    if args.collect:
+        stages.append(Stage('collect', collect_stage, params={'csv': args.reddit_input,
+                                                              'args': shlex.split(args.collect_args)},
+                            cache=False))
+
+    for branch in args.branches:
+        stages += [
+            Stage(f'clean_{branch}', clean_stage, after=['collect'] if branch == 'reddit' and args.collect else [],
+                  params={'input_path': inputs[branch], 'dedupe': args.dedupe_posts}, files=['input_path']),
+            Stage(f'extract_{branch}', extract_stage, after=[f'clean_{branch}'], code=['ticker_tagging']),
+            Stage(f'score_{branch}', score_stage, after=[f'extract_{branch}'],
+                  params={'model': model, 'vocab': args.vocab or VOCAB_PATH,
+                          'label_encoder': args.label_encoder or LABEL_ENCODER_PATH, 'backend': args.backend},
+                  files=['model', 'vocab', 'label_encoder'],
+                  code=['sentiment_inference', 'sentiment_model', 'scored_dataset'],
+                  options={'cache_path': args.sentiment_cache or None}),
+            Stage(f'aggregate_{branch}', aggregate_stage, after=[f'score_{branch}'],
+                  code=['sentiment_aggregates', 'scored_dataset']),
+        ]
+
+    if args.publish:
+        # The database is part of the key, so publishing to another one is not skipped
+        target = os.environ.get('DASHBOARD_DB_URL') or f"{os.environ.get('SSH_HOST')}/{os.environ.get('DB_NAME')}"
+        stages.append(Stage('publish', publish_stage, after=[f'aggregate_{b}' for b in args.branches],
+                            params={'sources': list(args.branches), 'target': target},
+                            code=['ingest_stats', 'dashboard_data']))
+    return stages
+
+
+def print_report(records):
+    print(f"{'stage':<20}{'status':>9}{'seconds':>10}{'rows':>14}")
+    for r in records:
+        rows = f"{r['rows']:,}" if r['rows'] is not None else '-'
+        print(f"{r['stage']:<20}{r['status']:>9}{r['seconds']:>10.1f}{rows:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the sentiment pipeline, skipping stages whose inputs are unchanged')
+    parser.add_argument('--workdir', default=os.path.join(HERE, 'data', 'pipeline'), help='stage outputs and run reports')
+    parser.add_argument('--branches', nargs='+', choices=BRANCHES, default=list(BRANCHES))
+    parser.add_argument('--reddit-input', default=os.path.join('data', 'reddit_sentiment_input.csv'))
+    parser.add_argument('--merged-input', default=os.path.join('data', 'merged_sentiment_news.csv'))
+    parser.add_argument('--collect', action='store_true', help='run reddit_collector.py into --reddit-input first')
+    parser.add_argument('--collect-args', default='', help='extra reddit_collector.py arguments, e.g. "--incremental"')
+    parser.add_argument('--dedupe-posts', action='store_true',
+                        help='drop repeated (published, title) rows in the clean stage (the notebooks kept them)')
+    parser.add_argument('--backend', default='torch', help='sentiment model backend (see sentiment_inference.py)')
+    parser.add_argument('--model', help='model file (default depends on --backend)')
+    parser.add_argument('--vocab')
+    parser.add_argument('--label-encoder')
+    parser.add_argument('--sentiment-cache', default=os.path.join('data', 'sentiment_cache.db'),
+                        help='SQLite sentiment cache shared by the branches ("" for none)')
+    parser.add_argument('--publish', action='store_true', help='upsert the stats into the dashboard database')
+    parser.add_argument('--jobs', type=int, default=2, help='stages run in parallel')
+    parser.add_argument('--force', nargs='+', default=(), metavar='STAGE', help='re-run these stages even if cached')
+    args = parser.parse_args()
+
+    stages = build_stages(args)
+    force = [stage.name for stage in stages] if 'all' in args.force else args.force
+    runner = PipelineRunner(args.workdir, jobs=args.jobs, force=force)
+    started = time.perf_counter()
+    records = runner.run(stages)
+    seconds = time.perf_counter() - started
+
+    print_report(records)
+    print(f"Finished in {seconds:.1f}s; report saved to {runner.save_report(records, seconds)}")
+    if any(r['status'] in ('failed', 'skipped') for r in records):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    with instrumented('pipeline'):
+        main()
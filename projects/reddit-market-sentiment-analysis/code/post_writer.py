@@ -0,0 +1,151 @@
+# post_writer.py
+
+"""
+Streaming, memory-bounded output for reddit_collector.py.
+
+Posts are filtered and deduplicated as they arrive and written in batches to
+Parquet part files (part-00000.parquet, part-00001.parquet, ...) in one
+dataset directory. Only the current batch and a set of 8-byte title hashes
+stay in memory, and every flushed part is safe on disk: a part file is
+written under a temporary name and renamed when complete.
+
+Opening a writer on an existing directory resumes it. New parts are numbered
+after the existing ones, and titles already written are loaded back into the
+dedupe set. After each flush on_flush(rows) is called, which the collector
+uses to record the written ids in collector_state.py.
+
+Usage:
+    writer = PostWriter('data/reddit_posts', ban_patterns)
+    for post in posts:
+        writer.add(post)
+    writer.close()
+    writer.export_csv('data/reddit_sentiment_input.csv')
+"""
+
+import glob
+import hashlib
+import os
+import re
+
+COLUMNS = ["id", "published", "created_utc", "title", "subreddit", "matched_tickers"]
+
+# Columns written to the CSV the notebooks read
+CSV_COLUMNS = ["id", "published", "title", "subreddit", "matched_tickers"]
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("published", pa.string()),
+        ("created_utc", pa.float64()),
+        ("title", pa.string()),
+        ("subreddit", pa.string()),
+        ("matched_tickers", pa.string()),
+    ])
+
+
+def title_hash(title):
+    return hashlib.blake2b(title.encode("utf-8"), digest_size=8).digest()
+
+
+class PostWriter:
+    """
+    Append cleaned posts to a Parquet part-file dataset.
+
+    add() drops posts whose title matches ban_patterns (case-insensitive, as
+    the old DataFrame filter did) or repeats a title already kept, and
+    flushes every batch_size kept posts.
+    """
+
+    def __init__(self, directory, ban_patterns=(), batch_size=5000, on_flush=None, reset=False):
+        self.directory = directory
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self.ban_re = re.compile("|".join(ban_patterns), re.IGNORECASE) if ban_patterns else None
+        self.banned = 0
+        self.duplicate_titles = 0
+        self.written = 0
+        self.new_parts = []
+        self._batch = []
+        self._titles = set()
+
+        os.makedirs(directory, exist_ok=True)
+        if reset:
+            for path in self.parts():
+                os.remove(path)
+        self._next_part = len(self.parts())
+        self._load_titles()
+
+    def parts(self):
+        return sorted(glob.glob(os.path.join(self.directory, "part-*.parquet")))
+
+    def _load_titles(self):
+        """Resume: remember the titles of every part already on disk"""
+        import pyarrow.parquet as pq
+        for path in self.parts():
+            for batch in pq.ParquetFile(path).iter_batches(columns=["title"]):
+                self._titles.update(title_hash(t) for t in batch.column(0).to_pylist())
+
+    def add(self, post):
+        """Queue one post (dict with COLUMNS); returns True if it was kept"""
+        title = post["title"]
+        if self.ban_re is not None and self.ban_re.search(title):
+            self.banned += 1
+            return False
+        key = title_hash(title)
+        if key in self._titles:
+            self.duplicate_titles += 1
+            return False
+        self._titles.add(key)
+        self._batch.append(post)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+        return True
+
+    def flush(self):
+        if not self._batch:
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        path = os.path.join(self.directory, f"part-{self._next_part:05d}.parquet")
+        table = pa.Table.from_pylist([{c: row[c] for c in COLUMNS} for row in self._batch],
+                                     schema=_schema())
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+        self._next_part += 1
+        self.new_parts.append(path)
+        self.written += len(self._batch)
+        rows, self._batch = self._batch, []
+        if self.on_flush is not None:
+            self.on_flush(rows)
+
+    def close(self):
+        self.flush()
+
+    def export_csv(self, path, append=False, all_parts=False):
+        """
+        Write the parts from this run (or every part) to one CSV, a part at
+        a time. With append, rows go after an existing file's rows.
+        """
+        import pyarrow.parquet as pq
+
+        parts = self.parts() if all_parts else self.new_parts
+        write_header = not (append and os.path.exists(path))
+        if write_header:
+            open(path, "w").close()
+        elif parts:
+            with open(path, newline="") as f:
+                header = f.readline().strip()
+            if header != ",".join(CSV_COLUMNS):
+                raise SystemExit(f"{path} has columns '{header}', expected '{','.join(CSV_COLUMNS)}'. "
+                                 f"Run once without --incremental to rebuild it.")
+        for part in parts:
+            df = pq.read_table(part, columns=CSV_COLUMNS).to_pandas()
+            df.to_csv(path, mode="a", header=write_header, index=False)
+            write_header = False
+        if write_header:
+            with open(path, "w") as f:
+                f.write(",".join(CSV_COLUMNS) + "\n")
@@ -1,17 +1,60 @@
-import praw
-import pandas as pd
+"""
+Reddit collector for the market sentiment pipeline.
+
+Searches finance subreddits for every ticker, cleans the titles and saves
+them to data/reddit_sentiment_input.csv.
+
+Posts are cleaned, filtered against ban_patterns and deduplicated as they
+arrive, then flushed in batches to Parquet part files in data/reddit_posts/
+(post_writer.py), so memory stays flat however much is collected. The CSV
+is exported from the parts at the end. An interrupted run can be picked up
+with --resume: posts already flushed are not fetched into the output again.
+
+A query planner packs several tickers into one OR search over a
+multireddit ("AAPL OR MSFT ..." in r/stocks+investing+...), so one API call
+covers many (ticker, subreddit) pairs. Each returned post is tagged with the
+tickers it matched, and a post returned by several searches is only
+downloaded and cleaned once. A search that fills its result limit is split
+in half and re-run, so packing does not silently drop older posts.
+
+Searches run concurrently on a bounded thread pool. All threads share one
+token-bucket rate limiter, failed searches are retried with exponential
+backoff, and progress is tracked per (ticker, subreddit) pair.
+
+With --incremental, a checkpoint store (collector_state.py) remembers the
+newest post collected for each (ticker, subreddit) pair and every submission
+id already written. Searches stop paging once they reach posts from the
+previous run, and only new rows are written and appended to the output CSV,
+so a daily refresh fetches a day of posts instead of a year.
+
+Search latency, API pages, rate-limit waits, retries and title cleaning
+time are recorded in metrics.METRICS (see metrics.py).
+
+Usage:
+    python reddit_collector.py [--workers 8] [--rate 1.5]
+    python reddit_collector.py --incremental     # daily refresh after one full run
+    python reddit_collector.py --resume          # finish an interrupted run
+    python reddit_collector.py --tickers-per-query 1 --subreddits-per-query 1   # one search per pair
+    python reddit_collector.py --fake     # offline run against fake_reddit.py
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime, timedelta, timezone
+
+from collector_state import CollectorState
+from metrics import METRICS, instrumented
+from post_writer import PostWriter
 from text_preprocessing import clean_reddit_headline
-import os
 from tqdm import tqdm
 
-# Reddit API credentials (from praw.ini or environment variables)
-reddit = praw.Reddit(
-    client_id=os.getenv("REDDIT_CLIENT_ID"),
-    client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
-    user_agent=os.getenv("REDDIT_USER_AGENT", "cse6242-market-sentiment-bot")
-)
-
 # Define tickers (from sector_map)
 tickers = [
     "AAPL","MSFT","NVDA","AMD","INTC","QCOM","CSCO","ORCL","IBM","ADBE","CRM",
@@ -34,50 +77,440 @@ subreddits = [
     "economy","dividends","cryptocurrency","daytrading","valueinvesting"
 ]
 
-# Collect posts from past 365 days (at least 90 days worth)
-cutoff_date = datetime.now(timezone.utc) - timedelta(days=365)
-data = []
+# Remove common repetitive discussion threads
+ban_patterns = [
+    "daily discussion", "fundamental friday", "technical tuesday",
+    "what are your moves", "options trading thursday",
+    "weekend discussion", "daily thread"
+]
+
+# Reddit listings return at most 100 items per request
+PAGE_SIZE = 100
+
+# Reddit rejects search queries longer than this
+MAX_QUERY_CHARS = 512
+
+# Incremental searches re-read this far past the checkpoint, because posts
+# can show up in Reddit search a while after they are created
+CHECKPOINT_OVERLAP = 6 * 3600
+
+# Narrowest Reddit time_filter that still reaches back this many seconds
+TIME_FILTERS = [("day", 86400), ("week", 7 * 86400), ("month", 31 * 86400), ("year", 366 * 86400)]
+
+# Errors that retrying will not fix (banned/private/missing subreddit, bad credentials)
+NON_RETRYABLE_ERRORS = {"Forbidden", "NotFound", "Redirect", "UnavailableForLegalReasons",
+                        "InvalidToken", "OAuthException", "ResponseException"}
+
+
+def make_reddit():
+    """Reddit API client (credentials from praw.ini or environment variables)"""
+    import praw
+    return praw.Reddit(
+        client_id=os.getenv("REDDIT_CLIENT_ID"),
+        client_secret=os.getenv("REDDIT_CLIENT_SECRET"),
+        user_agent=os.getenv("REDDIT_USER_AGENT", "cse6242-market-sentiment-bot")
+    )
+
+
+class SearchQuery(namedtuple("SearchQuery", ["tickers", "subreddits"])):
+    """One packed search: any of `tickers` in the multireddit of `subreddits`"""
+
+    @property
+    def text(self):
+        return " OR ".join(self.tickers)
+
+    @property
+    def subreddit_spec(self):
+        return "+".join(self.subreddits)
+
+    @property
+    def pairs(self):
+        return [(ticker, sub) for ticker in self.tickers for sub in self.subreddits]
+
+    def split(self):
+        """Two halves covering the same pairs (tickers first), or None"""
+        if len(self.tickers) > 1:
+            mid = len(self.tickers) // 2
+            return [SearchQuery(self.tickers[:mid], self.subreddits),
+                    SearchQuery(self.tickers[mid:], self.subreddits)]
+        if len(self.subreddits) > 1:
+            mid = len(self.subreddits) // 2
+            return [SearchQuery(self.tickers, self.subreddits[:mid]),
+                    SearchQuery(self.tickers, self.subreddits[mid:])]
+        return None
+
+
+def _chunks(items, size, max_chars=None, sep=""):
+    """Consecutive groups of at most `size` items (and `max_chars` when joined)"""
+    group = []
+    for item in items:
+        if group and (len(group) == size or
+                      (max_chars and len(sep.join(group + [item])) > max_chars)):
+            yield tuple(group)
+            group = []
+        group.append(item)
+    if group:
+        yield tuple(group)
+
+
+def plan_queries(tickers, subreddits, tickers_per_query=10, subreddits_per_query=None):
+    """
+    Pack the ticker x subreddit fan-out into as few searches as possible.
+    tickers_per_query tickers are OR-ed together and subreddits_per_query
+    subreddits (default: all) are searched as one multireddit.
+    """
+    sub_groups = list(_chunks(subreddits, subreddits_per_query or len(subreddits)))
+    ticker_groups = list(_chunks(tickers, tickers_per_query, MAX_QUERY_CHARS, " OR "))
+    return [SearchQuery(t, s) for t in ticker_groups for s in sub_groups]
+
+
+def ticker_tagger(query_tickers):
+    """
+    Function returning which of query_tickers a text mentions.
+    Like Reddit search, longer tickers match in any case; tickers of one or
+    two letters ('T', 'C', 'MO') only match in capitals or with a '$'.
+    """
+    long = [t for t in query_tickers if len(t) > 2]
+    short = [t for t in query_tickers if len(t) <= 2]
+    alternatives = []
+    if long:
+        alternatives.append(r"\$?(?i:(" + "|".join(map(re.escape, long)) + "))")
+    if short:
+        alternatives.append(r"\$(?i:(" + "|".join(map(re.escape, short)) + "))")
+        alternatives.append("(" + "|".join(map(re.escape, short)) + ")")
+    pattern = re.compile(r"(?<![A-Za-z0-9])(?:" + "|".join(alternatives) + r")(?![A-Za-z0-9])")
+
+    def tag(text):
+        found = []
+        for match in pattern.finditer(text or ""):
+            ticker = next(g for g in match.groups() if g).upper()
+            if ticker not in found:
+                found.append(ticker)
+        return found
+
+    return tag
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket shared by every worker.
+    rate tokens are added per second, up to capacity.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.waited = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until tokens are available; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    self.waited += waited
+                    return waited
+                delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
 
-print("Starting Reddit collection...")
+class CollectionProgress:
+    """Thread-safe status of every (ticker, subreddit) search"""
 
-for ticker in tqdm(tickers, desc="Tickers"):
-    for sub in subreddits:
-        try:
-            for submission in reddit.subreddit(sub).search(ticker, sort="new", time_filter="year", limit=250):
-                created_time = datetime.fromtimestamp(submission.created_utc, tz=timezone.utc)
-                if created_time < cutoff_date:
+    def __init__(self, pairs, desc="Searches"):
+        self.status = {pair: {"state": "pending", "posts": 0, "attempts": 0, "error": None}
+                       for pair in pairs}
+        self.failed_count = 0
+        self.rate_limit_wait = 0.0
+        self._lock = threading.Lock()
+        self._bar = tqdm(total=len(self.status), desc=desc)
+
+    def attempt(self, pairs):
+        with self._lock:
+            for pair in pairs:
+                self.status[pair]["attempts"] += 1
+
+    def finish(self, pairs, posts=None, error=None):
+        """Mark pairs done (posts: pair -> matched post count) or failed"""
+        posts = posts or {}
+        with self._lock:
+            for pair in pairs:
+                entry = self.status[pair]
+                entry["state"] = "failed" if error else "done"
+                entry["posts"] = posts.get(pair, 0)
+                entry["error"] = str(error) if error else None
+                self.failed_count += bool(error)
+            self._bar.update(len(pairs))
+            self._bar.set_postfix(failed=self.failed_count)
+
+    def failed(self):
+        return [pair for pair, entry in self.status.items() if entry["state"] == "failed"]
+
+    def save(self, path):
+        """Write the per-pair status as JSON (keys are 'TICKER|subreddit')"""
+        with self._lock:
+            data = {f"{ticker}|{sub}": entry for (ticker, sub), entry in self.status.items()}
+        with open(path, "w") as f:
+            json.dump(data, f, indent=1)
+
+    def close(self):
+        self._bar.close()
+
+
+def is_retryable(error):
+    return type(error).__name__ not in NON_RETRYABLE_ERRORS
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (HTTP Retry-After), if any"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def time_filter_for(since, now=None):
+    """Smallest time_filter covering everything newer than `since` (None: a year)"""
+    if since is None:
+        return "year"
+    age = (now or time.time()) - since
+    for name, seconds in TIME_FILTERS:
+        if age < seconds:
+            return name
+    return "all"
+
+
+def query_since(query, checkpoints, overlap=CHECKPOINT_OVERLAP):
+    """Where an incremental search can stop: the oldest checkpoint of its pairs"""
+    marks = [checkpoints.get(pair) for pair in query.pairs]
+    if not marks or None in marks:
+        return None
+    return min(marks) - overlap
+
+
+def search_posts(reddit, sub, query, limiter, limit=250, time_filter="year", since=None):
+    """
+    Run one search and return its submissions, newest first.
+    With `since`, paging stops at the first post created before it.
+    One rate-limit token is taken per page of results.
+    """
+    posts = []
+    METRICS.inc("reddit_api_requests_total")
+    METRICS.inc("reddit_rate_limit_wait_seconds_total", limiter.acquire())
+    for submission in reddit.subreddit(sub).search(query, sort="new", time_filter=time_filter, limit=limit):
+        if since is not None and submission.created_utc < since:
+            break
+        posts.append(submission)
+        # The next item starts a new page, i.e. a new request
+        if len(posts) % PAGE_SIZE == 0 and len(posts) < limit:
+            METRICS.inc("reddit_api_requests_total")
+            METRICS.inc("reddit_rate_limit_wait_seconds_total", limiter.acquire())
+    return posts
+
+
+def collect_posts(queries, reddit_factory, workers=8, rate=1.5, burst=5, retries=4,
+                  backoff=2.0, limit=1000, split_saturated=True, checkpoints=None, progress=None):
+    """
+    Run every SearchQuery concurrently.
+
+    reddit_factory is called once per worker thread (PRAW clients should not
+    be shared between threads). All workers share one TokenBucket allowing
+    rate requests per second. Each search is retried up to `retries` times
+    with exponential backoff and jitter (or the server's Retry-After).
+    A search that returns `limit` posts may have been cut off, so with
+    split_saturated it is split in two and both halves are searched.
+    checkpoints ((ticker, subreddit) -> created_utc, from CollectorState)
+    makes each search stop at the posts its pairs have already collected.
+
+    Yields (query, [(submission, matched_tickers), ...]) as searches finish;
+    queries that still fail are marked failed in progress and skipped.
+    """
+    limiter = TokenBucket(rate, burst)
+    local = threading.local()
+    progress = progress or CollectionProgress([p for q in queries for p in q.pairs])
+
+    def client():
+        if not hasattr(local, "reddit"):
+            local.reddit = reddit_factory()
+        return local.reddit
+
+    def run(query):
+        since = query_since(query, checkpoints or {})
+        for attempt in range(retries + 1):
+            progress.attempt(query.pairs)
+            try:
+                with METRICS.timer("reddit_search_seconds"):
+                    return search_posts(client(), query.subreddit_spec, query.text, limiter, limit=limit,
+                                        time_filter=time_filter_for(since), since=since)
+            except Exception as e:
+                METRICS.inc("reddit_search_errors_total", error=type(e).__name__)
+                if attempt == retries or not is_retryable(e):
+                    raise
+                delay = retry_after(e) or backoff * (2 ** attempt) * (0.5 + random.random())
+                METRICS.inc("reddit_search_retries_total")
+                METRICS.inc("reddit_retry_backoff_seconds_total", delay)
+                time.sleep(delay)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(run, query): query for query in queries}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                query = pending.pop(future)
+                try:
+                    submissions = future.result()
+                except Exception as e:
+                    METRICS.inc("reddit_search_failures_total")
+                    progress.finish(query.pairs, error=e)
                     continue
-                cleaned_title = clean_reddit_headline(submission.title)
-                if not cleaned_title.strip():
+
+                halves = query.split() if split_saturated and len(submissions) >= limit else None
+                if halves:
+                    METRICS.inc("reddit_search_splits_total")
+                    for half in halves:
+                        pending[pool.submit(run, half)] = half
                     continue
-                data.append({
-                    "published": created_time.isoformat(),
-                    "title": cleaned_title
-                })
-        except Exception as e:
-            print(f"Error fetching {ticker} from r/{sub}: {e}")
 
-# Convert to DataFrame
-df = pd.DataFrame(data).drop_duplicates()
+                tag = ticker_tagger(query.tickers)
+                results = []
+                counts = {}
+                for submission in submissions:
+                    matched = tag(f"{submission.title} {getattr(submission, 'selftext', '')}")
+                    sub = str(submission.subreddit)
+                    for ticker in matched:
+                        counts[(ticker, sub)] = counts.get((ticker, sub), 0) + 1
+                    results.append((submission, matched))
 
-# Ensure directory exists
-os.makedirs("data", exist_ok=True)
+                progress.finish(query.pairs, posts=counts)
+                METRICS.inc("reddit_posts_fetched_total", len(submissions))
+                yield query, results
 
-# Remove common repetitive discussion threads
-ban_patterns = [
-    "daily discussion", "fundamental friday", "technical tuesday",
-    "what are your moves", "options trading thursday",
-    "weekend discussion", "daily thread"
-]
+    progress.rate_limit_wait += limiter.waited
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Collect finance subreddit posts for every ticker")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent searches")
+    parser.add_argument("--rate", type=float, default=1.5,
+                        help="API requests per second shared by all workers (Reddit allows ~100/min)")
+    parser.add_argument("--retries", type=int, default=4, help="retries per failed search")
+    parser.add_argument("--days", type=int, default=365, help="only keep posts from the last N days")
+    parser.add_argument("--tickers-per-query", type=int, default=10, help="tickers OR-ed into one search")
+    parser.add_argument("--subreddits-per-query", type=int, default=None,
+                        help="subreddits searched together as a multireddit (default: all)")
+    parser.add_argument("--limit", type=int, default=1000, help="max posts per search")
+    parser.add_argument("--output", default="data/reddit_sentiment_input.csv")
+    parser.add_argument("--incremental", action="store_true",
+                        help="only fetch posts newer than the checkpoints and append them to --output")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted run, keeping the posts it already wrote")
+    parser.add_argument("--state", default="data/collector_state.db",
+                        help="checkpoint and seen-post database")
+    parser.add_argument("--posts-dir", default="data/reddit_posts", help="Parquet part files")
+    parser.add_argument("--batch-size", type=int, default=5000, help="posts per part file")
+    parser.add_argument("--fake", action="store_true",
+                        help="use the offline fake Reddit API from fake_reddit.py")
+    args = parser.parse_args(argv)
+
+    if args.fake:
+        from fake_reddit import FakeReddit
+        fake = FakeReddit(tickers)
+
+        def reddit_factory():
+            return fake
+    else:
+        reddit_factory = make_reddit
+
+    # Collect posts from past 365 days (at least 90 days worth)
+    cutoff_date = datetime.now(timezone.utc) - timedelta(days=args.days)
+    mode = "incremental" if args.incremental else "resume" if args.resume else "full"
+
+    # Ensure directory exists
+    os.makedirs("data", exist_ok=True)
+    state = CollectorState(args.state)
+    if mode == "full":
+        state.reset()
+    checkpoints = state.checkpoints() if args.incremental else {}
+
+    # Ids go into the state once their batch is on disk
+    writer = PostWriter(args.posts_dir, ban_patterns, batch_size=args.batch_size, reset=mode == "full",
+                        on_flush=lambda rows: state.add_posts((r["id"], r["created_utc"]) for r in rows))
+
+    pairs = [(ticker, sub) for ticker in tickers for sub in subreddits]
+    queries = plan_queries(tickers, subreddits, args.tickers_per_query, args.subreddits_per_query)
+    print(f"Starting Reddit collection: {len(queries)} searches for {len(pairs)} ticker/subreddit pairs...")
+
+    # Tag with every ticker, so a post found by several searches needs no merging
+    tag = ticker_tagger(tickers)
+    progress = CollectionProgress(pairs)
+    seen_ids = set()
+    duplicates = 0
+    newest = {}
+    for query, results in collect_posts(queries, reddit_factory, workers=args.workers, rate=args.rate,
+                                        retries=args.retries, limit=args.limit,
+                                        checkpoints=checkpoints, progress=progress):
+        if results:
+            top = max(submission.created_utc for submission, _ in results)
+            for pair in query.pairs:
+                newest[pair] = max(newest.get(pair, top), top)
+
+        # Seen in another search, or written by an earlier run
+        batch = [s for s, _ in results if s.id not in seen_ids]
+        fresh = set(state.unseen(s.id for s in batch)) if mode != "full" else {s.id for s in batch}
+        duplicates += len(results) - len(fresh)
+        for submission in batch:
+            seen_ids.add(submission.id)
+            if submission.id not in fresh:
+                continue
+            created_time = datetime.fromtimestamp(submission.created_utc, tz=timezone.utc)
+            if created_time < cutoff_date:
+                continue
+            with METRICS.timer("reddit_clean_title_seconds"):
+                cleaned_title = clean_reddit_headline(submission.title)
+            if not cleaned_title.strip():
+                continue
+            writer.add({
+                "id": submission.id,
+                "created_utc": submission.created_utc,
+                "published": created_time.isoformat(),
+                "title": cleaned_title,
+                "subreddit": str(submission.subreddit),
+                "matched_tickers": " ".join(tag(f"{submission.title} {getattr(submission, 'selftext', '')}")),
+            })
+    writer.close()
+    progress.close()
+
+    progress.save("data/collection_progress.json")
+    for ticker, sub in progress.failed():
+        print(f"Error fetching {ticker} from r/{sub}: {progress.status[(ticker, sub)]['error']}")
+
+    # Save final CSV: incremental runs append their new parts, the other modes
+    # rewrite it from every part (a resumed run also covers the parts flushed before the crash)
+    output_path = args.output
+    writer.export_csv(output_path, append=mode == "incremental", all_parts=mode != "incremental")
 
-df = df[~df["title"].str.contains("|".join(ban_patterns), case=False, na=False)]
+    # Only after the rows are on disk, so a crash re-fetches instead of losing posts
+    state.commit_run(newest, writer.written, mode=mode)
+    state.close()
 
-# Drop duplicates again in case cleaned titles overlap
-df = df.drop_duplicates(subset=["title"])
+    print(f"\n{'Collected' if mode == 'full' else 'Appended'} {writer.written} total cleaned posts "
+          f"in {len(writer.new_parts)} part files under {args.posts_dir}.")
+    print(f"Dropped {writer.banned} banned and {writer.duplicate_titles} duplicate titles; "
+          f"skipped {duplicates} posts already collected by another search or run.")
+    print(f"Rate-limit waits: {progress.rate_limit_wait:.1f}s, failed pairs: {len(progress.failed())}")
+    print(f"Saved to {output_path}")
 
-# Save final CSV
-output_path = "data/reddit_sentiment_input.csv"
-df.to_csv(output_path, index=False)
 
-print(f"\nCollected {len(df)} total cleaned posts.")
-print(f"Saved to {output_path}")
+if __name__ == "__main__":
+    with instrumented("reddit_collector"):
+        main()
@@ -0,0 +1,119 @@
+# scored_dataset.py
+
+"""
+Typed Parquet storage for the scored datasets (final_*_with_sentiment).
+
+The result notebooks used to write these as CSV, with tickers and sectors
+as stringified Python lists that every reader parsed back with
+ast.literal_eval. As Parquet the columns keep their types:
+- published                  timestamp (ms)
+- title                      string
+- tickers, sectors           list<string>, read back with dictionary-encoded
+                             items, so each ticker / sector is held once
+- sentiment_label            dictionary<int8, string>
+- sentiment_score, confidence float32
+
+Lists come back as Arrow list arrays, so exploding them is
+pyarrow.compute.list_flatten / list_parent_indices, not a parse.
+Parquet's dictionary encoding and compression also make the file a
+fraction of the CSV's size.
+
+Usage:
+    write_scored(df, 'final_reddit_with_sentiment.parquet')
+    table = read_scored_table('final_reddit_with_sentiment.parquet', since=pd.Timestamp('2024-06-01'))
+    df = read_scored('final_reddit_with_sentiment.parquet')
+
+    # convert an existing CSV once
+    python scored_dataset.py --input final_reddit_with_sentiment.csv --output final_reddit_with_sentiment.parquet
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["published", "title", "tickers", "sectors", "sentiment_label", "sentiment_score", "confidence"]
+
+# Read back as dictionary arrays (Parquet column paths for the list items)
+DICTIONARY_COLUMNS = ["tickers.list.element", "sectors.list.element", "sentiment_label"]
+
+
+def _schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("published", pa.timestamp("ms")),
+        ("title", pa.string()),
+        ("tickers", pa.list_(pa.string())),
+        ("sectors", pa.list_(pa.string())),
+        ("sentiment_label", pa.dictionary(pa.int8(), pa.string())),
+        ("sentiment_score", pa.float32()),
+        ("confidence", pa.float32()),
+    ])
+
+
+def _list_values(values):
+    """Python lists for a tickers / sectors column, parsing stringified lists from CSV"""
+    from sentiment_aggregates import parse_list_column
+    return parse_list_column(values).tolist()
+
+
+def to_table(df):
+    """Arrow table with the scored-dataset schema from a DataFrame with COLUMNS"""
+    import pyarrow as pa
+
+    from sentiment_aggregates import parse_published
+    published = parse_published(df["published"])
+    schema = _schema()
+    arrays = [
+        pa.array(published.to_numpy(dtype="datetime64[ms]"), type=schema.field("published").type,
+                 mask=published.isna().to_numpy()),
+        pa.array(df["title"].astype(object).where(df["title"].notna(), None).tolist(), type=pa.string()),
+        pa.array(_list_values(df["tickers"]), type=schema.field("tickers").type),
+        pa.array(_list_values(df["sectors"]), type=schema.field("sectors").type),
+        pa.array(df["sentiment_label"].astype(object).where(df["sentiment_label"].notna(), None).tolist(),
+                 type=pa.string()).dictionary_encode().cast(schema.field("sentiment_label").type),
+        pa.array(df["sentiment_score"].to_numpy(dtype=np.float32), type=pa.float32()),
+        pa.array(df["confidence"].to_numpy(dtype=np.float32), type=pa.float32()),
+    ]
+    return pa.Table.from_arrays(arrays, schema=schema)
+
+
+def write_scored(df, path):
+    """Write a scored DataFrame to Parquet (under a temporary name, then renamed)"""
+    import pyarrow.parquet as pq
+    pq.write_table(to_table(df), path + ".tmp", compression="zstd")
+    os.replace(path + ".tmp", path)
+
+
+def read_scored_table(path, columns=None, since=None):
+    """
+    pyarrow Table of a scored dataset, optionally only columns and rows
+    published at or after since (filtered while reading row groups)
+    """
+    import pyarrow.parquet as pq
+    columns = list(columns or COLUMNS)
+    wanted = [c for c in DICTIONARY_COLUMNS if c.split(".")[0] in columns]
+    filters = [("published", ">=", pd.Timestamp(since).to_pydatetime())] if since is not None else None
+    return pq.read_table(path, columns=columns, filters=filters, read_dictionary=wanted)
+
+
+def read_scored(path, columns=None, since=None):
+    """read_scored_table as a DataFrame; list columns hold NumPy arrays, sentiment_label is categorical"""
+    return read_scored_table(path, columns, since).to_pandas()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a final_*_with_sentiment.csv to typed Parquet")
+    parser.add_argument("--input", required=True, help="scored CSV")
+    parser.add_argument("--output", required=True, help=".parquet to write")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, dtype={"published": str})
+    write_scored(df, args.output)
+    print(f"Wrote {len(df):,} rows: {os.path.getsize(args.input) / 1e6:.1f} MB CSV -> "
+          f"{os.path.getsize(args.output) / 1e6:.1f} MB Parquet")
+
+
+if __name__ == "__main__":
+    main()
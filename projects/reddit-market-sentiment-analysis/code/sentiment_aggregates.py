@@ -0,0 +1,338 @@
+# sentiment_aggregates.py
+
+"""
+Incremental daily and rolling 90-day sentiment statistics per ticker and
+per sector.
+
+The result notebooks used to re-read the whole final_*_with_sentiment.csv,
+re-parse every tickers / sectors list with ast.literal_eval, explode them
+and recompute the rolling mean from scratch. This SQLite file keeps, for
+every (date, ticker) and (date, sector):
+- score_sum, mentions            the day's sentiment_score sum and row count
+- window_sum, window_mentions    the same over the 90 calendar days ending
+                                 on that date
+
+fold() adds new rows: only the days they cover are re-aggregated, and only
+windows from the first of those days onward are recomputed (reading back
+at most 89 earlier days), so folding costs O(new rows), not O(history).
+Only fold_parquet() keeps the whole update at that cost, since it skips
+old row groups while reading; fold_csv() still reads and parses every row
+of the CSV on each run and drops the old ones after parsing.
+
+Definitions:
+- avg_sentiment_score    score_sum / mentions for the day
+- rolling_90d_sentiment  window_sum / window_mentions, the mention-weighted
+                         mean over dates d-89 .. d. Days without mentions
+                         count as days, so the window is 90 calendar days.
+                         (The notebooks used to average the last 90 rows,
+                         which reached back further than 90 days for
+                         entities that are not mentioned every day.)
+
+fold() replaces the days it is given, so each day in its input must be
+complete. fold_parquet() and fold_csv() make sure of that by re-reading
+from the last folded day onward. Rows dated before that day are skipped
+without a warning, so rows that arrive late are never folded; --rebuild
+(reset() and a full fold) takes them in. With the typed Parquet datasets
+(scored_dataset.py) that read is filtered by row group and the lists are
+flattened in Arrow, with no parsing at all. The schema version is kept in
+PRAGMA user_version.
+
+Usage:
+    aggregates = SentimentAggregates('reddit_aggregates.db')
+    aggregates.fold_parquet('final_reddit_with_sentiment.parquet')
+    ticker_stats = aggregates.stats('ticker')
+
+    python sentiment_aggregates.py --input final_reddit_with_sentiment.parquet --db reddit_aggregates.db \\
+        --ticker-out reddit_ticker_sentiment_stats_90d.csv --sector-out reddit_sector_sentiment_stats_90d.csv
+"""
+
+import argparse
+import ast
+import os
+import sqlite3
+from itertools import chain
+
+import numpy as np
+import pandas as pd
+
+SCHEMA_VERSION = 1
+WINDOW_DAYS = 90
+
+# Aggregated kind -> list column of the scored CSV
+KINDS = {'ticker': 'tickers', 'sector': 'sectors'}
+
+_QUOTED = r"'([^']*)'"
+
+
+def parse_list_column(values):
+    """
+    Lists from a column holding "['AAPL', 'MSFT']" strings (as written by
+    to_csv), lists or arrays, plain strings or NaN, like the notebooks'
+    safe_parse_list.
+    Quoted items are pulled out with one vectorized regex; only values
+    containing a double quote go through ast.literal_eval.
+    """
+    s = pd.Series(values, dtype=object)
+    index = s.index
+    s = s.reset_index(drop=True)
+    out = pd.Series([[] for _ in range(len(s))], dtype=object)
+
+    kinds = s.map(type)
+    strings = s[kinds == str]
+    listy = strings.str.startswith('[')
+    plain = strings[~listy]
+    out[plain.index] = plain.map(lambda x: [x])
+
+    listy = strings[listy]
+    tricky = listy.str.contains('"', regex=False)
+    out[listy.index[~tricky]] = listy[~tricky].str.findall(_QUOTED)
+    out[listy.index[tricky]] = listy[tricky].map(_literal_list)
+
+    lists = s[kinds == list]
+    out[lists.index] = lists
+    arrays = s[kinds == np.ndarray]
+    out[arrays.index] = arrays.map(list)
+    out.index = index
+    return out
+
+
+def parse_published(values):
+    """
+    Naive UTC timestamps (NaT when unparseable) for a published column.
+    The collector writes offsets (2024-06-01T12:00:00+00:00), the news
+    sources naive times, and a merged column has both; naive values are
+    taken as UTC. Values that are not ISO 8601 are parsed one by one.
+    """
+    values = pd.Series(values)
+    parsed = pd.to_datetime(values, errors='coerce', utc=True, format='ISO8601')
+    retry = parsed.isna() & values.notna()
+    if retry.any():
+        parsed[retry] = pd.to_datetime(values[retry], errors='coerce', utc=True, format='mixed')
+    return parsed.dt.tz_convert(None)
+
+
+def _literal_list(text):
+    try:
+        return list(ast.literal_eval(text))
+    except (ValueError, SyntaxError):
+        return []
+
+
+def _group_days(date, entity, score):
+    """(date, entity, score_sum, mentions) from flat per-mention arrays"""
+    flat = pd.DataFrame({'date': date, 'entity': entity, 'score': score})
+    flat = flat[flat['entity'].notna() & (flat['entity'] != '')]
+    days = (flat.groupby(['date', 'entity'], sort=False, observed=True)['score']
+            .agg(score_sum='sum', mentions='count')
+            .reset_index())
+    days['entity'] = days['entity'].astype(object)
+    return days
+
+
+def daily_sums(df, kind):
+    """(date, entity, score_sum, mentions) for one kind of a scored frame"""
+    lists = parse_list_column(df[KINDS[kind]])
+    lengths = lists.map(len).to_numpy()
+    return _group_days(np.repeat(df['date'].to_numpy(), lengths),
+                       list(chain.from_iterable(lists)),
+                       np.repeat(df['sentiment_score'].to_numpy(dtype=np.float64), lengths))
+
+
+def table_daily_sums(table, date, kind):
+    """daily_sums for a pyarrow Table with list columns; date is a per-row datetime64 array"""
+    import pyarrow.compute as pc
+    lists = table.column(KINDS[kind]).combine_chunks()
+    parents = pc.list_parent_indices(lists).to_numpy()
+    entity = pc.list_flatten(lists).to_pandas()
+    score = table.column('sentiment_score').to_numpy().astype(np.float64)
+    return _group_days(date[parents], entity, score[parents])
+
+
+def rolling_sums(days, window_days=WINDOW_DAYS):
+    """
+    Window sums for a (entity, date, score_sum, mentions) frame: for each
+    row, the totals over the same entity's dates in (date - window_days, date].
+    Prefix sums over the frame sorted by (entity, date), with the window
+    start found by binary search.
+    """
+    days = days.sort_values(['entity', 'date'], ignore_index=True)
+    codes = pd.factorize(days['entity'])[0].astype(np.int64)
+    ordinal = days['date'].to_numpy().astype('datetime64[D]').astype(np.int64)
+    if len(days):
+        ordinal -= ordinal.min()
+    # Entities occupy disjoint ranges of this key, so a search never leaves its entity
+    key = codes * (int(ordinal.max(initial=0)) + window_days) + ordinal
+    start = np.searchsorted(key, key - (window_days - 1), side='left')
+
+    for column, out in (('score_sum', 'window_sum'), ('mentions', 'window_mentions')):
+        prefix = np.concatenate(([0], np.cumsum(days[column].to_numpy())))
+        days[out] = prefix[np.arange(1, len(days) + 1)] - prefix[start]
+    return days
+
+
+class SentimentAggregates:
+    """SQLite-backed daily and rolling sentiment sums per ticker and sector"""
+
+    def __init__(self, path, window_days=WINDOW_DAYS):
+        self.path = path
+        self.window_days = window_days
+        self.conn = sqlite3.connect(path)
+        self._create_schema()
+
+    def _create_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'{self.path} uses sentiment aggregate schema v{version}; '
+                               f'this code only understands up to v{SCHEMA_VERSION}')
+
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS daily (
+                    kind            TEXT NOT NULL,
+                    entity          TEXT NOT NULL,
+                    date            TEXT NOT NULL,
+                    score_sum       REAL NOT NULL,
+                    mentions        INTEGER NOT NULL,
+                    window_sum      REAL NOT NULL,
+                    window_mentions INTEGER NOT NULL,
+                    PRIMARY KEY (kind, date, entity)
+                )
+            """)
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM daily').fetchone()[0]
+
+    def last_date(self):
+        """Newest folded date as a Timestamp, or None when empty"""
+        last = self.conn.execute('SELECT MAX(date) FROM daily').fetchone()[0]
+        return pd.Timestamp(last) if last else None
+
+    def reset(self):
+        with self.conn:
+            self.conn.execute('DELETE FROM daily')
+
+    def fold(self, df):
+        """
+        Aggregate scored rows (published, tickers, sectors, sentiment_score)
+        into the store, replacing every day they cover. Returns the number
+        of days folded.
+        """
+        df = pd.DataFrame({
+            'date': parse_published(df['published']).dt.normalize(),
+            'tickers': df['tickers'],
+            'sectors': df['sectors'],
+            'sentiment_score': df['sentiment_score'],
+        }).dropna(subset=['date'])
+        return self._fold({kind: daily_sums(df, kind) for kind in KINDS}, df['date'])
+
+    def fold_table(self, table):
+        """fold() for a pyarrow Table in the scored_dataset.py schema"""
+        import pyarrow.compute as pc
+        table = table.filter(pc.is_valid(table.column('published')))
+        date = table.column('published').to_numpy().astype('datetime64[D]').astype('datetime64[ns]')
+        return self._fold({kind: table_daily_sums(table, date, kind) for kind in KINDS}, date)
+
+    def _fold(self, sums, date):
+        if not len(date):
+            return 0
+        dates = sorted(pd.DatetimeIndex(pd.unique(date)).strftime('%Y-%m-%d'))
+        for kind, days in sums.items():
+            self._fold_kind(kind, days, dates)
+        return len(dates)
+
+    def _fold_kind(self, kind, new_days, dates):
+        first = pd.Timestamp(dates[0])
+        lookback = (first - pd.Timedelta(days=self.window_days - 1)).strftime('%Y-%m-%d')
+
+        with self.conn:
+            self.conn.executemany('DELETE FROM daily WHERE kind = ? AND date = ?',
+                                  [(kind, d) for d in dates])
+            kept = pd.read_sql_query(
+                'SELECT entity, date, score_sum, mentions FROM daily WHERE kind = ? AND date >= ?',
+                self.conn, params=(kind, lookback), parse_dates=['date'])
+            days = rolling_sums(pd.concat([kept, new_days], ignore_index=True), self.window_days)
+
+            # Rows before the first folded day only fed the windows; theirs are unchanged
+            changed = days[days['date'] >= first]
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO daily VALUES (?, ?, ?, ?, ?, ?, ?)',
+                zip([kind] * len(changed), changed['entity'], changed['date'].dt.strftime('%Y-%m-%d'),
+                    changed['score_sum'].astype(float), changed['mentions'].astype(int),
+                    changed['window_sum'].astype(float), changed['window_mentions'].astype(int)))
+
+    def fold_parquet(self, path):
+        """
+        Fold a final_*_with_sentiment.parquet from the last folded day onward
+        (that day may have been partial); older row groups are not read.
+        Rows dated before the last folded day are skipped. Returns the
+        number of days folded.
+        """
+        from scored_dataset import read_scored_table
+        table = read_scored_table(path, columns=['published', 'tickers', 'sectors', 'sentiment_score'],
+                                  since=self.last_date())
+        return self.fold_table(table)
+
+    def fold_csv(self, path, chunksize=500000):
+        """
+        Fold a final_*_with_sentiment.csv from the last folded day onward
+        (that day may have been partial). Not incremental: every chunk is
+        read and its published column parsed on each run, and rows dated
+        before the last folded day are dropped (skipped, like late rows in
+        fold_parquet) only after that. Returns the number of days folded.
+        """
+        last = self.last_date()
+        since = last.strftime('%Y-%m-%d') if last is not None else None
+        columns = ['published', 'tickers', 'sectors', 'sentiment_score']
+        new = []
+        for chunk in pd.read_csv(path, usecols=columns, dtype={'published': str}, chunksize=chunksize):
+            if since is not None:
+                chunk = chunk[parse_published(chunk['published']) >= since]
+            new.append(chunk)
+        return self.fold(pd.concat(new, ignore_index=True)) if new else 0
+
+    def stats(self, kind, days=WINDOW_DAYS):
+        """
+        date, <kind>, avg_sentiment_score, rolling_90d_sentiment for the
+        last `days` days up to the newest folded date (all days if None),
+        the columns the *_sentiment_stats_90d.csv files have always had
+        """
+        last = self.last_date()
+        since = '' if last is None or days is None else (last - pd.Timedelta(days=days)).strftime('%Y-%m-%d')
+        stats = pd.read_sql_query(
+            'SELECT date, entity, score_sum * 1.0 / mentions AS avg_sentiment_score, '
+            'window_sum * 1.0 / window_mentions AS rolling_90d_sentiment '
+            'FROM daily WHERE kind = ? AND date >= ? ORDER BY date, entity',
+            self.conn, params=(kind, since), parse_dates=['date'])
+        return stats.rename(columns={'entity': kind})
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Update rolling 90-day sentiment statistics from a scored CSV')
+    parser.add_argument('--input', required=True, help='final_*_with_sentiment.parquet (or .csv)')
+    parser.add_argument('--db', required=True, help='SQLite aggregate store to update')
+    parser.add_argument('--ticker-out', help='write ticker stats CSV here')
+    parser.add_argument('--sector-out', help='write sector stats CSV here')
+    parser.add_argument('--rebuild', action='store_true', help='forget stored days and fold the whole input')
+    args = parser.parse_args()
+
+    aggregates = SentimentAggregates(args.db)
+    if args.rebuild:
+        aggregates.reset()
+    if os.path.splitext(args.input)[1].lower() == '.parquet':
+        folded = aggregates.fold_parquet(args.input)
+    else:
+        folded = aggregates.fold_csv(args.input)
+    print(f"Folded {folded:,} days; newest is {aggregates.last_date()}")
+    for kind, out in (('ticker', args.ticker_out), ('sector', args.sector_out)):
+        if out:
+            aggregates.stats(kind).to_csv(out, index=False)
+            print(f"Saved {kind} stats to {out}")
+    aggregates.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# sentiment_cache.py
+
+"""
+Persistent cache of sentiment model outputs.
+
+Headlines repeat a lot (reposts, cross-posts, one wire story in many
+outlets), and the merged pipeline scores everything the Reddit pipeline
+already scored. This SQLite file keeps the model's softmax output for every
+input it has seen, so repeated and incremental runs only run the model on
+new text.
+
+Entries are keyed by
+- the hash of the model file, so a retrained model never reads results
+  from an old one, and
+- a hash of the token-id row that tokenize() / preprocess_text produce,
+  so titles that differ only in case or punctuation share one entry.
+
+Entries older than ttl_days are treated as missing (and re-scored), and
+opening the cache deletes them. The torch, numpy and int8 exports of one
+model hash differently and may share a cache file, so entries for other
+models are only deleted when asked (purge_other_models=True).
+The schema version is kept in PRAGMA user_version.
+
+Usage:
+    scorer = SentimentScorer.load()
+    cache = SentimentCache('sentiment_cache.db', scorer.model_hash)
+    results = scorer.score(df["title"], cache=cache)
+"""
+
+import hashlib
+import sqlite3
+import time
+
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+
+def file_hash(path):
+    """sha256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_keys(ids):
+    """16-byte key for each row of a token-id array"""
+    ids = np.ascontiguousarray(ids)
+    data = ids.tobytes()
+    step = ids.shape[1] * ids.itemsize
+    return [hashlib.blake2b(data[i:i + step], digest_size=16).digest()
+            for i in range(0, len(data), step)]
+
+
+class SentimentCache:
+    """SQLite-backed (model hash, token-id row) -> class probabilities"""
+
+    def __init__(self, path, model_hash, ttl_days=90, purge=True, purge_other_models=False):
+        self.path = path
+        self.model_hash = model_hash
+        self.ttl = ttl_days * 86400 if ttl_days else None
+        self.hits = 0
+        self.misses = 0
+        # pipeline.py may score two datasets against this file at once
+        self.conn = sqlite3.connect(path, timeout=60)
+        self._create_schema()
+        if purge:
+            self.purge(other_models=purge_other_models)
+
+    def _create_schema(self):
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f'{self.path} uses sentiment cache schema v{version}; '
+                               f'this code only understands up to v{SCHEMA_VERSION}')
+
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    model      TEXT NOT NULL,
+                    key        BLOB NOT NULL,
+                    probs      BLOB NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (model, key)
+                )
+            """)
+            self.conn.execute('CREATE INDEX IF NOT EXISTS results_created ON results (created_at)')
+            self.conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+        self.conn.execute('CREATE TEMP TABLE wanted (key BLOB PRIMARY KEY)')
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM results WHERE model = ?',
+                                 (self.model_hash,)).fetchone()[0]
+
+    def _oldest(self):
+        return time.time() - self.ttl if self.ttl else 0
+
+    def get(self, keys):
+        """key -> float32 probability array, for the keys that are cached and fresh"""
+        with self.conn:
+            self.conn.execute('DELETE FROM wanted')
+            self.conn.executemany('INSERT OR IGNORE INTO wanted VALUES (?)', ((k,) for k in keys))
+            rows = self.conn.execute(
+                'SELECT r.key, r.probs FROM wanted w JOIN results r ON r.key = w.key '
+                'WHERE r.model = ? AND r.created_at >= ?', (self.model_hash, self._oldest())).fetchall()
+        return {key: np.frombuffer(probs, dtype=np.float32) for key, probs in rows}
+
+    def put(self, keys, probs):
+        """Store one float32 probability row per key"""
+        now = time.time()
+        probs = np.asarray(probs, dtype=np.float32)
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)',
+                ((self.model_hash, key, row.tobytes(), now) for key, row in zip(keys, probs)))
+
+    def purge(self, other_models=False):
+        """Delete expired entries (and with other_models, every other model's); returns how many"""
+        with self.conn:
+            if other_models:
+                deleted = self.conn.execute('DELETE FROM results WHERE model != ? OR created_at < ?',
+                                            (self.model_hash, self._oldest())).rowcount
+            else:
+                deleted = self.conn.execute('DELETE FROM results WHERE created_at < ?',
+                                            (self._oldest(),)).rowcount
+        return deleted
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,293 @@
+# sentiment_inference.py
+
+"""
+Batched sentiment scoring with the FFNN_Embedding model.
+
+The result notebooks used to score one title at a time: a 1x30 tensor per
+row, a model call per row, le.inverse_transform per row. This module scores
+a whole column at once:
+- every text is tokenized in one pass into an int32 (n, 30) id array
+- the model runs over large batches in one of three backends
+- label, score and confidence come from vectorized NumPy on the
+  probabilities
+
+Backends:
+- torch       the .pt model under torch.inference_mode (the reference);
+              labels are the same as predict_sentiment, row for row
+- torch-int8  the .pt model with int8 dynamic quantization of its Linear layers
+- numpy       a pure-NumPy forward pass over an .npz exported by
+              sentiment_model.py; imports neither torch nor scikit-learn,
+              so short scoring jobs start quickly
+
+torch and the model class live in sentiment_model.py and are only imported
+for the torch backends.
+
+Usage:
+    scorer = SentimentScorer.load()        # model, vocab and encoder next to this file
+    scorer = SentimentScorer.load_numpy("sentiment_ffnn_model.npz")
+    results = scorer.score(df["title"])    # sentiment_label, sentiment_score, confidence
+
+    python sentiment_inference.py --input reddit_sentiment_input.csv --output scored.csv [--backend numpy]
+
+With a SentimentCache (sentiment_cache.py), score(texts, cache=cache) only
+runs the model on token-id rows the cache has not seen for this model file.
+
+Tokenizing, every model batch and the cache hits are recorded in
+metrics.METRICS (see metrics.py).
+"""
+
+import argparse
+import os
+import re
+import time
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from metrics import METRICS, instrumented
+from sentiment_cache import SentimentCache, file_hash, row_keys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(HERE, "sentiment_ffnn_model.pt")
+VOCAB_PATH = os.path.join(HERE, "vocab.pkl")
+LABEL_ENCODER_PATH = os.path.join(HERE, "label_encoder.pkl")
+NUMPY_MODEL_PATH = os.path.join(HERE, "sentiment_ffnn_model.npz")
+NUMPY_FORMAT_VERSION = 1
+
+BACKENDS = ("torch", "torch-int8", "numpy")
+
+MAX_LEN = 30
+PAD_ID = 0
+UNK_ID = 1
+BATCH_SIZE = 65536
+
+NON_TOKEN_PATTERN = re.compile(r"[^a-z0-9\s]")
+# The same characters as bytes, for the translate() fast path on ASCII text
+_ASCII_DELETE = bytes(b for b in range(128) if NON_TOKEN_PATTERN.match(chr(b)))
+
+
+def tokenize(texts, vocab, max_len=MAX_LEN):
+    """
+    Token ids for many texts as an int32 (n, max_len) array, padded with 0.
+
+    Same ids as preprocess_text, without a Python loop per text: the texts
+    are lowercased and stripped as one newline-joined string, split once
+    with a row-break token in place of each newline, and the ids are placed
+    into rows and truncated with NumPy.
+    """
+    if isinstance(texts, pd.Series):
+        texts = texts.tolist()
+    texts = [str(t).replace("\n", " ") for t in texts]
+    out = np.full((len(texts), max_len), PAD_ID, dtype=np.int32)
+    if not texts:
+        return out
+
+    joined = "\n".join(texts)
+    if joined.isascii():
+        cleaned = joined.encode("ascii").lower().translate(None, _ASCII_DELETE).decode("ascii")
+    else:
+        cleaned = NON_TOKEN_PATTERN.sub("", joined.lower())
+
+    # "|" cannot survive cleaning, so it is free to mark row breaks
+    lookup = dict(vocab)
+    lookup["|"] = -1
+    ids = np.array(list(map(lookup.get, cleaned.replace("\n", " | ").split(), repeat(UNK_ID))),
+                   dtype=np.int32)
+
+    breaks = ids == -1
+    row = np.cumsum(breaks)
+    row_start = np.concatenate(([0], np.flatnonzero(breaks) + 1))
+    col = np.arange(len(ids)) - row_start[row]
+    keep = ~breaks & (col < max_len)
+    out[row[keep], col[keep]] = ids[keep]
+    return out
+
+
+def label_scores(probs, classes):
+    """
+    Vectorized label, signed score and confidence for a (n, classes) array.
+    score is -100 * confidence for negative labels, +100 * confidence for
+    positive ones and 0 otherwise.
+    """
+    classes = np.asarray(classes)
+    pred_idx = probs.argmax(axis=1)
+    confidence = probs[np.arange(len(probs)), pred_idx].astype(np.float64)
+    lowered = [str(c).lower() for c in classes]
+    sign = np.array([-100.0 if "negative" in c else 100.0 if "positive" in c else 0.0 for c in lowered])
+    return classes[pred_idx], sign[pred_idx] * confidence, confidence
+
+
+def load_numpy_model(path):
+    """(weights, vocab, classes) from an .npz written by sentiment_model.export_numpy"""
+    with np.load(path, allow_pickle=False) as data:
+        if int(data["format_version"]) > NUMPY_FORMAT_VERSION:
+            raise RuntimeError(f"{path} uses NumPy model format v{int(data['format_version'])}; "
+                               f"this code only understands up to v{NUMPY_FORMAT_VERSION}")
+
+        def matrix(name):
+            # int8 exports keep one scale per row
+            if f"{name}_q" in data:
+                return data[f"{name}_q"].astype(np.float32) * data[f"{name}_scale"][:, None]
+            return data[name]
+
+        weights = {"embedding": matrix("embedding"),
+                   "layers": [(matrix(f"fc{i}_weight").T.copy(), data[f"fc{i}_bias"])
+                              for i in range(int(data["layers"]))]}
+        vocab = dict(zip(data["vocab_tokens"].tolist(), data["vocab_ids"].tolist()))
+        classes = data["classes"]
+    return weights, vocab, classes
+
+
+class NumpyBackend:
+    """FFNN_Embedding forward pass in NumPy: embedding mean, then Linear + ReLU layers"""
+
+    def __init__(self, weights):
+        self.embedding = weights["embedding"]
+        self.layers = weights["layers"]
+
+    def predict_proba(self, ids, batch_size=BATCH_SIZE):
+        probs = np.empty((len(ids), self.layers[-1][1].shape[0]), dtype=np.float32)
+        for start in range(0, len(ids), batch_size):
+            started = time.perf_counter()
+            batch = ids[start:start + batch_size]
+            # Mean over every position, padding included, like .mean(dim=1);
+            # summed a column at a time so no (batch, max_len, embed_dim) array is built
+            x = self.embedding[batch[:, 0]].copy()
+            for j in range(1, batch.shape[1]):
+                x += self.embedding[batch[:, j]]
+            x /= batch.shape[1]
+            for i, (weight, bias) in enumerate(self.layers):
+                x = x @ weight
+                x += bias
+                if i < len(self.layers) - 1:
+                    np.maximum(x, 0, out=x)
+            x -= x.max(axis=1, keepdims=True)
+            np.exp(x, out=x)
+            x /= x.sum(axis=1, keepdims=True)
+            probs[start:start + batch_size] = x
+            METRICS.observe("sentiment_model_batch_seconds", time.perf_counter() - started, backend="numpy")
+        METRICS.inc("sentiment_model_rows_total", len(ids), backend="numpy")
+        return probs
+
+
+class SentimentScorer:
+    """A model backend with its vocab and label classes, scoring in batches"""
+
+    def __init__(self, backend, vocab, classes, max_len=MAX_LEN, model_hash=None):
+        self.backend = backend
+        self.vocab = vocab
+        self.classes = np.asarray(classes)
+        self.max_len = max_len
+        self.model_hash = model_hash
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, vocab_path=VOCAB_PATH, label_encoder_path=LABEL_ENCODER_PATH,
+             embed_dim=100, hidden_dim=256, backend="torch"):
+        """Scorer for a .pt model (torch / torch-int8) or an exported .npz (numpy)"""
+        if backend not in BACKENDS:
+            raise ValueError(f"backend must be one of {BACKENDS}, not {backend!r}")
+        if backend == "numpy" or model_path.endswith(".npz"):
+            return cls.load_numpy(model_path)
+
+        import joblib
+        from sentiment_model import TorchBackend, load_model
+        vocab = joblib.load(vocab_path)
+        le = joblib.load(label_encoder_path)
+        model = load_model(model_path, len(vocab), len(le.classes_), embed_dim, hidden_dim)
+        quantize = backend == "torch-int8"
+        # Quantized outputs differ slightly, so they get their own cache entries
+        model_hash = file_hash(model_path) + (":int8" if quantize else "")
+        return cls(TorchBackend(model, quantize=quantize), vocab, le.classes_, model_hash=model_hash)
+
+    @classmethod
+    def load_numpy(cls, path=NUMPY_MODEL_PATH):
+        weights, vocab, classes = load_numpy_model(path)
+        return cls(NumpyBackend(weights), vocab, classes, model_hash=file_hash(path))
+
+    def tokenize(self, texts):
+        with METRICS.timer("sentiment_tokenize_seconds"):
+            return tokenize(texts, self.vocab, self.max_len)
+
+    def predict_proba(self, ids, batch_size=BATCH_SIZE):
+        """Softmax probabilities (float32 array) for an id array from tokenize()"""
+        return self.backend.predict_proba(ids, batch_size)
+
+    def predict_proba_cached(self, ids, cache, batch_size=BATCH_SIZE):
+        """
+        predict_proba through a SentimentCache: each distinct id row is
+        looked up once, and only rows missing from the cache reach the model
+        """
+        keys = row_keys(ids)
+        codes, uniques = pd.factorize(pd.Series(keys, dtype=object))
+        first = np.full(len(uniques), len(codes), dtype=np.int64)
+        np.minimum.at(first, codes, np.arange(len(codes)))
+
+        unique_probs = np.empty((len(uniques), len(self.classes)), dtype=np.float32)
+        found = cache.get(uniques)
+        missing = []
+        for i, key in enumerate(uniques):
+            probs = found.get(key)
+            if probs is None:
+                missing.append(i)
+            else:
+                unique_probs[i] = probs
+
+        if missing:
+            unique_probs[missing] = self.predict_proba(ids[first[missing]], batch_size)
+            cache.put([uniques[i] for i in missing], unique_probs[missing])
+        cache.hits += len(uniques) - len(missing)
+        cache.misses += len(missing)
+        METRICS.inc("sentiment_cache_hits_total", len(uniques) - len(missing))
+        METRICS.inc("sentiment_cache_misses_total", len(missing))
+        return unique_probs[codes]
+
+    def score(self, texts, batch_size=BATCH_SIZE, cache=None):
+        """DataFrame of sentiment_label, sentiment_score, confidence (index kept for a Series)"""
+        index = texts.index if isinstance(texts, pd.Series) else None
+        ids = self.tokenize(texts)
+        if cache is None:
+            probs = self.predict_proba(ids, batch_size)
+        else:
+            probs = self.predict_proba_cached(ids, cache, batch_size)
+        labels, scores, confidence = label_scores(probs, self.classes)
+        return pd.DataFrame({"sentiment_label": labels, "sentiment_score": scores,
+                             "confidence": confidence}, index=index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV text column with the sentiment model")
+    parser.add_argument("--input", required=True)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--column", default="title", help="text column to score")
+    parser.add_argument("--chunk-size", type=int, default=500000, help="rows read and scored at a time")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="rows per model call")
+    parser.add_argument("--backend", choices=BACKENDS, default="torch",
+                        help="numpy needs an .npz exported by sentiment_model.py")
+    parser.add_argument("--model", help=f"model file (default {MODEL_PATH}, or {NUMPY_MODEL_PATH} for numpy)")
+    parser.add_argument("--vocab", default=VOCAB_PATH)
+    parser.add_argument("--label-encoder", default=LABEL_ENCODER_PATH)
+    parser.add_argument("--cache", help="SQLite sentiment cache to read and update")
+    parser.add_argument("--cache-ttl-days", type=float, default=90, help="re-score cached results older than this")
+    parser.add_argument("--purge-other-models", action="store_true",
+                        help="delete cached results of every other model file from --cache")
+    args = parser.parse_args()
+
+    model_path = args.model or (NUMPY_MODEL_PATH if args.backend == "numpy" else MODEL_PATH)
+    scorer = SentimentScorer.load(model_path, args.vocab, args.label_encoder, backend=args.backend)
+    cache = (SentimentCache(args.cache, scorer.model_hash, args.cache_ttl_days,
+                            purge_other_models=args.purge_other_models) if args.cache else None)
+    rows = 0
+    for i, chunk in enumerate(pd.read_csv(args.input, chunksize=args.chunk_size, dtype={"published": str})):
+        chunk = chunk.join(scorer.score(chunk[args.column], args.batch_size, cache=cache))
+        chunk.to_csv(args.output, mode="w" if i == 0 else "a", header=i == 0, index=False)
+        rows += len(chunk)
+        print(f"Scored {rows:,} rows")
+    if cache is not None:
+        print(f"Cache: {cache.hits:,} hits, {cache.misses:,} rows scored by the model")
+        cache.close()
+    print(f"Saved to {args.output}")
+
+
+if __name__ == "__main__":
+    with instrumented("sentiment_inference"):
+        main()
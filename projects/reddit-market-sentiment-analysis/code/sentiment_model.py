@@ -0,0 +1,176 @@
+# sentiment_model.py
+
+"""
+PyTorch side of sentiment scoring: the FFNN_Embedding model, the torch
+scoring backends and the export to the NumPy model format.
+
+Importing this module imports torch. sentiment_inference.py only imports it
+when a torch backend is asked for, so jobs scoring with an exported .npz
+model never pay for torch.
+
+Backends:
+- TorchBackend(model)                  float32, the reference
+- TorchBackend(model, quantize=True)   int8 dynamic quantization of the
+                                       Linear layers (torch.ao.quantization)
+
+Export:
+    python sentiment_model.py --export sentiment_ffnn_model.npz          # float32
+    python sentiment_model.py --export sentiment_ffnn_model.int8.npz --int8
+
+The .npz holds the weights plus the vocab and label classes, so scoring
+with it needs neither torch nor joblib / scikit-learn. With --int8 the
+weight matrices are stored as int8 with one float32 scale per row, about a
+quarter of the size; they are expanded back to float32 when loaded.
+"""
+
+import argparse
+import time
+
+import joblib
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.nn.functional as F
+
+from metrics import METRICS
+from sentiment_inference import (BATCH_SIZE, LABEL_ENCODER_PATH, MAX_LEN, MODEL_PATH, NON_TOKEN_PATTERN,
+                                 NUMPY_FORMAT_VERSION, NUMPY_MODEL_PATH, PAD_ID, UNK_ID, VOCAB_PATH,
+                                 label_scores)
+
+
+class FFNN_Embedding(nn.Module):
+    def __init__(self, vocab_size, embed_dim, hidden_dim, num_classes):
+        super().__init__()
+        self.embedding = nn.Embedding(vocab_size, embed_dim, padding_idx=0)
+        self.fc = nn.Sequential(
+            nn.Linear(embed_dim, hidden_dim),
+            nn.ReLU(),
+            nn.Dropout(0.3),
+            nn.Linear(hidden_dim, hidden_dim // 2),
+            nn.ReLU(),
+            nn.Linear(hidden_dim // 2, num_classes)
+        )
+
+    def forward(self, x):
+        embedded = self.embedding(x)
+        avg_embedded = embedded.mean(dim=1)
+        return self.fc(avg_embedded)
+
+
+def preprocess_text(text, vocab, max_len=MAX_LEN):
+    """One text as a 1 x max_len id tensor (the notebooks' original tokenizer)"""
+    text = str(text).lower()
+    text = NON_TOKEN_PATTERN.sub("", text)
+    tokens = text.split()
+    ids = [vocab.get(t, UNK_ID) for t in tokens][:max_len]
+    ids += [PAD_ID] * (max_len - len(ids))
+    return torch.tensor([ids], dtype=torch.long)
+
+
+def predict_sentiment(text, model, vocab, le):
+    """Single-text (label, score, confidence); prefer SentimentScorer.score for columns"""
+    with torch.inference_mode():
+        probs = F.softmax(model(preprocess_text(text, vocab)), dim=1).numpy()
+    labels, scores, confidence = label_scores(probs, le.classes_)
+    return labels[0], float(scores[0]), float(confidence[0])
+
+
+def load_model(model_path, vocab_size, num_classes, embed_dim=100, hidden_dim=256):
+    model = FFNN_Embedding(
+        vocab_size=vocab_size,
+        embed_dim=embed_dim,
+        hidden_dim=hidden_dim,
+        num_classes=num_classes
+    )
+    model.load_state_dict(torch.load(model_path, map_location="cpu"))
+    return model.eval()
+
+
+class TorchBackend:
+    """Batched FFNN_Embedding forward pass, optionally with int8 Linear layers"""
+
+    def __init__(self, model, quantize=False):
+        model = model.eval()
+        if quantize:
+            model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.name = "torch-int8" if quantize else "torch"
+
+    def forward(self, batch):
+        """
+        FFNN_Embedding.forward for a batch of ids. embedding_bag averages the
+        rows (padding included, as .mean(dim=1) does) without building the
+        (batch, max_len, embed_dim) tensor first.
+        """
+        pooled = F.embedding_bag(batch, self.model.embedding.weight, mode="mean")
+        return self.model.fc(pooled)
+
+    def predict_proba(self, ids, batch_size=BATCH_SIZE):
+        """Softmax probabilities (float32 array) for an id array from tokenize()"""
+        probs = None
+        with torch.inference_mode():
+            for start in range(0, len(ids), batch_size):
+                started = time.perf_counter()
+                batch = torch.from_numpy(ids[start:start + batch_size]).long()
+                out = F.softmax(self.forward(batch), dim=1).numpy()
+                if probs is None:
+                    probs = np.empty((len(ids), out.shape[1]), dtype=np.float32)
+                probs[start:start + batch_size] = out
+                METRICS.observe("sentiment_model_batch_seconds", time.perf_counter() - started, backend=self.name)
+        METRICS.inc("sentiment_model_rows_total", len(ids), backend=self.name)
+        return probs
+
+
+def _quantize_rows(weight):
+    """Symmetric int8 per row: weight ~= q * scale[:, None]"""
+    scale = np.abs(weight).max(axis=1) / 127.0
+    scale[scale == 0] = 1.0
+    q = np.clip(np.round(weight / scale[:, None]), -127, 127).astype(np.int8)
+    return q, scale.astype(np.float32)
+
+
+def export_numpy(out_path, model_path=MODEL_PATH, vocab_path=VOCAB_PATH,
+                 label_encoder_path=LABEL_ENCODER_PATH, int8=False, embed_dim=100, hidden_dim=256):
+    """Write the model, vocab and classes to an .npz for the NumPy backend"""
+    vocab = joblib.load(vocab_path)
+    le = joblib.load(label_encoder_path)
+    model = load_model(model_path, len(vocab), len(le.classes_), embed_dim, hidden_dim)
+
+    linears = [m for m in model.fc if isinstance(m, nn.Linear)]
+    matrices = {"embedding": model.embedding.weight}
+    arrays = {}
+    for i, layer in enumerate(linears):
+        matrices[f"fc{i}_weight"] = layer.weight
+        arrays[f"fc{i}_bias"] = layer.bias.detach().numpy().astype(np.float32)
+    for name, tensor in matrices.items():
+        weight = tensor.detach().numpy().astype(np.float32)
+        if int8:
+            arrays[f"{name}_q"], arrays[f"{name}_scale"] = _quantize_rows(weight)
+        else:
+            arrays[name] = weight
+
+    tokens = list(vocab)
+    np.savez(out_path,
+             format_version=np.int32(NUMPY_FORMAT_VERSION),
+             layers=np.int32(len(linears)),
+             classes=np.asarray([str(c) for c in le.classes_]),
+             vocab_tokens=np.asarray(tokens),
+             vocab_ids=np.asarray([vocab[t] for t in tokens], dtype=np.int32),
+             **arrays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the sentiment model for the NumPy backend")
+    parser.add_argument("--export", default=NUMPY_MODEL_PATH, help=".npz to write")
+    parser.add_argument("--int8", action="store_true", help="store weight matrices as int8 with per-row scales")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--vocab", default=VOCAB_PATH)
+    parser.add_argument("--label-encoder", default=LABEL_ENCODER_PATH)
+    args = parser.parse_args()
+
+    export_numpy(args.export, args.model, args.vocab, args.label_encoder, int8=args.int8)
+    print(f"Saved {'int8' if args.int8 else 'float32'} NumPy model to {args.export}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# serve_dashboard.py
+
+"""
+Production server for the Dash dashboard (app.py) under gunicorn.
+
+`python app.py` is the development server: one process, debug mode, its
+own database connection. This script instead
+- connects to the database once, in the server (gunicorn master) process,
+  builds the dashboard snapshot and publishes it to a SnapshotStore
+  (snapshot_store.py)
+- starts a background thread there that republishes it every --refresh
+  seconds; each publish is swapped in atomically
+- starts --workers gunicorn workers with DASHBOARD_MODE=shared, which
+  memory-map the published snapshot instead of loading their own copy and
+  never open a tunnel or database connection themselves
+
+GET /health on any worker reports its snapshot version and age.
+
+Usage:
+    python serve_dashboard.py --workers 4 --bind 0.0.0.0:8050 --refresh 600
+"""
+
+import argparse
+import os
+import time
+
+from dashboard_data import DashboardData, DashboardSnapshot
+from snapshot_store import SnapshotRefresher, SnapshotStore
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def publish_initial(store):
+    """Connect, publish a first snapshot and return the DashboardData for refreshes"""
+    data = DashboardData.from_env()
+    data.ensure_indexes()
+    started = time.perf_counter()
+    version = store.publish(DashboardSnapshot.load(data))
+    print(f"Published dashboard snapshot {version} in {time.perf_counter() - started:.1f}s")
+    return data
+
+
+def run_gunicorn(bind, workers, threads, timeout):
+    from gunicorn.app.base import BaseApplication
+
+    class DashboardApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set('bind', bind)
+            self.cfg.set('workers', workers)
+            self.cfg.set('threads', threads)
+            self.cfg.set('timeout', timeout)
+            # Each worker imports app.py itself and maps the shared snapshot
+            self.cfg.set('preload_app', False)
+
+        def load(self):
+            from app import server
+            return server
+
+    DashboardApplication().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the sentiment dashboard with shared snapshots')
+    parser.add_argument('--bind', default='0.0.0.0:8050')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=2, help='threads per worker')
+    parser.add_argument('--timeout', type=int, default=60, help='gunicorn worker timeout (seconds)')
+    parser.add_argument('--snapshot-dir', default=os.path.join(HERE, 'data', 'dashboard_snapshots'))
+    parser.add_argument('--refresh', type=float, default=600, help='seconds between snapshot rebuilds (0 = never)')
+    args = parser.parse_args()
+
+    store = SnapshotStore(args.snapshot_dir)
+    data = publish_initial(store)
+    refresher = None
+    if args.refresh > 0:
+        refresher = SnapshotRefresher(data, store, args.refresh)
+        refresher.start()
+
+    os.environ['DASHBOARD_MODE'] = 'shared'
+    os.environ['DASHBOARD_SNAPSHOT_DIR'] = os.path.abspath(args.snapshot_dir)
+    try:
+        run_gunicorn(args.bind, args.workers, args.threads, args.timeout)
+    finally:
+        if refresher is not None:
+            refresher.stop()
+        data.close()
+
+
+if __name__ == '__main__':
+    main()
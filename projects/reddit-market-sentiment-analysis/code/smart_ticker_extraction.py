@@ -1,15 +1,141 @@
+"""
+Smart ticker extraction for financial news articles.
+
+Importable library (SmartTickerExtractor, backfill_tickers, stream_tickers)
+plus a command line interface:
+
+    # Fill missing tickers in financial_news_df.pkl in place (original run)
+    python smart_ticker_extraction.py [--workers 32]
+
+    # Stream a large Parquet/CSV file in batches and write tickers out
+    python smart_ticker_extraction.py --input news.parquet --output tickers.parquet --batch-size 100000
+
+Importing the module has no side effects; nothing is loaded or printed.
+Time spent in each step of extract_ticker is recorded in metrics.METRICS
+(see metrics.py).
+"""
+
 import pandas as pd
 import re
-from collections import Counter, defaultdict
+import os
+import argparse
+from time import perf_counter
+from collections import Counter, defaultdict, deque
+from itertools import islice
+from multiprocessing import Pool
 import warnings
-warnings.filterwarnings('ignore')
 
-print('SMART TICKER EXTRACTION (Pattern-Based)\n')
-print('Using advanced pattern matching and context analysis')
-print('No predefined company-to-ticker mappings required\n')
+from company_ticker_store import CompanyTickerStore
+from metrics import METRICS, instrumented
+
+# Precompiled helper patterns (shared by every extractor instance)
+COMPANY_TICKER_RE = re.compile(r'([A-Z][A-Za-z\s&\'.]{2,40}?)\s*\(([A-Z]{1,5})\)')
+COMPANY_TICKER_INTL_RE = re.compile(r'([A-Z][A-Za-z\s&\'.]{2,40}?)\s*\(([A-Z0-9]{2,6}\.[A-Z]{1,2})\)')
+CAPITALIZED_NAME_RE = re.compile(r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,3}(?:\s+(?:Inc|Corp|Ltd|LLC|Co|Group|Holdings|Plc|PLC)\.?)?)\b')
+US_TICKER_RE = re.compile(r'^[A-Z]{1,5}$')
+INTL_TICKER_RE = re.compile(r'^[A-Z0-9]{2,6}\.[A-Z]{1,2}$')
+
 
-# Load the dataframe
-df = pd.read_pickle('financial_news_df.pkl')
+class CompanyNameIndex:
+    """
+    Aho-Corasick automaton over the learned company names.
+
+    Finds every indexed name in one pass over the text and returns the one
+    that was added first, i.e. the same answer as scanning the cache dict in
+    insertion order. Newly added names wait in a small pending list (checked
+    with plain substring tests) until the automaton is rebuilt, so learning
+    a name never costs a full rebuild.
+    """
+
+    def __init__(self, rebuild_every=256):
+        self.rebuild_every = rebuild_every
+        self.names = []       # rank -> name, in insertion order
+        self._ranks = {}      # name -> rank
+        self._pending = []    # ranks not yet in the automaton
+        self.rebuild()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._ranks
+
+    def add(self, name):
+        """Index a name; names that are already indexed keep their rank"""
+        self.update((name,))
+
+    def update(self, names):
+        """Index several names in order, rebuilding at most once"""
+        for name in names:
+            if name in self._ranks:
+                continue
+            rank = len(self.names)
+            self._ranks[name] = rank
+            self.names.append(name)
+            self._pending.append(rank)
+        if len(self._pending) >= self.rebuild_every:
+            self.rebuild()
+
+    def rebuild(self):
+        """Rebuild the trie and failure links from every indexed name"""
+        no_match = float('inf')
+        goto = [{}]          # node -> {char: child}
+        best = [no_match]    # node -> lowest rank ending here (incl. suffixes)
+
+        for rank, name in enumerate(self.names):
+            node = 0
+            for ch in name:
+                child = goto[node].get(ch)
+                if child is None:
+                    child = len(goto)
+                    goto[node][ch] = child
+                    goto.append({})
+                    best.append(no_match)
+                node = child
+            best[node] = min(best[node], rank)
+
+        # Breadth-first pass for failure links, folding each suffix's best
+        # rank into the node so a search only has to look at one number
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in goto[node].items():
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[child] = goto[f].get(ch, 0) if node else 0
+                best[child] = min(best[child], best[fail[child]])
+                queue.append(child)
+
+        self._goto, self._fail, self._best = goto, fail, best
+        self._pending = []
+
+    def first_match(self, text):
+        """Earliest-added name that occurs in text, or None"""
+        goto, fail, best = self._goto, self._fail, self._best
+        found = best[0]
+
+        # Skip the walk while everything is still pending (small caches)
+        if len(goto) > 1:
+            node = 0
+            for ch in text:
+                child = goto[node].get(ch)
+                while child is None and node:
+                    node = fail[node]
+                    child = goto[node].get(ch)
+                node = child or 0
+                if best[node] < found:
+                    found = best[node]
+                    if found == 0:
+                        break
+
+        # Names learned since the last rebuild
+        for rank in self._pending:
+            if rank < found and self.names[rank] in text:
+                found = rank
+
+        return self.names[found] if found < len(self.names) else None
 
 
 class SmartTickerExtractor:
@@ -18,9 +144,26 @@ class SmartTickerExtractor:
     and dynamic learning - no predefined mappings required
     """
 
-    def __init__(self):
-        # Dynamic cache built during processing
-        self.company_ticker_cache = {}
+    def __init__(self, company_ticker_cache=None):
+        # Dynamic cache built during processing, optionally seeded with
+        # mappings learned by earlier runs (see company_ticker_store.py)
+        self.company_ticker_cache = dict(company_ticker_cache or {})
+
+        # How often each company was seen in a pair during this run
+        self.company_counts = Counter()
+
+        # Seconds, calls and tickers found per step of extract_ticker.
+        # Plain lists rather than METRICS calls: this is the hottest loop
+        # of the pipeline; flush_metrics() moves them into METRICS.
+        self.step_seconds = [0.0] * 5
+        self.step_calls = [0] * 5
+        self.step_found = [0] * 5
+
+        # Automaton over the cache keys for step 2 of extract_ticker.
+        # Kept in sync lazily: the cache only ever grows, so new keys are
+        # always at the end of the dict.
+        self._company_index = CompanyNameIndex()
+        self._indexed_cache = self.company_ticker_cache
 
         # Ticker extraction patterns (pattern, group_index, confidence_score)
         self.patterns = [
@@ -49,6 +192,26 @@ class SmartTickerExtractor:
             (r'\b(\d{4,5}\.[A-Z]{1,2})\b', 0, 5.0),  # 5401.T
         ]
 
+        # Literal text each pattern needs before it can match (lowercase).
+        # Patterns whose triggers are missing from an article are skipped
+        # without running the regex at all. Patterns not listed always run.
+        self.pattern_triggers = {
+            r'\$([A-Z]{1,5})\b': ('$',),
+            r'(?:NYSE|NASDAQ|LSE|TSE):\s*([A-Z]{1,5})\b': (('nyse:', 'nasdaq:', 'lse:', 'tse:'),),
+            r'\((?:NYSE|NASDAQ|LSE|TSE):\s*([A-Z]{1,5})\)': ('(', ')', ('nyse:', 'nasdaq:', 'lse:', 'tse:')),
+            r'\(([A-Z]{1,5})\)': ('(', ')'),
+            r'ticker\s+(?:symbol\s+)?([A-Z]{1,5})\b': ('ticker',),
+            r'trades\s+as\s+([A-Z]{1,5})\b': ('trades',),
+            r'symbol\s+([A-Z]{1,5})\b': ('symbol',),
+            r'\b([A-Z]{1,5}):': (':',),
+            r'ticker:\s*([A-Z]{1,5})\b': ('ticker:',),
+            r'\$([A-Z]{2,5}\.[A-Z]{1,2})\b': ('$', '.'),
+            r'\(([A-Z]{2,5}\.[A-Z]{1,2})\)': ('(', ')', '.'),
+            r'\b([A-Z]{2,5}\.[A-Z]{1,2})\b': ('.',),
+            r'\((\d{4,5}\.[A-Z]{1,2})\)': ('(', ')', '.'),
+            r'\b(\d{4,5}\.[A-Z]{1,2})\b': ('.',),
+        }
+
         # Common words to exclude (false positives)
         self.excluded_words = {
             'CEO', 'CFO', 'CTO', 'COO', 'IPO', 'USA', 'US', 'UK', 'EU', 'ETF', 'SEC',
@@ -71,6 +234,29 @@ class SmartTickerExtractor:
                                     'LLC', 'Co', 'Company', 'Group', 'Holdings',
                                     'Plc', 'PLC', 'AG', 'SA', 'NV', 'SE']
 
+        # Compile the scanner once instead of going through the re cache
+        # for every pattern on every call
+        self.compile_patterns()
+
+    def compile_patterns(self):
+        """
+        Build the precompiled scanner from self.patterns.
+        Call again after editing self.patterns or self.pattern_triggers.
+        """
+        self._scanner = []
+        for pattern, group_idx, score in self.patterns:
+            # Normalise every trigger to a tuple of alternatives
+            triggers = tuple(t if isinstance(t, tuple) else (t,)
+                             for t in self.pattern_triggers.get(pattern, ()))
+            # Word triggers are only safe to test on ASCII text: IGNORECASE
+            # also matches a few non-ASCII letters (e.g. the Kelvin sign for 'k')
+            has_words = any(ch.isalpha() for alts in triggers for t in alts for ch in t)
+            finditer = re.compile(pattern, re.IGNORECASE).finditer
+            self._scanner.append((finditer, group_idx, score, triggers, has_words))
+
+        # Validity only depends on the ticker string, so remember the answer
+        self._valid_ticker_cache = {}
+
     def extract_company_ticker_pairs(self, text):
         """
         Extract explicit company-ticker pairs like 'Apple Inc. (AAPL)'
@@ -80,8 +266,7 @@ class SmartTickerExtractor:
 
         # Pattern: Company Name (TICKER)
         # Matches: "Apple Inc. (AAPL)", "Tesla Motors (TSLA)", etc.
-        pattern = r'([A-Z][A-Za-z\s&\'.]{2,40}?)\s*\(([A-Z]{1,5})\)'
-        matches = re.findall(pattern, text)
+        matches = COMPANY_TICKER_RE.findall(text)
 
         for company, ticker in matches:
             company = company.strip()
@@ -96,10 +281,10 @@ class SmartTickerExtractor:
                     pairs.append((company, ticker))
                     # Add to cache
                     self.company_ticker_cache[company.lower()] = ticker
+                    self.company_counts[company.lower()] += 1
 
         # Also match international format: "Company (TICKER.EX)"
-        pattern_intl = r'([A-Z][A-Za-z\s&\'.]{2,40}?)\s*\(([A-Z0-9]{2,6}\.[A-Z]{1,2})\)'
-        matches_intl = re.findall(pattern_intl, text)
+        matches_intl = COMPANY_TICKER_INTL_RE.findall(text)
 
         for company, ticker in matches_intl:
             company = company.strip()
@@ -108,17 +293,41 @@ class SmartTickerExtractor:
             if len(company) > 2:
                 pairs.append((company, ticker))
                 self.company_ticker_cache[company.lower()] = ticker
+                self.company_counts[company.lower()] += 1
 
         return pairs
 
+    def find_cached_company(self, text):
+        """
+        Return the first-learned cached company name found in text (or None).
+        One pass over the text, however large the cache has grown.
+        """
+        cache = self.company_ticker_cache
+        index = self._company_index
+
+        # Start over if the cache was replaced or had entries removed
+        if cache is not self._indexed_cache or len(cache) < len(index):
+            index = self._company_index = CompanyNameIndex(index.rebuild_every)
+            self._indexed_cache = cache
+
+        index.update(islice(cache, len(index), None))
+
+        return index.first_match(text.lower())
+
     def extract_pattern_tickers(self, text):
         """Extract tickers using regex patterns with confidence scoring"""
         ticker_scores = defaultdict(float)
 
-        for pattern, group_idx, score in self.patterns:
-            matches = re.finditer(pattern, text, re.IGNORECASE)
+        # One lowercase copy for the trigger checks. Word triggers are
+        # skipped for non-ASCII text so the result never changes.
+        text_lower = text.lower()
+        is_ascii = text.isascii()
+
+        for finditer, group_idx, score, triggers, has_words in self._scanner:
+            if triggers and (is_ascii or not has_words) and not self._has_triggers(text_lower, triggers):
+                continue
 
-            for match in matches:
+            for match in finditer(text):
                 ticker = match.group(group_idx if group_idx > 0 else 0)
                 ticker = ticker.upper()
 
@@ -128,20 +337,35 @@ class SmartTickerExtractor:
 
         return ticker_scores
 
+    @staticmethod
+    def _has_triggers(text_lower, triggers):
+        """True if at least one alternative of every trigger is in the text"""
+        for alternatives in triggers:
+            if not any(t in text_lower for t in alternatives):
+                return False
+        return True
+
     def is_valid_ticker(self, ticker):
         """Validate if a string could be a valid ticker"""
+        valid = self._valid_ticker_cache.get(ticker)
+        if valid is None:
+            valid = self._check_ticker(ticker)
+            self._valid_ticker_cache[ticker] = valid
+        return valid
+
+    def _check_ticker(self, ticker):
         if not ticker or ticker in self.excluded_words:
             return False
 
         # US tickers: 1-5 uppercase letters
-        if re.match(r'^[A-Z]{1,5}$', ticker):
+        if US_TICKER_RE.match(ticker):
             # Additional validation: avoid common words
             if len(ticker) <= 2:
                 return True  # Very short tickers are usually valid
             return True
 
         # International tickers
-        if re.match(r'^[A-Z0-9]{2,6}\.[A-Z]{1,2}$', ticker):
+        if INTL_TICKER_RE.match(ticker):
             return True
 
         return False
@@ -149,8 +373,7 @@ class SmartTickerExtractor:
     def extract_capitalized_names(self, text):
         """Extract capitalized phrases that might be company names"""
         # Pattern: Capitalized words (2-4 words)
-        pattern = r'\b([A-Z][a-z]+(?:\s+[A-Z][a-z]+){0,3}(?:\s+(?:Inc|Corp|Ltd|LLC|Co|Group|Holdings|Plc|PLC)\.?)?)\b'
-        matches = re.findall(pattern, text)
+        matches = CAPITALIZED_NAME_RE.findall(text)
         return matches
 
     def find_ticker_near_name(self, name, text, window=150):
@@ -207,6 +430,25 @@ class SmartTickerExtractor:
         sorted_tickers = sorted(ticker_scores.items(), key=lambda x: x[1], reverse=True)
         return sorted_tickers[0][0]
 
+    def _timed_step(self, step, started):
+        """Charge the time since started to step (0-based); returns the current time"""
+        now = perf_counter()
+        self.step_seconds[step] += now - started
+        self.step_calls[step] += 1
+        return now
+
+    def flush_metrics(self, metrics=METRICS):
+        """Add the per-step timings gathered since the last flush to metrics"""
+        for step in range(5):
+            if self.step_calls[step]:
+                metrics.inc('ticker_extraction_step_seconds_total', self.step_seconds[step], step=step + 1)
+                metrics.inc('ticker_extraction_step_calls_total', self.step_calls[step], step=step + 1)
+            if self.step_found[step]:
+                metrics.inc('ticker_extraction_found_total', self.step_found[step], step=step + 1)
+        self.step_seconds = [0.0] * 5
+        self.step_calls = [0] * 5
+        self.step_found = [0] * 5
+
     def extract_ticker(self, row):
         """Main extraction method"""
         # If ticker exists, return it
@@ -218,18 +460,24 @@ class SmartTickerExtractor:
         full_text = title + ' ' + text
 
         # Step 1: Extract company-ticker pairs (builds cache)
+        started = perf_counter()
         pairs = self.extract_company_ticker_pairs(full_text)
+        started = self._timed_step(0, started)
         if pairs:
             # Return the ticker from first pair
+            self.step_found[0] += 1
             return pairs[0][1]
 
         # Step 2: Check if any cached company names appear in text
-        for company_name, cached_ticker in self.company_ticker_cache.items():
-            if company_name in full_text.lower():
-                return cached_ticker
+        company_name = self.find_cached_company(full_text)
+        started = self._timed_step(1, started)
+        if company_name is not None:
+            self.step_found[1] += 1
+            return self.company_ticker_cache[company_name]
 
         # Step 3: Extract tickers using patterns
         ticker_scores = self.extract_pattern_tickers(full_text)
+        started = self._timed_step(2, started)
 
         # Step 4: Extract company names and look for nearby tickers
         company_names = self.extract_capitalized_names(title)
@@ -237,84 +485,348 @@ class SmartTickerExtractor:
             nearby_ticker = self.find_ticker_near_name(name, full_text)
             if nearby_ticker:
                 ticker_scores[nearby_ticker] += 5.0
+        started = self._timed_step(3, started)
 
         # Step 5: Select best ticker
         best_ticker = self.score_and_select_ticker(ticker_scores, title, full_text)
+        self._timed_step(4, started)
+        if best_ticker:
+            self.step_found[4] += 1
 
         return best_ticker
 
 
-# Main execution
-extractor = SmartTickerExtractor()
-
-print('Processing articles\n')
-
-# Get rows without tickers
-rows_without_ticker = df['ticker'].isna()
-total_missing = rows_without_ticker.sum()
-print(f'Rows without ticker: {total_missing:,}')
-print(f'Total rows: {len(df):,}\n')
-
-# Extract tickers
-new_tickers = {}
-batch_size = 100
-processed = 0
-
-print('Extracting tickers')
-for idx in df[rows_without_ticker].index:
-    row = df.loc[idx]
-    ticker = extractor.extract_ticker(row)
-
-    if ticker:
-        new_tickers[idx] = ticker
-
-    processed += 1
-    if processed % batch_size == 0:
-        pct = (processed / total_missing) * 100
-        print(f'  Progress: {processed:,}/{total_missing:,} ({pct:.1f}%) - Found: {len(new_tickers):,} tickers')
-
-# Apply extracted tickers to dataframe
-for idx, ticker in new_tickers.items():
-    df.loc[idx, 'ticker'] = ticker
-
-print(f'Extraction complete!')
-print(f'  Extracted: {len(new_tickers):,} new tickers')
-print(f'  Learning cache size: {len(extractor.company_ticker_cache):,} company-ticker mappings')
-
-# Display results
-print('RESULTS')
-print(f'Total rows:{len(df):,}')
-print(f'Rows with ticker:{df["ticker"].notna().sum():,} ({df["ticker"].notna().sum()/len(df)*100:.2f}%)')
-print(f'Rows without ticker:{df["ticker"].isna().sum():,} ({df["ticker"].isna().sum()/len(df)*100:.2f}%)')
-print(f'Improvement: +{len(new_tickers):,} articles tagged')
-
-# Show distribution of newly extracted tickers
-if new_tickers:
-    print('\n' + '='*70)
-    print('TOP 20 NEWLY EXTRACTED TICKERS')
-    print('='*70)
-    ticker_dist = Counter(new_tickers.values())
-    for i, (ticker, count) in enumerate(ticker_dist.most_common(20), 1):
-        print(f'{i:2d}. {ticker:8s}: {count:5,} articles ({count/len(new_tickers)*100:5.2f}%)')
-
-    # Show some company-ticker mappings learned
-    if extractor.company_ticker_cache:
+# Parallel backfill helpers (module level so worker processes can import them)
+_shard_cache = {}
+
+
+def _init_shard_worker(cache):
+    """Pool initializer: keep one copy of the learned cache per worker"""
+    global _shard_cache
+    _shard_cache = cache
+    # A forked worker starts with a copy of the parent's metrics
+    METRICS.reset()
+
+
+def _extract_rows(rows, cache):
+    """
+    Extract tickers for one shard of (index, title, text) rows.
+    Every shard starts from the same learned cache, so its result does not
+    depend on which process runs it or what that process ran before.
+    """
+    extractor = SmartTickerExtractor(company_ticker_cache=cache)
+
+    found = []
+    for idx, title, text in rows:
+        ticker = extractor.extract_ticker({'ticker': None, 'title': title, 'text': text})
+        if ticker:
+            found.append((idx, ticker))
+
+    # Only send back what this shard learned or changed
+    learned = {company: ticker for company, ticker in extractor.company_ticker_cache.items()
+               if cache.get(company) != ticker}
+    extractor.flush_metrics()
+    return len(rows), found, learned, extractor.company_counts
+
+
+def _extract_shard(rows):
+    """Worker-process side of _extract_rows, with the metrics it recorded"""
+    # The parent merges the worker's metrics; reset so no shard is counted twice
+    return (*_extract_rows(rows, _shard_cache), METRICS.snapshot(reset=True))
+
+
+def _print_progress(processed, total, found):
+    pct = (processed / total) * 100 if total else 100.0
+    print(f'  Progress: {processed:,}/{total:,} ({pct:.1f}%) - Found: {found:,} tickers')
+
+
+def backfill_tickers(df, extractor=None, workers=1, shard_size=5000, progress_every=100):
+    """
+    Fill in df['ticker'] for rows that have none. Returns (new_tickers, extractor)
+    where new_tickers maps index label -> extracted ticker.
+
+    The rows are split into shards of shard_size; each shard starts from a
+    copy of the extractor's cache and the caches learned by the shards are
+    merged back in shard order. Shards run in-process with workers=1 and in
+    a pool otherwise, so the result depends on shard_size but not on the
+    worker count. shard_size=0 is the original sequential run: one shard
+    whose cache grows from row to row, in-process whatever workers is. Its
+    tickers differ from a sharded run's, since a shard can't use what the
+    shards before it learned.
+    """
+    extractor = extractor or SmartTickerExtractor()
+
+    missing = df['ticker'].isna()
+    total_missing = int(missing.sum())
+    rows = list(zip(df.index[missing], df.loc[missing, 'title'], df.loc[missing, 'text']))
+
+    new_tickers = {}
+    processed = 0
+    started = perf_counter()
+
+    if shard_size <= 0:
+        for idx, title, text in rows:
+            ticker = extractor.extract_ticker({'ticker': None, 'title': title, 'text': text})
+            if ticker:
+                new_tickers[idx] = ticker
+
+            processed += 1
+            if processed % progress_every == 0:
+                _print_progress(processed, total_missing, len(new_tickers))
+    else:
+        shards = [rows[i:i + shard_size] for i in range(0, len(rows), shard_size)]
+        cache = dict(extractor.company_ticker_cache)
+
+        def merge(n_rows, found, learned, counts):
+            nonlocal processed
+            new_tickers.update(found)
+            extractor.company_ticker_cache.update(learned)
+            extractor.company_counts.update(counts)
+            processed += n_rows
+            _print_progress(processed, total_missing, len(new_tickers))
+
+        if workers <= 1:
+            for shard in shards:
+                merge(*_extract_rows(shard, cache))
+        else:
+            with Pool(workers, initializer=_init_shard_worker, initargs=(cache,)) as pool:
+                # imap yields in shard order, which fixes the merge order
+                for *result, metrics in pool.imap(_extract_shard, shards):
+                    merge(*result)
+                    METRICS.merge(metrics)
+
+    extractor.flush_metrics()
+    METRICS.observe('ticker_backfill_seconds', perf_counter() - started, workers=workers)
+    METRICS.inc('ticker_backfill_rows_total', total_missing)
+    METRICS.inc('ticker_backfill_found_total', len(new_tickers))
+
+    # Apply extracted tickers to dataframe in one step
+    if new_tickers:
+        if df['ticker'].dtype.kind == 'f':
+            # All-NaN column: float64 can't hold the ticker strings
+            df['ticker'] = df['ticker'].astype(object)
+        df.loc[list(new_tickers.keys()), 'ticker'] = list(new_tickers.values())
+
+    return new_tickers, extractor
+
+
+def iter_article_batches(path, batch_size, columns=('title', 'text', 'ticker')):
+    """
+    Yield DataFrames of at most batch_size articles from a Parquet, CSV or
+    pickle file. Parquet and CSV are read incrementally; a pickle has to be
+    loaded whole and is only sliced. Row labels are global row numbers.
+    """
+    ext = os.path.splitext(path)[1].lower()
+    columns = list(columns)
+
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+        offset = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+            chunk = batch.to_pandas()
+            chunk.index = pd.RangeIndex(offset, offset + len(chunk))
+            offset += len(chunk)
+            yield chunk
+    elif ext == '.csv':
+        # read_csv keeps counting row labels across chunks; an all-empty
+        # ticker column would otherwise come back as float64
+        dtype = {'ticker': object} if 'ticker' in columns else None
+        yield from pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=batch_size)
+    else:
+        df = pd.read_pickle(path)[columns].reset_index(drop=True)
+        for start in range(0, len(df), batch_size):
+            yield df.iloc[start:start + batch_size]
+
+
+class _TickerBatchWriter:
+    """Append (row, ticker) batches to a Parquet or CSV file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.is_parquet = os.path.splitext(path)[1].lower() == '.parquet'
+        self._writer = None
+        self._wrote_header = False
+
+    def write(self, batch):
+        if self.is_parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            # Fixed schema so an all-empty first batch can't pin ticker to null
+            schema = pa.schema([('row', pa.int64()), ('ticker', pa.string())])
+            table = pa.Table.from_pandas(batch, schema=schema, preserve_index=False)
+            if self._writer is None:
+                self._writer = pq.ParquetWriter(self.path, schema)
+            self._writer.write_table(table)
+        else:
+            batch.to_csv(self.path, mode='a' if self._wrote_header else 'w',
+                         header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def save_learned_pairs(extractor, store, source):
+    """Merge the extractor's learned pairs into a CompanyTickerStore"""
+    new_pairs, updated = store.merge(extractor.company_ticker_cache, extractor.company_counts, source=source)
+    # Counts are per save, so the next merge only adds what was seen since
+    extractor.company_counts.clear()
+    return new_pairs, updated
+
+
+def stream_tickers(input_path, output_path, batch_size=100000, extractor=None,
+                   workers=1, shard_size=5000, store=None):
+    """
+    Extract tickers from input_path batch by batch and write a (row, ticker)
+    table to output_path (.parquet or .csv). Only one batch is held in
+    memory at a time and the input file is never rewritten. The extractor's
+    learned cache carries over from batch to batch, and is saved to store
+    (a CompanyTickerStore) after every batch when one is given.
+
+    Returns (rows_seen, new_ticker_count, extractor).
+    """
+    extractor = extractor or SmartTickerExtractor()
+    writer = _TickerBatchWriter(output_path)
+    rows_seen = 0
+    new_count = 0
+
+    try:
+        for batch_no, chunk in enumerate(iter_article_batches(input_path, batch_size), 1):
+            chunk = chunk.copy()
+            print(f'Batch {batch_no}: rows {rows_seen:,}-{rows_seen + len(chunk) - 1:,}')
+            new_tickers, extractor = backfill_tickers(
+                chunk, extractor=extractor, workers=workers,
+                shard_size=shard_size, progress_every=max(batch_size // 10, 1))
+
+            writer.write(pd.DataFrame({'row': chunk.index, 'ticker': chunk['ticker'].values}))
+            if store is not None:
+                save_learned_pairs(extractor, store, source=input_path)
+            rows_seen += len(chunk)
+            new_count += len(new_tickers)
+    finally:
+        writer.close()
+
+    return rows_seen, new_count, extractor
+
+
+def print_report(df, new_tickers, extractor):
+    """Summary of a backfill run on a full dataframe"""
+    print(f'Extraction complete!')
+    print(f'  Extracted: {len(new_tickers):,} new tickers')
+    print(f'  Learning cache size: {len(extractor.company_ticker_cache):,} company-ticker mappings')
+
+    # Display results
+    print('RESULTS')
+    print(f'Total rows:{len(df):,}')
+    print(f'Rows with ticker:{df["ticker"].notna().sum():,} ({df["ticker"].notna().sum()/len(df)*100:.2f}%)')
+    print(f'Rows without ticker:{df["ticker"].isna().sum():,} ({df["ticker"].isna().sum()/len(df)*100:.2f}%)')
+    print(f'Improvement: +{len(new_tickers):,} articles tagged')
+
+    # Show distribution of newly extracted tickers
+    if new_tickers:
         print('\n' + '='*70)
-        print('SAMPLE LEARNED COMPANY-TICKER MAPPINGS')
+        print('TOP 20 NEWLY EXTRACTED TICKERS')
         print('='*70)
-        sample_size = min(15, len(extractor.company_ticker_cache))
-        for i, (company, ticker) in enumerate(list(extractor.company_ticker_cache.items())[:sample_size], 1):
-            print(f'{i:2d}. {company.title():<40s} -> {ticker}')
-
-# Show examples of extracted articles
-print('SAMPLE EXTRACTIONS')
-sample_count = min(10, len(new_tickers))
-for i, idx in enumerate(list(new_tickers.keys())[:sample_count], 1):
-    row = df.loc[idx]
-    print(f'\n{i}. TICKER: {row["ticker"]}')
-    print(f'   TITLE: {row["title"][:100]}...')
-
-# Save updated dataframe
-print('Saving updated dataframe')
-df.to_pickle('financial_news_df.pkl')
-print('Saved as financial_news_df.pkl')
\ No newline at end of file
+        ticker_dist = Counter(new_tickers.values())
+        for i, (ticker, count) in enumerate(ticker_dist.most_common(20), 1):
+            print(f'{i:2d}. {ticker:8s}: {count:5,} articles ({count/len(new_tickers)*100:5.2f}%)')
+
+        # Show some company-ticker mappings learned
+        if extractor.company_ticker_cache:
+            print('\n' + '='*70)
+            print('SAMPLE LEARNED COMPANY-TICKER MAPPINGS')
+            print('='*70)
+            sample_size = min(15, len(extractor.company_ticker_cache))
+            for i, (company, ticker) in enumerate(list(extractor.company_ticker_cache.items())[:sample_size], 1):
+                print(f'{i:2d}. {company.title():<40s} -> {ticker}')
+
+    # Show examples of extracted articles
+    print('SAMPLE EXTRACTIONS')
+    sample_count = min(10, len(new_tickers))
+    for i, idx in enumerate(list(new_tickers.keys())[:sample_count], 1):
+        row = df.loc[idx]
+        print(f'\n{i}. TICKER: {row["ticker"]}')
+        print(f'   TITLE: {row["title"][:100]}...')
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Smart ticker extraction for financial news')
+    parser.add_argument('--input', default='financial_news_df.pkl',
+                        help='articles with title/text/ticker columns (.pkl, .parquet or .csv)')
+    parser.add_argument('--output',
+                        help='stream (row, ticker) batches to this .parquet/.csv file; '
+                             'without it the input, which must then be a .pkl, is updated in place')
+    parser.add_argument('--batch-size', type=int, default=100000,
+                        help='rows per batch in streaming mode')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes; the tickers found do not depend on it')
+    parser.add_argument('--shard-size', type=int, default=5000,
+                        help='rows per shard, each starting from the cache as it was before the batch; '
+                             'the tickers found depend on it (0 = original sequential run, one process)')
+    parser.add_argument('--cache-db', default='company_ticker_cache.db',
+                        help='SQLite file with company-ticker mappings learned by earlier runs')
+    parser.add_argument('--no-cache-db', action='store_true',
+                        help='start from an empty cache and do not save what is learned')
+    args = parser.parse_args(argv)
+
+    warnings.filterwarnings('ignore')
+
+    print('SMART TICKER EXTRACTION (Pattern-Based)\n')
+    print('Using advanced pattern matching and context analysis')
+    print('No predefined company-to-ticker mappings required\n')
+
+    # Start from the mappings learned by earlier runs
+    store = None
+    extractor = SmartTickerExtractor()
+    if not args.no_cache_db:
+        store = CompanyTickerStore(args.cache_db)
+        extractor = SmartTickerExtractor(company_ticker_cache=store.load())
+        print(f'Loaded {len(extractor.company_ticker_cache):,} company-ticker mappings from {args.cache_db}\n')
+
+    if not args.output and os.path.splitext(args.input)[1].lower() != '.pkl':
+        parser.error('--output is required unless --input is a .pkl file (only pickles are updated in place)')
+
+    if args.output:
+        print(f'Streaming {args.input} -> {args.output} ({args.batch_size:,} rows per batch)\n')
+        rows_seen, new_count, extractor = stream_tickers(
+            args.input, args.output, batch_size=args.batch_size, extractor=extractor,
+            workers=args.workers, shard_size=args.shard_size, store=store)
+        print(f'Extraction complete!')
+        print(f'  Rows processed: {rows_seen:,}')
+        print(f'  Extracted: {new_count:,} new tickers')
+        print(f'  Learning cache size: {len(extractor.company_ticker_cache):,} company-ticker mappings')
+        print(f'Saved tickers to {args.output}')
+        return
+
+    # Load the dataframe
+    df = pd.read_pickle(args.input)
+
+    print('Processing articles\n')
+
+    # Get rows without tickers
+    total_missing = df['ticker'].isna().sum()
+    print(f'Rows without ticker: {total_missing:,}')
+    print(f'Total rows: {len(df):,}\n')
+
+    # Extract tickers
+    print(f'Extracting tickers ({args.workers} worker{"s" if args.workers > 1 else ""})')
+    new_tickers, extractor = backfill_tickers(df, extractor=extractor, workers=args.workers,
+                                              shard_size=args.shard_size)
+
+    print_report(df, new_tickers, extractor)
+
+    if store is not None:
+        new_pairs, updated = save_learned_pairs(extractor, store, source=args.input)
+        print(f'Cache {args.cache_db}: +{new_pairs:,} new, {updated:,} updated mappings')
+
+    # Save updated dataframe
+    print('Saving updated dataframe')
+    df.to_pickle(args.input)
+    print(f'Saved as {args.input}')
+
+
+if __name__ == '__main__':
+    with instrumented('smart_ticker_extraction'):
+        main()
@@ -0,0 +1,215 @@
+# snapshot_store.py
+
+"""
+Shared, memory-mapped dashboard snapshots for multi-worker serving.
+
+With several WSGI workers, SnapshotData would give every worker its own
+database connection and its own copy of the tables. Instead one process
+(serve_dashboard.py) builds a DashboardSnapshot from the database and
+publishes it here as uncompressed Arrow IPC files; every worker
+memory-maps them, so the pages are shared through the OS page cache and
+RAM does not grow with the worker count.
+
+Layout:
+    <dir>/CURRENT                       name of the live version
+    <dir>/<version>/manifest.json       the frame and heatmap keys below
+    <dir>/<version>/<source>_<kind>_<grain>.arrow
+        entity code, date and score columns, sorted by (entity, date);
+        the entity names are in the schema metadata
+    <dir>/<version>/<source>_heatmap_<grain>.arrow
+        the sector x date matrix of each score column, flattened row-major
+
+Publishing writes a new version directory under a temporary name, renames
+it, then replaces CURRENT, so a reader sees either the old snapshot or the
+new one, never a partial one. Old versions are pruned after keep newer
+ones exist; workers still mapping them keep working (POSIX unlink
+semantics).
+
+Usage:
+    store = SnapshotStore('data/dashboard_snapshots')
+    store.publish(DashboardSnapshot.load(data))      # writer
+    data = SharedSnapshotData(store)                  # in each worker
+"""
+
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+
+from dashboard_data import SCORE_COLUMNS, DashboardSnapshot, EntityFrame, HeatmapMatrix, SnapshotData
+
+
+def _write_table(path, table):
+    import pyarrow as pa
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def _map_table(path):
+    import pyarrow as pa
+    return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+
+def _column(table, name):
+    """Zero-copy NumPy view of a single-chunk column of a mapped table"""
+    return table.column(name).chunk(0).to_numpy(zero_copy_only=True)
+
+
+class SnapshotStore:
+    """Versioned directory of Arrow snapshots with an atomic CURRENT pointer"""
+
+    def __init__(self, directory, keep=3):
+        self.directory = directory
+        self.keep = keep
+        os.makedirs(directory, exist_ok=True)
+
+    def current(self):
+        """Name of the live version, or None before the first publish"""
+        try:
+            with open(os.path.join(self.directory, 'CURRENT')) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def versions(self):
+        return sorted(name for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)) and not name.endswith('.tmp'))
+
+    def publish(self, snapshot):
+        """Write a DashboardSnapshot as a new version and make it live; returns the version"""
+        import pyarrow as pa
+
+        version = time.strftime('%Y%m%dT%H%M%S') + f'-{os.getpid()}-{time.monotonic_ns() % 10**6:06d}'
+        tmp = os.path.join(self.directory, version + '.tmp')
+        os.makedirs(tmp)
+
+        for (source, kind, grain), frame in snapshot.frames.items():
+            table = pa.table({
+                'code': pa.array(frame.codes, type=pa.int32()),
+                'date': pa.array(frame.dates.astype('datetime64[ns]')),
+                **{column: pa.array(frame.scores[column], type=pa.float64()) for column in SCORE_COLUMNS},
+            }).replace_schema_metadata({'kind': kind, 'entities': json.dumps(frame.entities)})
+            _write_table(os.path.join(tmp, f'{source}_{kind}_{grain}.arrow'), table)
+
+        heatmaps = sorted({(source, grain) for source, _, grain in snapshot.heatmaps})
+        for source, grain in heatmaps:
+            matrices = [snapshot.heatmaps[source, column, grain] for column in SCORE_COLUMNS]
+            first = matrices[0]
+            table = pa.table({column: pa.array(m.values.ravel(), type=pa.float64())
+                              for column, m in zip(SCORE_COLUMNS, matrices)})
+            table = table.replace_schema_metadata({
+                'sectors': json.dumps(list(first.sectors)),
+                'dates': json.dumps([str(d) for d in first.dates.astype('datetime64[D]')]),
+            })
+            _write_table(os.path.join(tmp, f'{source}_heatmap_{grain}.arrow'), table)
+
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump({'frames': sorted(snapshot.frames), 'heatmaps': heatmaps}, f)
+
+        os.rename(tmp, os.path.join(self.directory, version))
+        pointer = os.path.join(self.directory, 'CURRENT.tmp')
+        with open(pointer, 'w') as f:
+            f.write(version)
+        os.replace(pointer, os.path.join(self.directory, 'CURRENT'))
+        self._prune(version)
+        return version
+
+    def _prune(self, live):
+        for name in self.versions()[:-self.keep]:
+            if name != live:
+                # Mapped files can't be removed on Windows; try again next time
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def open(self, version=None):
+        """DashboardSnapshot whose arrays are views of the memory-mapped files"""
+        version = version or self.current()
+        if version is None:
+            raise FileNotFoundError(f'No snapshot has been published to {self.directory}')
+        root = os.path.join(self.directory, version)
+        with open(os.path.join(root, 'manifest.json')) as f:
+            manifest = json.load(f)
+
+        frames = {}
+        for source, kind, grain in manifest['frames']:
+            table = _map_table(os.path.join(root, f'{source}_{kind}_{grain}.arrow'))
+            meta = table.schema.metadata
+            frames[source, kind, grain] = EntityFrame(
+                kind, json.loads(meta[b'entities']), _column(table, 'code'),
+                _column(table, 'date'), {column: _column(table, column) for column in SCORE_COLUMNS})
+
+        heatmaps = {}
+        for source, grain in manifest['heatmaps']:
+            table = _map_table(os.path.join(root, f'{source}_heatmap_{grain}.arrow'))
+            meta = table.schema.metadata
+            sectors = json.loads(meta[b'sectors'])
+            dates = np.array(json.loads(meta[b'dates']), dtype='datetime64[D]').astype('datetime64[ns]')
+            for column in SCORE_COLUMNS:
+                values = _column(table, column).reshape(len(sectors), len(dates))
+                heatmaps[source, column, grain] = HeatmapMatrix(values, sectors, dates)
+
+        return DashboardSnapshot(frames, heatmaps, version=version)
+
+
+class SharedSnapshotData(SnapshotData):
+    """
+    SnapshotData backed by a SnapshotStore instead of a database: each
+    worker checks CURRENT at most every check_every seconds and swaps in a
+    newly published version without blocking requests.
+    """
+
+    def __init__(self, store, check_every=5):
+        self.store = store
+        self.check_every = check_every
+        self.snapshot = store.open()
+        self._checked_at = time.monotonic()
+        self._reloading = threading.Lock()
+
+    def current(self):
+        snapshot = self.snapshot
+        now = time.monotonic()
+        if now - self._checked_at > self.check_every and self._reloading.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                version = self.store.current()
+                if version is not None and version != snapshot.version:
+                    self.snapshot = snapshot = self.store.open(version)
+            finally:
+                self._reloading.release()
+        return snapshot
+
+    def health(self):
+        health = super().health()
+        root = os.path.join(self.store.directory, self.snapshot.version)
+        health.update(mode='shared', version=self.snapshot.version,
+                      published_seconds_ago=round(time.time() - os.path.getmtime(root), 1))
+        return health
+
+    def close(self):
+        pass
+
+
+class SnapshotRefresher(threading.Thread):
+    """Background thread that rebuilds the snapshot from the database every interval seconds"""
+
+    def __init__(self, data, store, interval=600):
+        super().__init__(name='snapshot-refresher', daemon=True)
+        self.data = data
+        self.store = store
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                started = time.perf_counter()
+                version = self.store.publish(DashboardSnapshot.load(self.data))
+                print(f"Published dashboard snapshot {version} in {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                # Keep serving the last good snapshot
+                print(f"Snapshot refresh failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
@@ -0,0 +1,169 @@
+# test_dashboard_data.py
+
+"""DashboardData's SQL queries against a SQLite stand-in for the stats database"""
+
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from dashboard_data import SCORE_COLUMNS, TABLES, DashboardData, SnapshotData
+
+TICKERS = ['AAPL', 'KO', 'MSFT', 'XOM']
+SECTORS = ['Consumer Staples', 'Energy', 'Technology']
+DAYS = pd.date_range('2024-01-01', '2024-03-31')
+
+
+def stats_frame(kind, entities, seed):
+    rng = np.random.default_rng(seed)
+    rows = [(day, entity) for day in DAYS for entity in entities if rng.random() < 0.8]
+    df = pd.DataFrame(rows, columns=['date', kind])
+    for column in SCORE_COLUMNS:
+        df[column] = rng.uniform(-1, 1, len(df))
+    return df
+
+
+@pytest.fixture
+def tables():
+    return {(source, kind): stats_frame(kind, TICKERS if kind == 'ticker' else SECTORS, seed)
+            for seed, (source, kind) in enumerate(TABLES)}
+
+
+@pytest.fixture
+def db_url(tmp_path, tables):
+    url = f'sqlite:///{tmp_path / "stats.db"}'
+    engine = create_engine(url)
+    for key, df in tables.items():
+        # Dates as 'YYYY-MM-DD' text, as ingest_stats.py stores them
+        df.assign(date=df['date'].dt.strftime('%Y-%m-%d')).to_sql(TABLES[key], engine, index=False)
+    engine.dispose()
+    return url
+
+
+@pytest.fixture
+def data(db_url):
+    data = DashboardData(db_url)
+    data.ensure_indexes()
+    yield data
+    data.close()
+
+
+def test_date_range_and_entities(data):
+    assert data.date_range() == (DAYS[0], DAYS[-1])
+    assert data.entities('reddit', 'ticker') == TICKERS
+    assert data.entities('merged', 'sector') == SECTORS
+    assert data.grain(DAYS[0], DAYS[-1]) == 'daily'
+
+
+def test_series_pushes_down_the_filters(data, tables):
+    start, end = '2024-02-03', '2024-02-20'
+    got = data.series('merged', 'ticker', start, end, ['MSFT', 'AAPL'])
+    df = tables['merged', 'ticker']
+    expected = df[df['ticker'].isin(['AAPL', 'MSFT']) & df['date'].between(start, end)]
+    expected = expected.sort_values(['ticker', 'date'], ignore_index=True)
+    pd.testing.assert_frame_equal(got.reset_index(drop=True), expected[got.columns], check_dtype=False)
+    assert data.series('merged', 'ticker', start, end, []).empty
+
+
+def test_heatmap_matches_a_pandas_pivot(data, tables):
+    start, end = '2024-01-10', '2024-02-10'
+    got = data.heatmap('reddit', start, end, ['Technology', 'Energy'], 'rolling_90d_sentiment')
+    df = tables['reddit', 'sector']
+    df = df[df['sector'].isin(['Technology', 'Energy']) & df['date'].between(start, end)]
+    expected = df.pivot_table(index='sector', columns='date', values='rolling_90d_sentiment', aggfunc='mean')
+    pd.testing.assert_frame_equal(got, expected, check_names=False, check_freq=False)
+    with pytest.raises(ValueError):
+        data.heatmap('reddit', start, end, [], 'title')
+
+
+def test_results_are_cached_until_the_ttl(db_url):
+    data = DashboardData(db_url, cache_ttl=300)
+    first = data.series('reddit', 'ticker', '2024-01-01', '2024-01-31', ['KO'])
+    assert data.series('reddit', 'ticker', '2024-01-01', '2024-01-31', ['KO']) is first
+    # One query for the rollup tables, one for the series
+    assert data.cache.misses == 2
+    assert data.date_range()[1] == DAYS[-1]
+
+    engine = create_engine(db_url)
+    pd.DataFrame({'date': ['2024-04-01'], 'ticker': ['KO'], 'avg_sentiment_score': [0.1],
+                  'rolling_90d_sentiment': [0.2]}).to_sql(TABLES['reddit', 'ticker'], engine, index=False,
+                                                            if_exists='append')
+    engine.dispose()
+    assert data.date_range()[1] == DAYS[-1]
+
+    fresh = DashboardData(db_url, cache_ttl=0)
+    assert fresh.date_range()[1] == pd.Timestamp('2024-04-01')
+    data.close()
+    fresh.close()
+
+
+def test_cache_is_bounded(db_url):
+    data = DashboardData(db_url, cache_size=3)
+    for day in range(1, 10):
+        data.series('reddit', 'ticker', f'2024-01-{day:02d}', '2024-01-31', ['KO'])
+    assert len(data.cache) == 3
+    data.close()
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+def test_snapshot_matches_the_sql_queries(data):
+    snapshot = SnapshotData(data)
+    start, end = '2024-02-03', '2024-02-20'
+    assert snapshot.date_range() == data.date_range()
+    assert snapshot.entities('reddit', 'ticker') == data.entities('reddit', 'ticker')
+    pd.testing.assert_frame_equal(snapshot.series('reddit', 'ticker', start, end, ['KO']).reset_index(drop=True),
+                                  data.series('reddit', 'ticker', start, end, ['KO']), check_dtype=False)
+
+
+def test_stale_snapshot_reloads_in_the_background(data, monkeypatch):
+    snapshot = SnapshotData(data, max_age=0)
+    old = snapshot.snapshot
+    release = threading.Event()
+    load_table = data.load_table
+
+    def slow_load_table(*args):
+        release.wait(5)
+        return load_table(*args)
+
+    monkeypatch.setattr(data, 'load_table', slow_load_table)
+    started = time.monotonic()
+    # The request is answered from the old snapshot while the reload waits
+    assert snapshot.current() is old
+    assert snapshot.current() is old
+    assert time.monotonic() - started < 1
+    release.set()
+    wait_for(lambda: snapshot.snapshot is not old)
+
+
+def test_failed_reloads_keep_the_old_snapshot_and_back_off(data, monkeypatch):
+    snapshot = SnapshotData(data, max_age=0, retry_after=60)
+    old = snapshot.snapshot
+    calls = []
+
+    def broken_load_table(*args):
+        calls.append(args)
+        raise ConnectionError('database is down')
+
+    monkeypatch.setattr(data, 'load_table', broken_load_table)
+    assert snapshot.current() is old
+    wait_for(lambda: snapshot.failures == 1 and not snapshot._reloading.locked())
+    for _ in range(10):
+        assert snapshot.current() is old
+    assert len(calls) == 1
+    assert snapshot.health()['last_reload_error'] == 'ConnectionError: database is down'
+
+    # After the back-off the next reload goes ahead, and success clears the failures
+    monkeypatch.undo()
+    snapshot._next_reload = time.monotonic()
+    snapshot.current()
+    wait_for(lambda: snapshot.snapshot is not old)
+    assert snapshot.failures == 0 and 'reload_failures' not in snapshot.health()
@@ -0,0 +1,99 @@
+# test_ingest_stats.py
+
+"""StatsIngester upserts and rollup refreshes on an in-memory SQLite database"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from dashboard_data import SCORE_COLUMNS, TABLES, rollup_table
+from ingest_stats import StatsIngester, rollup
+
+TABLE = TABLES['reddit', 'ticker']
+
+
+def stats(days, tickers=('AAPL', 'KO'), seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame([(day, ticker) for day in pd.date_range(*days) for ticker in tickers],
+                      columns=['date', 'ticker'])
+    for column in SCORE_COLUMNS:
+        df[column] = rng.uniform(-1, 1, len(df)).round(6)
+    return df
+
+
+def read(engine, table):
+    with engine.connect() as connection:
+        df = pd.read_sql(text(f'SELECT * FROM "{table}" ORDER BY ticker, "date"'), connection)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+@pytest.fixture
+def ingester():
+    engine = create_engine('sqlite:///:memory:')
+    ingester = StatsIngester(engine)
+    ingester.ensure_tables()
+    yield ingester
+    engine.dispose()
+
+
+def test_first_load_inserts_rows_and_builds_rollups(ingester):
+    df = stats(('2024-01-01', '2024-03-31'))
+    counts = ingester.ingest('reddit', 'ticker', df)
+    assert counts['rows'] == counts['changed'] == len(df)
+
+    daily = read(ingester.engine, TABLE)
+    pd.testing.assert_frame_equal(daily, df.sort_values(['ticker', 'date'], ignore_index=True)[daily.columns])
+    for grain in ('weekly', 'monthly'):
+        expected = rollup(df, 'ticker', grain).sort_values(['ticker', 'date'], ignore_index=True)
+        got = read(ingester.engine, rollup_table(TABLE, grain))
+        pd.testing.assert_frame_equal(got[expected.columns], expected, check_dtype=False)
+    monthly = read(ingester.engine, rollup_table(TABLE, 'monthly'))
+    assert monthly['days'].tolist() == [31, 29, 31] * 2
+
+
+def test_reloading_unchanged_stats_changes_nothing(ingester):
+    df = stats(('2024-01-01', '2024-02-29'))
+    ingester.ingest('reddit', 'ticker', df)
+    assert ingester.ingest('reddit', 'ticker', df) == {'rows': len(df), 'changed': 0, 'rollup_rows': 0}
+
+
+def test_upsert_updates_changed_days_and_their_periods(ingester):
+    df = stats(('2024-01-01', '2024-03-31'))
+    ingester.ingest('reddit', 'ticker', df)
+    weekly_before = read(ingester.engine, rollup_table(TABLE, 'weekly'))
+
+    update = df[df['date'] >= '2024-03-25'].copy()
+    update.loc[update['ticker'] == 'KO', 'avg_sentiment_score'] = 0.5
+    new_day = stats(('2024-04-01', '2024-04-01'), seed=1)
+    counts = ingester.ingest('reddit', 'ticker', pd.concat([update, new_day]))
+    assert counts['changed'] == (update['ticker'] == 'KO').sum() + len(new_day)
+
+    merged = pd.concat([df[df['date'] < '2024-03-25'], update, new_day])
+    daily = read(ingester.engine, TABLE)
+    pd.testing.assert_frame_equal(daily, merged.sort_values(['ticker', 'date'], ignore_index=True)[daily.columns])
+    weekly = read(ingester.engine, rollup_table(TABLE, 'weekly'))
+    expected = rollup(merged, 'ticker', 'weekly').sort_values(['ticker', 'date'], ignore_index=True)
+    pd.testing.assert_frame_equal(weekly[expected.columns], expected, check_dtype=False)
+    # Weeks before the first changed one were not rewritten
+    untouched = weekly_before['date'] < '2024-03-25'
+    pd.testing.assert_frame_equal(weekly[weekly['date'] < '2024-03-25'].reset_index(drop=True),
+                                  weekly_before[untouched].reset_index(drop=True))
+
+
+def test_duplicate_input_days_keep_the_last_row(ingester):
+    df = stats(('2024-01-01', '2024-01-03'), tickers=('AAPL',))
+    later = df.iloc[[1]].assign(avg_sentiment_score=0.25)
+    ingester.ingest('reddit', 'ticker', pd.concat([df, later]))
+    daily = read(ingester.engine, TABLE)
+    assert len(daily) == 3
+    assert daily.loc[1, 'avg_sentiment_score'] == 0.25
+
+
+def test_rebuild_rollups_matches_incremental_refresh(ingester):
+    ingester.ingest('reddit', 'ticker', stats(('2024-01-01', '2024-02-15')))
+    ingester.ingest('reddit', 'ticker', stats(('2024-02-10', '2024-03-10'), seed=2))
+    incremental = read(ingester.engine, rollup_table(TABLE, 'weekly'))
+    ingester.rebuild_rollups('reddit', 'ticker')
+    pd.testing.assert_frame_equal(read(ingester.engine, rollup_table(TABLE, 'weekly')), incremental)
@@ -0,0 +1,215 @@
+# test_reddit_collector.py
+
+"""reddit_collector.py against the offline FakeReddit from fake_reddit.py"""
+
+import time
+
+import pandas as pd
+import pytest
+
+import reddit_collector
+from collector_state import CollectorState
+from fake_reddit import FakeReddit, FakeServerError
+from metrics import METRICS
+from reddit_collector import (CHECKPOINT_OVERLAP, MAX_QUERY_CHARS, CollectionProgress, SearchQuery, TokenBucket,
+                              collect_posts, plan_queries, query_since)
+
+TICKERS = ["AAPL", "MSFT", "NVDA", "TSLA", "KO", "XOM", "JPM", "PFE"]
+SUBREDDITS = ["stocks", "investing", "wallstreetbets"]
+NOW = 1_700_000_000.0
+
+
+class Forbidden(Exception):
+    """Named like the prawcore error for a private or banned subreddit"""
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+def fake(**kwargs):
+    return FakeReddit(TICKERS, posts_per_sub=300, now=NOW, **kwargs)
+
+
+def collect(reddit, queries, **kwargs):
+    """{query: [(submission, matched tickers), ...]} plus the progress tracker"""
+    progress = CollectionProgress([p for q in queries for p in q.pairs])
+    kwargs = {"workers": 4, "rate": 10000, "burst": 100, "backoff": 0, **kwargs}
+    results = dict(collect_posts(queries, lambda: reddit, progress=progress, **kwargs))
+    progress.close()
+    return results, progress
+
+
+def post_ids(results):
+    return {submission.id for found in results.values() for submission, _ in found}
+
+
+def counter(name):
+    return sum(c["value"] for c in METRICS.snapshot()["counters"] if c["name"] == name)
+
+
+def test_plan_queries_covers_every_pair_once():
+    tickers = [f"T{i:03d}" for i in range(250)]
+    queries = plan_queries(tickers, SUBREDDITS, tickers_per_query=100, subreddits_per_query=2)
+    pairs = [pair for query in queries for pair in query.pairs]
+    assert sorted(pairs) == sorted((t, s) for t in tickers for s in SUBREDDITS)
+    assert all(len(query.text) <= MAX_QUERY_CHARS for query in queries)
+    assert all(len(query.subreddits) <= 2 for query in queries)
+
+
+def test_split_halves_cover_the_same_pairs():
+    query = SearchQuery(("AAPL", "MSFT", "KO"), ("stocks", "investing"))
+    halves = query.split()
+    assert sorted(halves[0].pairs + halves[1].pairs) == sorted(query.pairs)
+    # Tickers are split first, then subreddits, down to a single pair
+    assert [len(h.tickers) for h in halves] == [1, 2]
+    assert SearchQuery(("AAPL",), ("stocks", "investing")).split()[0].subreddits == ("stocks",)
+    assert SearchQuery(("AAPL",), ("stocks",)).split() is None
+
+
+def test_token_bucket_limits_the_rate():
+    bucket = TokenBucket(rate=50, capacity=2)
+    started = time.monotonic()
+    waits = [bucket.acquire() for _ in range(12)]
+    elapsed = time.monotonic() - started
+    # The burst is free, the other 10 tokens arrive at 50 per second
+    assert waits[:2] == [0.0, 0.0]
+    assert elapsed >= 10 / 50 * 0.9
+    assert bucket.waited == pytest.approx(sum(waits))
+
+
+def test_collect_posts_shares_one_rate_limit_across_workers():
+    reddit = fake()
+    queries = plan_queries(TICKERS, SUBREDDITS, tickers_per_query=2, subreddits_per_query=1)
+    started = time.monotonic()
+    collect(reddit, queries, workers=8, rate=100, burst=1, limit=100)
+    elapsed = time.monotonic() - started
+    assert reddit.requests > len(queries)
+    assert elapsed >= (reddit.requests - 1) / 100 * 0.9
+
+
+def test_transient_failures_are_retried():
+    queries = plan_queries(TICKERS, SUBREDDITS, tickers_per_query=3)
+    expected, _ = collect(fake(), queries)
+
+    flaky = fake(failure_rate=0.3, seed=1)
+    results, progress = collect(flaky, queries, retries=20)
+    assert progress.failed() == []
+    assert post_ids(results) == post_ids(expected)
+    assert counter("reddit_search_retries_total") > 0
+    assert all(progress.status[pair]["attempts"] >= 1 for pair in progress.status)
+    assert max(entry["attempts"] for entry in progress.status.values()) > 1
+
+
+def test_searches_that_keep_failing_are_marked_failed():
+    queries = plan_queries(TICKERS, SUBREDDITS, tickers_per_query=4)
+    results, progress = collect(fake(failure_rate=1.0), queries, retries=2)
+    assert results == {}
+    assert sorted(progress.failed()) == sorted(p for q in queries for p in q.pairs)
+    assert all(entry["attempts"] == 3 for entry in progress.status.values())
+    assert "503" in next(iter(progress.status.values()))["error"]
+    assert counter("reddit_search_failures_total") == len(queries)
+
+
+def test_non_retryable_errors_fail_at_once():
+    reddit = fake()
+
+    def forbidden(*args, **kwargs):
+        raise Forbidden("received 403 HTTP response")
+
+    reddit._request = forbidden
+    queries = plan_queries(TICKERS[:2], SUBREDDITS[:1])
+    _, progress = collect(reddit, queries, retries=5)
+    assert all(entry["attempts"] == 1 and entry["state"] == "failed" for entry in progress.status.values())
+
+
+def test_saturated_searches_are_split():
+    queries = plan_queries(TICKERS, SUBREDDITS)
+    complete, _ = collect(fake(), queries, limit=10000)
+    split, _ = collect(fake(), queries, limit=150)
+    assert counter("reddit_search_splits_total") > 0
+    assert post_ids(split) == post_ids(complete)
+    # Only the searches that were not split again are yielded
+    assert all(len(found) < 150 for found in split.values())
+
+
+def test_results_are_tagged_with_the_matched_tickers():
+    results, _ = collect(fake(), plan_queries(TICKERS, SUBREDDITS, tickers_per_query=2))
+    for query, found in results.items():
+        for submission, matched in found:
+            assert matched and set(matched) <= set(query.tickers)
+            assert all(t in submission.title.replace("$", "").split() for t in matched)
+
+
+def test_checkpoints_stop_searches_at_collected_posts(tmp_path):
+    queries = plan_queries(TICKERS, SUBREDDITS, tickers_per_query=2, subreddits_per_query=1)
+    first, _ = collect(fake(), queries)
+    newest = {}
+    for query, found in first.items():
+        top = max(submission.created_utc for submission, _ in found)
+        for pair in query.pairs:
+            newest[pair] = max(newest.get(pair, top), top)
+
+    state = CollectorState(str(tmp_path / "state.db"))
+    state.add_posts((submission.id, submission.created_utc) for found in first.values() for submission, _ in found)
+    state.commit_run(newest, len(post_ids(first)), mode="full")
+    # Checkpoints only move forward
+    state.commit_run({pair: utc - 1000 for pair, utc in newest.items()}, 0)
+    checkpoints = state.checkpoints()
+    assert checkpoints == newest
+
+    reddit = fake()
+    second, _ = collect(reddit, queries, checkpoints=checkpoints)
+    assert reddit.requests == len(queries)
+    for query, found in second.items():
+        since = query_since(query, checkpoints)
+        assert since == min(checkpoints[pair] for pair in query.pairs) - CHECKPOINT_OVERLAP
+        assert all(submission.created_utc >= since for submission, _ in found)
+    assert len(post_ids(second)) < len(post_ids(first))
+    assert state.unseen(post_ids(second)) == []
+    state.close()
+
+
+def test_fake_server_error_is_retryable():
+    assert reddit_collector.is_retryable(FakeServerError("503"))
+    assert not reddit_collector.is_retryable(Forbidden("403"))
+
+
+@pytest.fixture
+def collector_run(tmp_path, monkeypatch):
+    """Run main() --fake in tmp_path, with a plain lower-casing title cleaner"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(reddit_collector, "clean_reddit_headline", str.lower)
+
+    def run(*flags):
+        reddit_collector.main(["--fake", "--rate", "10000", "--batch-size", "500", *flags])
+        return pd.read_csv(tmp_path / "data" / "reddit_sentiment_input.csv")
+    return run
+
+
+def test_full_run_writes_each_post_once(collector_run):
+    df = collector_run()
+    assert len(df) > 0
+    assert df["id"].is_unique
+    assert df["title"].is_unique
+    assert not df["title"].str.contains("daily discussion").any()
+    state = CollectorState("data/collector_state.db")
+    assert len(state) == len(df)
+    state.close()
+
+
+def test_resume_and_incremental_runs_add_nothing_already_written(collector_run, tmp_path):
+    full = collector_run()
+    resumed = collector_run("--resume")
+    assert sorted(resumed["id"]) == sorted(full["id"])
+    incremental = collector_run("--incremental")
+    assert len(incremental) == len(full)
+
+    state = CollectorState(str(tmp_path / "data" / "collector_state.db"))
+    modes = [row[0] for row in state.conn.execute("SELECT mode FROM runs ORDER BY run_id")]
+    assert modes == ["full", "resume", "incremental"]
+    assert state.checkpoints()
+    state.close()
@@ -0,0 +1,125 @@
+# test_sentiment_aggregates.py
+
+"""SentimentAggregates folding of scored rows"""
+
+import numpy as np
+import pandas as pd
+
+from sentiment_aggregates import SentimentAggregates, parse_published, rolling_sums
+
+
+def scored(published):
+    return pd.DataFrame({
+        'published': published,
+        'tickers': [['AAPL']] * len(published),
+        'sectors': [['Technology']] * len(published),
+        'sentiment_score': [0.5] * len(published),
+    })
+
+
+def test_parse_published_mixes_offsets_and_naive_times():
+    parsed = parse_published(['2024-06-01T12:00:00+00:00', '2024-06-01T23:30:00-05:00',
+                              '2024-06-02 10:00:00', None, 'not a date'])
+    assert parsed.dt.tz is None
+    assert parsed[:3].tolist() == [pd.Timestamp('2024-06-01 12:00'), pd.Timestamp('2024-06-02 04:30'),
+                                   pd.Timestamp('2024-06-02 10:00')]
+    assert parsed[3:].isna().all()
+
+
+def test_fold_accepts_the_collectors_offset_timestamps():
+    aggregates = SentimentAggregates(':memory:')
+    assert aggregates.fold(scored(['2024-06-01T12:00:00+00:00', '2024-06-02T12:00:00+00:00'])) == 2
+    assert aggregates.fold(scored(['2024-06-02T18:00:00+00:00', '2024-06-03 09:00:00'])) == 2
+    stats = aggregates.stats('ticker', days=None)
+    assert stats['date'].dt.strftime('%Y-%m-%d').tolist() == ['2024-06-01', '2024-06-02', '2024-06-03']
+
+
+def test_fold_csv_rereads_from_the_last_folded_day(tmp_path):
+    path = tmp_path / 'scored.csv'
+    scored(['2024-06-01T12:00:00+00:00', '2024-06-02T12:00:00+00:00']).to_csv(path, index=False)
+    aggregates = SentimentAggregates(str(tmp_path / 'aggregates.db'))
+    assert aggregates.fold_csv(str(path)) == 2
+    assert aggregates.fold_csv(str(path)) == 1
+    assert len(aggregates) == 4
+
+
+def gappy_scored(seed=0, rows=600):
+    """Scored rows over a year with gaps, several rows per day and rows mentioning two tickers"""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.sort(rng.choice(365, 80, replace=False)), unit='D')
+    published = rng.choice(days, rows) + pd.to_timedelta(rng.integers(0, 86400, rows), unit='s')
+    tickers = [list(rng.choice(['AAPL', 'KO', 'XOM'], rng.integers(1, 3), replace=False)) for _ in range(rows)]
+    df = pd.DataFrame({
+        'published': pd.Series(published).dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        'tickers': tickers,
+        'sectors': [['Technology'] if 'AAPL' in t else ['Other'] for t in tickers],
+        'sentiment_score': rng.uniform(-1, 1, rows).round(4),
+    })
+    return df.sort_values('published', ignore_index=True)
+
+
+def brute_force_stats(df, kind='ticker', column='tickers'):
+    """The day's mean and the mean over the 90 calendar days ending on it, mention by mention"""
+    flat = df.assign(date=pd.to_datetime(df['published']).dt.normalize()).explode(column)
+    rows = []
+    for (entity, date), day in flat.groupby([column, 'date']):
+        window = flat[(flat[column] == entity) & flat['date'].between(date - pd.Timedelta(days=89), date)]
+        rows.append((date, entity, day['sentiment_score'].mean(), window['sentiment_score'].mean()))
+    return (pd.DataFrame(rows, columns=['date', kind, 'avg_sentiment_score', 'rolling_90d_sentiment'])
+            .sort_values(['date', kind], ignore_index=True))
+
+
+def stored(aggregates):
+    return pd.read_sql_query('SELECT * FROM daily ORDER BY kind, date, entity', aggregates.conn)
+
+
+def test_rolling_window_is_90_calendar_days():
+    df = gappy_scored()
+    aggregates = SentimentAggregates(':memory:')
+    aggregates.fold(df)
+    for kind, column in (('ticker', 'tickers'), ('sector', 'sectors')):
+        pd.testing.assert_frame_equal(aggregates.stats(kind, days=None), brute_force_stats(df, kind, column))
+
+
+def test_rolling_sums_keeps_entities_apart():
+    # KO's only day is 100 days before AAPL's first one, and within 90 days of XOM's
+    days = pd.DataFrame({
+        'entity': ['AAPL', 'KO', 'AAPL', 'XOM', 'XOM'],
+        'date': pd.to_datetime(['2024-04-20', '2024-01-01', '2024-04-10', '2024-01-02', '2024-03-30']),
+        'score_sum': [1.0, 10.0, 2.0, 100.0, 200.0],
+        'mentions': [1, 1, 2, 1, 1],
+    })
+    out = rolling_sums(days).set_index(['entity', 'date'])
+    assert out.loc[('AAPL', pd.Timestamp('2024-04-10')), ['window_sum', 'window_mentions']].tolist() == [2, 2]
+    assert out.loc[('AAPL', pd.Timestamp('2024-04-20')), ['window_sum', 'window_mentions']].tolist() == [3, 3]
+    assert out.loc[('KO', pd.Timestamp('2024-01-01')), ['window_sum', 'window_mentions']].tolist() == [10, 1]
+    # 2024-01-02 is the 89th day before 2024-03-30, so still in the window
+    assert out.loc[('XOM', pd.Timestamp('2024-03-30')), ['window_sum', 'window_mentions']].tolist() == [300, 2]
+
+
+def test_incremental_folds_match_a_full_fold(tmp_path):
+    df = gappy_scored(seed=1)
+    full = SentimentAggregates(':memory:')
+    full.fold(df)
+
+    # The first CSV ends halfway through a day, which the later folds re-read whole
+    path = tmp_path / 'scored.csv'
+    dates = df['published'].str[:10]
+    cut = dates.index[dates == dates.unique()[40]][0] + 1
+    aggregates = SentimentAggregates(str(tmp_path / 'aggregates.db'))
+    for end in (cut, dates.index[dates == dates.unique()[60]][0], len(df)):
+        df.iloc[:end].to_csv(path, index=False)
+        aggregates.fold_csv(str(path))
+
+    pd.testing.assert_frame_equal(stored(aggregates), stored(full))
+
+
+def test_rows_dated_before_the_last_folded_day_are_skipped(tmp_path):
+    path = tmp_path / 'scored.csv'
+    scored(['2024-06-01T12:00:00', '2024-06-05T12:00:00']).to_csv(path, index=False)
+    aggregates = SentimentAggregates(':memory:')
+    aggregates.fold_csv(str(path))
+    # A late row for 2024-06-03 is never folded; only 2024-06-05 is re-read
+    scored(['2024-06-01T12:00:00', '2024-06-03T12:00:00', '2024-06-05T12:00:00']).to_csv(path, index=False)
+    assert aggregates.fold_csv(str(path)) == 1
+    assert aggregates.stats('ticker', days=None)['date'].dt.day.tolist() == [1, 5]
@@ -0,0 +1,49 @@
+# test_sentiment_cache.py
+
+"""SentimentCache expiry and purging"""
+
+import time
+
+import numpy as np
+
+from sentiment_cache import SentimentCache
+
+
+def fill(path, model_hash, keys, age_days=0):
+    cache = SentimentCache(path, model_hash, purge=False)
+    cache.put(keys, np.full((len(keys), 3), 0.25))
+    if age_days:
+        with cache.conn:
+            cache.conn.execute('UPDATE results SET created_at = ? WHERE model = ?',
+                               (time.time() - age_days * 86400, model_hash))
+    cache.close()
+
+
+def test_opening_keeps_other_models_entries(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    fill(path, 'torch', [b'a', b'b'])
+    fill(path, 'numpy', [b'a'])
+    numpy_cache = SentimentCache(path, 'numpy')
+    torch_cache = SentimentCache(path, 'torch')
+    assert len(numpy_cache) == 1 and len(torch_cache) == 2
+    assert list(torch_cache.get([b'a', b'b', b'c'])) == [b'a', b'b']
+
+
+def test_expired_entries_are_purged_for_every_model(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    fill(path, 'torch', [b'a'], age_days=100)
+    fill(path, 'numpy', [b'a', b'b'], age_days=100)
+    fill(path, 'numpy', [b'c'])
+    cache = SentimentCache(path, 'torch', ttl_days=90)
+    assert len(cache) == 0
+    assert cache.conn.execute('SELECT COUNT(*) FROM results').fetchone()[0] == 1
+
+
+def test_other_models_are_purged_only_on_request(tmp_path):
+    path = str(tmp_path / 'cache.db')
+    fill(path, 'torch', [b'a'])
+    fill(path, 'numpy', [b'a', b'b'])
+    cache = SentimentCache(path, 'torch', purge=False)
+    assert cache.purge() == 0
+    assert cache.purge(other_models=True) == 2
+    assert SentimentCache(path, 'numpy').get([b'a', b'b']) == {}
@@ -0,0 +1,70 @@
+# test_smart_ticker_extraction.py
+
+"""backfill_tickers on the synthetic news corpus from benchmark_suite.py"""
+
+import pandas as pd
+import pytest
+
+from benchmark_suite import news_corpus
+from metrics import METRICS
+from smart_ticker_extraction import SmartTickerExtractor, backfill_tickers, main
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics():
+    METRICS.reset()
+    yield
+    METRICS.reset()
+
+
+@pytest.fixture(scope='module')
+def corpus():
+    df = news_corpus(3000, seed=3)
+    # Every article needs a ticker extracted
+    return df.assign(ticker=None)
+
+
+def backfill(corpus, **kwargs):
+    df = corpus.copy()
+    new_tickers, extractor = backfill_tickers(df, extractor=SmartTickerExtractor(), **kwargs)
+    return df['ticker'], new_tickers, extractor.company_ticker_cache
+
+
+def test_the_worker_count_does_not_change_the_result(corpus):
+    tickers, new_tickers, cache = backfill(corpus, workers=1, shard_size=500)
+    assert new_tickers
+    for workers in (2, 3):
+        got_tickers, got_new, got_cache = backfill(corpus, workers=workers, shard_size=500)
+        pd.testing.assert_series_equal(got_tickers, tickers)
+        assert got_new == new_tickers
+        assert got_cache == cache
+
+
+def test_sequential_run_grows_one_cache_across_all_rows(corpus):
+    sequential, _, _ = backfill(corpus, shard_size=0)
+    # Later shards can't use what earlier shards learned, so results differ
+    sharded, _, _ = backfill(corpus, shard_size=500)
+    assert (sequential.fillna('') != sharded.fillna('')).any()
+
+    extractor = SmartTickerExtractor()
+    expected = [extractor.extract_ticker({'ticker': None, 'title': title, 'text': text})
+                for title, text in zip(corpus['title'], corpus['text'])]
+    assert sequential.tolist() == expected
+    # One shard as large as the input is the same run
+    single_shard, _, _ = backfill(corpus, shard_size=len(corpus))
+    pd.testing.assert_series_equal(single_shard, sequential)
+
+
+def test_only_pickles_are_updated_in_place(corpus, tmp_path, capsys):
+    path = tmp_path / 'news.parquet'
+    corpus.head(50).to_parquet(path)
+    before = path.read_bytes()
+    with pytest.raises(SystemExit) as exit_info:
+        main(['--input', str(path), '--no-cache-db'])
+    assert exit_info.value.code == 2
+    assert '--output is required' in capsys.readouterr().err
+    assert path.read_bytes() == before
+
+    output = tmp_path / 'tickers.parquet'
+    main(['--input', str(path), '--output', str(output), '--no-cache-db'])
+    assert pd.read_parquet(output)['row'].tolist() == list(range(50))
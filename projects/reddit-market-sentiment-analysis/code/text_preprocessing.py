@@ -14,19 +14,113 @@ accurate sentiment analysis (e.g., preserving negation words like 'not').
 Required Libraries:
 - NLTK: The Natural Language Toolkit (pip install nltk)
 
+For many headlines at once, clean_reddit_headlines() accepts a list or a
+pandas Series and processes each distinct headline and token only once.
+
 One-Time Setup:
 Before first use, the following NLTK data package must be downloaded for lemmatization.
 Run this in a Python interpreter:
 >>> import nltk
 >>> nltk.download('wordnet')
+
+NLTK and the WordNet corpus are only loaded the first time a token has to
+be lemmatized, so importing this module is cheap. Short-lived jobs can skip
+WordNet entirely with a precomputed lemma table for our vocabulary:
+    python text_preprocessing.py --build-lemma-table lemma_table.tsv.gz --corpus data/reddit_sentiment_input.csv
+The table next to this file (or the path in $LEMMA_TABLE) is picked up
+automatically; tokens missing from it still fall back to WordNet.
+
+clean_reddit_headlines() records its time per step and the number of
+WordNet fallbacks in metrics.METRICS (see metrics.py).
 """
 
+import gzip
+import os
 import re
 import string
+from functools import lru_cache
+
+from metrics import METRICS
+
+# Shared state, built once at import instead of on every call
+URL_PATTERN = re.compile(r'https?://\S+|www\.\S+')
+DIGIT_PATTERN = re.compile(r'\d+')
+PUNCTUATION_TABLE = str.maketrans('', '', string.punctuation)
+
+# Upper bound on memoized token -> lemma entries
+LEMMA_CACHE_SIZE = 100_000
+
+# Optional precomputed token -> lemma table (see build_lemma_table)
+LEMMA_TABLE_PATH = os.environ.get(
+    'LEMMA_TABLE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'lemma_table.tsv.gz'))
+
+# Loaded on first use
+_lemmatizer = None
+_lemma_table = None
+
+
+def get_lemmatizer():
+    """The shared WordNetLemmatizer; NLTK is imported on the first call."""
+    global _lemmatizer
+    if _lemmatizer is None:
+        # Ensure the required data is downloaded as per the instructions above.
+        from nltk.stem import WordNetLemmatizer
+        _lemmatizer = WordNetLemmatizer()
+    return _lemmatizer
+
+
+def load_lemma_table(path=None):
+    """
+    Load a lemma table written by build_lemma_table(). Each line is either
+    'token<TAB>lemma' or just 'token' when the lemma is the token itself.
+    Returns an empty table if the file does not exist.
+    """
+    global _lemma_table
+    path = path or LEMMA_TABLE_PATH
+    table = {}
+    if os.path.exists(path):
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                token, _, lemma = line.rstrip('\n').partition('\t')
+                table[token] = lemma or token
+    _lemma_table = table
+    lemmatize_token.cache_clear()
+    return table
+
+
+def build_lemma_table(tokens, path=None):
+    """Lemmatize every distinct token with WordNet once and save the table."""
+    path = path or LEMMA_TABLE_PATH
+    lemmatizer = get_lemmatizer()
+    count = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for token in sorted(set(tokens)):
+            # The format has no escaping, so skip the odd token it can't hold
+            if not token or '\t' in token or '\n' in token:
+                continue
+            lemma = lemmatizer.lemmatize(token)
+            f.write(token + '\n' if lemma == token else f'{token}\t{lemma}\n')
+            count += 1
+    return count
+
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemmatize_token(token: str) -> str:
+    """Lemmatize one token, memoized (headline vocabularies repeat heavily)."""
+    table = _lemma_table if _lemma_table is not None else load_lemma_table()
+    lemma = table.get(token)
+    if lemma is None:
+        METRICS.inc('preprocess_wordnet_lookups_total')
+        lemma = get_lemmatizer().lemmatize(token)
+    return lemma
+
+
+def _normalize(text: str) -> str:
+    """Steps 2-5 of the pipeline: lowercase, drop URLs, punctuation and digits."""
+    text = URL_PATTERN.sub('', text.lower())
+    text = text.translate(PUNCTUATION_TABLE)
+    return DIGIT_PATTERN.sub('', text)
 
-# NLTK imports are placed here for clarity.
-# Ensure the required data is downloaded as per the instructions above.
-from nltk.stem import WordNetLemmatizer
 
 def clean_reddit_headline(text: str) -> str:
     """
@@ -47,33 +141,76 @@ def clean_reddit_headline(text: str) -> str:
     if not isinstance(text, str):
         return ""
 
-    # 2. Convert to lowercase
-    text = text.lower()
-
-    # 3. Remove URLs
-    text = re.sub(r'https?://\S+|www\.\S+', '', text)
-
-    # 4. Remove punctuation
+    # 2-5. Lowercase, remove URLs, punctuation and numbers
     # string.punctuation contains '!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~'
-    text = text.translate(str.maketrans('', '', string.punctuation))
-
-    # 5. Remove numbers
-    text = re.sub(r'\d+', '', text)
+    text = _normalize(text)
 
     # 6. Tokenize
     tokens = text.split()
 
     # 7. Lemmatization (Stopwords are intentionally kept)
-    lemmatizer = WordNetLemmatizer()
-    tokens = [lemmatizer.lemmatize(word) for word in tokens]
+    tokens = [lemmatize_token(word) for word in tokens]
 
     # 8. Rejoin and remove extra whitespace
     return " ".join(tokens).strip()
 
 
-# This block executes only when the script is run directly.
-# It serves as a built-in test and demonstration of the function.
-if __name__ == '__main__':
+def clean_reddit_headlines(texts):
+    """
+    Cleans many headlines at once; same output as calling
+    clean_reddit_headline() on each one.
+
+    Accepts a list (returns a list) or a pandas Series (returns a Series
+    with the same index). Duplicate headlines are cleaned once, steps 2-5
+    run as single passes over all distinct headlines joined together, and
+    each distinct token is lemmatized once.
+    """
+    values = list(texts)
+    unique = list(dict.fromkeys(v for v in values if isinstance(v, str)))
+    METRICS.inc('preprocess_headlines_total', len(values))
+    METRICS.inc('preprocess_unique_headlines_total', len(unique))
+
+    # Steps 2-5 on one joined string. Newlines inside a headline act like
+    # any other whitespace in the pipeline, so they can be swapped for
+    # spaces and '\n' used as the separator.
+    with METRICS.timer('preprocess_step_seconds', step='normalize'):
+        joined = "\n".join(t.replace("\n", " ") for t in unique)
+        normalized = _normalize(joined).split("\n") if unique else []
+
+    # Steps 6-7: lemmatize each distinct token once
+    with METRICS.timer('preprocess_step_seconds', step='lemmatize'):
+        token_lists = [text.split() for text in normalized]
+        lemmas = {token: lemmatize_token(token) for tokens in token_lists for token in tokens}
+
+    # Step 8
+    with METRICS.timer('preprocess_step_seconds', step='rejoin'):
+        cleaned = {
+            original: " ".join(lemmas[token] for token in tokens).strip()
+            for original, tokens in zip(unique, token_lists)
+        }
+        result = [cleaned[v] if isinstance(v, str) else "" for v in values]
+
+    # Hand a pandas Series back as a Series without importing pandas here
+    if hasattr(texts, "index") and hasattr(texts, "name"):
+        return type(texts)(result, index=texts.index, name=texts.name)
+    return result
+
+
+def _corpus_tokens(paths):
+    """Cleaned tokens from headline files (.csv with a title column or plain text)."""
+    import csv
+    for path in paths:
+        with open(path, encoding='utf-8', newline='') as f:
+            if path.lower().endswith('.csv'):
+                texts = (row.get('title') or '' for row in csv.DictReader(f))
+            else:
+                texts = f
+            for text in texts:
+                yield from _normalize(text).split()
+
+
+def _self_test():
+    """Built-in test and demonstration of the cleaning functions."""
     print("--- Running Preprocessing Function Self-Test (Stopwords Retained) ---")
 
     # A list of example headlines to test
@@ -90,4 +227,28 @@ if __name__ == '__main__':
     for i, headline in enumerate(sample_headlines):
         print(f"Original: {headline}")
         cleaned_headline = clean_reddit_headline(headline)
-        print(f"Cleaned: '{cleaned_headline}'")
\ No newline at end of file
+        print(f"Cleaned: '{cleaned_headline}'")
+
+    # The batch API must agree with the single-headline function
+    batch = clean_reddit_headlines(sample_headlines)
+    assert batch == [clean_reddit_headline(h) for h in sample_headlines]
+    print("Batch cleaning matches single-headline cleaning.")
+
+
+# This block executes only when the script is run directly.
+# By default it runs the built-in self-test.
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Reddit headline preprocessing (runs the self-test by default)")
+    parser.add_argument('--build-lemma-table', metavar='OUT',
+                        help="write a precomputed lemma table for the tokens in --corpus")
+    parser.add_argument('--corpus', nargs='+', default=[],
+                        help="headline files: .csv with a 'title' column, or one headline per line")
+    args = parser.parse_args()
+
+    if args.build_lemma_table:
+        n = build_lemma_table(_corpus_tokens(args.corpus), args.build_lemma_table)
+        print(f"Wrote {n:,} lemmas to {args.build_lemma_table}")
+    else:
+        _self_test()
\ No newline at end of file
@@ -0,0 +1,215 @@
+# ticker_tagging.py
+
+"""
+Ticker and sector tagging of headlines for the scored datasets.
+
+The Reddit and merged result notebooks each defined the same small
+SmartTickerExtractor and sector_map inline; they live here so pipeline.py
+can run the extract stage outside a notebook. A title is upper-cased and
+matched against PATTERNS; a match only counts if it is one of the
+VALID_TICKERS the dashboard covers, and each ticker's GICS sector comes
+from SECTOR_MAP.
+
+Running every pattern on every title in a Python loop dominated the
+extract stage on the collector's full output. Only the catch-all
+\b([A-Z]{1,5})\b decides *which* valid tickers a title has (the other
+patterns match a subset of its tokens; dotted symbols are never valid),
+so tag_ids() tokenizes a whole column at once and looks every token up
+in a token -> ticker id table, giving (row, ticker id) arrays; sector ids
+are an array lookup, tagger.ticker_sectors[ticker_ids]. The table also
+knows "$AAPL" and "(AAPL)" tokens, which the earlier patterns match
+first, to keep extract_tickers' order; only titles with two or more
+tickers and a ':' (exchange prefixes) go back through the patterns.
+
+Usage:
+    tickers, sectors = tag_titles(df["title"])
+    rows, ticker_ids = tag_ids(df["title"])
+"""
+
+import re
+from collections import defaultdict
+from itertools import repeat
+
+import numpy as np
+
+# (pattern, group, score); the score only ranks matches, any match tags the ticker
+PATTERNS = [
+    (r'\$([A-Z]{1,5})\b', 1, 10.0),
+    (r'(?:NYSE|NASDAQ|LSE|TSE):\s*([A-Z]{1,5})\b', 1, 10.0),
+    (r'\(([A-Z]{1,5})\)', 1, 8.0),
+    (r'\$([A-Z]{2,5}\.[A-Z]{1,2})\b', 1, 9.0),
+    (r'\(([A-Z]{2,5}\.[A-Z]{1,2})\)', 1, 8.0),
+    (r'\b([A-Z]{2,5}\.[A-Z]{1,2})\b', 0, 5.0),
+    (r'\b([A-Z]{1,5})\b', 0, 3.0),
+]
+
+# Tokens of upper-cased text the catch-all pattern can match, with a leading '$' or '(' and a
+# trailing ')', and the newlines between titles
+TOKEN_PATTERN = re.compile(r'[$(]?\b[A-Z]{1,5}\b\)?|\n')
+# ASCII text: other non-word bytes become spaces, so split() gives the same tokens
+_ASCII_WORDS = bytes(b if chr(b).isalnum() or chr(b) in '_\n$()' else ord(' ') for b in range(256))
+# Titles tokenized per pass, bounding the joined text and token list
+CHUNK_ROWS = 100000
+
+VALID_TICKERS = {
+    "AAPL","MSFT","NVDA","AMD","INTC","QCOM","CSCO","ORCL","IBM","ADBE","CRM",
+    "GOOGL","META","NFLX","DIS","VZ","T","TMUS","PARA","WBD","TTWO","EA",
+    "AMZN","TSLA","HD","MCD","NKE","SBUX","LOW","BKNG","TGT","LVS","RCL",
+    "PG","KO","PEP","WMT","COST","PM","MO","CL","KMB","TAP","GIS",
+    "XOM","CVX","COP","SLB","HAL","EOG","PSX","VLO","MPC","OXY","BKR",
+    "JPM","BAC","WFC","C","GS","MS","AXP","SCHW","BK","BLK","TFC",
+    "JNJ","PFE","MRK","UNH","LLY","ABBV","TMO","DHR","BMY","AMGN","CVS",
+    "CAT","GE","BA","HON","LMT","NOC","DE","MMM","RTX","GD","ETN",
+    "LIN","SHW","APD","NEM","DD","FCX","ECL","VMC","MLM","CF","ALB",
+    "NEE","DUK","SO","D","AEP","EXC","SRE","XEL","PEG","ED","WEC",
+    "PLD","AMT","EQIX","CCI","O","PSA","SPG","WELL","VICI","DLR","AVB"
+}
+
+SECTOR_MAP = {
+    "AAPL":"Technology","MSFT":"Technology","NVDA":"Technology","AMD":"Technology","INTC":"Technology",
+    "QCOM":"Technology","CSCO":"Technology","ORCL":"Technology","IBM":"Technology","ADBE":"Technology","CRM":"Technology",
+    "GOOGL":"Communication Services","META":"Communication Services","NFLX":"Communication Services",
+    "DIS":"Communication Services","VZ":"Communication Services","T":"Communication Services","TMUS":"Communication Services",
+    "PARA":"Communication Services","WBD":"Communication Services","TTWO":"Communication Services","EA":"Communication Services",
+    "AMZN":"Consumer Discretionary","TSLA":"Consumer Discretionary","HD":"Consumer Discretionary","MCD":"Consumer Discretionary",
+    "NKE":"Consumer Discretionary","SBUX":"Consumer Discretionary","LOW":"Consumer Discretionary","BKNG":"Consumer Discretionary",
+    "TGT":"Consumer Discretionary","LVS":"Consumer Discretionary","RCL":"Consumer Discretionary",
+    "PG":"Consumer Staples","KO":"Consumer Staples","PEP":"Consumer Staples","WMT":"Consumer Staples","COST":"Consumer Staples",
+    "PM":"Consumer Staples","MO":"Consumer Staples","CL":"Consumer Staples","KMB":"Consumer Staples","TAP":"Consumer Staples","GIS":"Consumer Staples",
+    "XOM":"Energy","CVX":"Energy","COP":"Energy","SLB":"Energy","HAL":"Energy","EOG":"Energy",
+    "PSX":"Energy","VLO":"Energy","MPC":"Energy","OXY":"Energy","BKR":"Energy",
+    "JPM":"Financials","BAC":"Financials","WFC":"Financials","C":"Financials","GS":"Financials","MS":"Financials",
+    "AXP":"Financials","SCHW":"Financials","BK":"Financials","BLK":"Financials","TFC":"Financials",
+    "JNJ":"Healthcare","PFE":"Healthcare","MRK":"Healthcare","UNH":"Healthcare","LLY":"Healthcare","ABBV":"Healthcare",
+    "TMO":"Healthcare","DHR":"Healthcare","BMY":"Healthcare","AMGN":"Healthcare","CVS":"Healthcare",
+    "CAT":"Industrials","GE":"Industrials","BA":"Industrials","HON":"Industrials","LMT":"Industrials","NOC":"Industrials",
+    "DE":"Industrials","MMM":"Industrials","RTX":"Industrials","GD":"Industrials","ETN":"Industrials",
+    "LIN":"Materials","SHW":"Materials","APD":"Materials","NEM":"Materials","DD":"Materials","FCX":"Materials",
+    "ECL":"Materials","VMC":"Materials","MLM":"Materials","CF":"Materials","ALB":"Materials",
+    "NEE":"Utilities","DUK":"Utilities","SO":"Utilities","D":"Utilities","AEP":"Utilities","EXC":"Utilities",
+    "SRE":"Utilities","XEL":"Utilities","PEG":"Utilities","ED":"Utilities","WEC":"Utilities",
+    "PLD":"Real Estate","AMT":"Real Estate","EQIX":"Real Estate","CCI":"Real Estate","O":"Real Estate","PSA":"Real Estate",
+    "SPG":"Real Estate","WELL":"Real Estate","VICI":"Real Estate","DLR":"Real Estate","AVB":"Real Estate",
+}
+
+
+class TickerTagger:
+    """The notebooks' SmartTickerExtractor: pattern matches restricted to VALID_TICKERS"""
+
+    def __init__(self, patterns=PATTERNS, valid_tickers=VALID_TICKERS, sector_map=SECTOR_MAP):
+        self.patterns = [(re.compile(pattern), group, score) for pattern, group, score in patterns]
+        self.valid_tickers = valid_tickers
+        # Id tables for tag_ids: ticker id -> symbol / sector id (-1: none), sector id -> name
+        self.tickers = sorted(valid_tickers)
+        self.ticker_ids = {ticker: i for i, ticker in enumerate(self.tickers)}
+        self.sectors = sorted({sector_map[t] for t in self.tickers if t in sector_map})
+        self.ticker_sectors = np.array(
+            [self.sectors.index(sector_map[t]) if t in sector_map else -1 for t in self.tickers], dtype=np.int32)
+
+    def extract_pattern_tickers(self, text):
+        text = text.upper()
+        ticker_scores = defaultdict(float)
+        for pattern, group_idx, score in self.patterns:
+            for match in pattern.finditer(text):
+                ticker = match.group(group_idx).upper()
+                if ticker in self.valid_tickers:
+                    ticker_scores[ticker] += score
+        return ticker_scores
+
+    def extract_tickers(self, text):
+        scores = self.extract_pattern_tickers(text or "")
+        return list(scores.keys())
+
+
+def sectors_for(tickers, sector_map=SECTOR_MAP):
+    """Distinct sectors of some tickers, in first-seen order"""
+    return list(dict.fromkeys(sector_map[t] for t in tickers if t in sector_map))
+
+
+def _token_codes(tagger):
+    """
+    Token -> 3 * ticker id + rank, where rank is the first pattern that
+    matches the token: 0 for $AAPL, 1 for (AAPL), 2 for the catch-all.
+    Row breaks map to -1.
+    """
+    codes = {'x': -1, '\n': -1}
+    for i, ticker in enumerate(tagger.tickers):
+        codes.update({ticker: 3 * i + 2, '(' + ticker: 3 * i + 2, ticker + ')': 3 * i + 2,
+                      '$' + ticker: 3 * i, '$' + ticker + ')': 3 * i, '(' + ticker + ')': 3 * i + 1})
+    return codes
+
+
+def _scan(texts, codes):
+    """Code of every token of some upper-cased titles, -2 for tokens that are not tickers"""
+    joined = '\n'.join(texts)
+    if joined.isascii():
+        joined = joined.encode('ascii').translate(_ASCII_WORDS).decode('ascii')
+        # Lower-case x cannot be a word of upper-cased text, so it marks the row breaks
+        for char, spaced in (('$', ' $'), ('(', ' ('), (')', ') '), ('\n', ' x ')):
+            joined = joined.replace(char, spaced)
+        tokens = joined.split()
+    else:
+        tokens = TOKEN_PATTERN.findall(joined)
+    return np.fromiter(map(codes.get, tokens, repeat(-2)), dtype=np.int32, count=len(tokens))
+
+
+def _first_per_row(rows, values):
+    """Drop repeats of a value within a row, keeping first occurrences in order"""
+    _, first = np.unique(np.stack([rows, values]), axis=1, return_index=True)
+    first.sort()
+    return rows[first], values[first]
+
+
+def tag_ids(titles, tagger=None, chunk_rows=CHUNK_ROWS):
+    """
+    (rows, ticker ids): the tickers of every title as two aligned arrays,
+    sorted by row, each row's tickers in extract_tickers order. Assumes
+    the tagger's patterns end with the catch-all, as PATTERNS does.
+    """
+    tagger = tagger or TickerTagger()
+    titles = list(titles)
+    codes = _token_codes(tagger)
+    found_rows, found_codes = [], []
+    for start in range(0, len(titles), chunk_rows):
+        texts = [str(title).upper().replace('\n', ' ') for title in titles[start:start + chunk_rows]]
+        ascii_rows = np.fromiter(map(str.isascii, texts), dtype=bool, count=len(texts))
+        # ASCII titles take the translate / split fast path, the rest the regex
+        for group in (np.flatnonzero(ascii_rows), np.flatnonzero(~ascii_rows)):
+            if len(group):
+                found = _scan([texts[i] for i in group], codes)
+                rows = group[np.cumsum(found == -1)] + start
+                found_rows.append(rows[found >= 0])
+                found_codes.append(found[found >= 0])
+    if not found_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32)
+
+    # Per row, tickers the earlier patterns match come first, each pattern's in text order
+    rows, found = np.concatenate(found_rows), np.concatenate(found_codes)
+    order = np.lexsort((found % 3, rows))
+    rows, ids = _first_per_row(rows[order], found[order] // 3)
+    counts = np.bincount(rows, minlength=len(titles))
+    ends = np.cumsum(counts)
+    # An exchange prefix (NYSE: AAPL) ranks a ticker between $AAPL and (AAPL)
+    for row in np.flatnonzero(counts > 1):
+        if ':' in str(titles[row]):
+            ids[ends[row] - counts[row]:ends[row]] = [
+                tagger.ticker_ids[t] for t in tagger.extract_tickers(str(titles[row]))]
+    return rows, ids
+
+
+def tag_titles(titles, tagger=None):
+    """(tickers, sectors): one list of each per title"""
+    tagger = tagger or TickerTagger()
+    titles = list(titles)
+    rows, ticker_ids = tag_ids(titles, tagger)
+    tickers = [[] for _ in titles]
+    for row, i in zip(rows.tolist(), ticker_ids.tolist()):
+        tickers[row].append(tagger.tickers[i])
+
+    sector_ids = tagger.ticker_sectors[ticker_ids]
+    known = sector_ids >= 0
+    sector_rows, sector_ids = _first_per_row(rows[known], sector_ids[known])
+    sectors = [[] for _ in titles]
+    for row, i in zip(sector_rows.tolist(), sector_ids.tolist()):
+        sectors[row].append(tagger.sectors[i])
+    return tickers, sectors